@@ -83,6 +83,7 @@ contract AutonomousSoftwareOrg {
     address public ResearchCertificateAddress;
 
     event LogSoftwareExecRecord(address indexed submitter, bytes32 indexed sourceCodeHash, uint32 index, bytes32[]  inputHash, bytes32[] outputHash);
+    event LogDelSoftwareExecRecord(address indexed submitter, bytes32 indexed sourceCodeHash, uint32 index);
     event LogPropose(uint propNo, string title, string url, uint requestedFund, uint deadline);
     event LogProposalVote(uint voteCount, uint blockNum, address voter);
     event LogDonation(address donor,uint amount,uint blknum);
@@ -296,7 +297,22 @@ contract AutonomousSoftwareOrg {
 
     function addSoftwareExecRecord(bytes32 sourceCodeHash, uint32 index, bytes32[] memory inputHash, bytes32[] memory outputHash)
         public member(msg.sender) validEblocBrokerProvider() returns (uint32) {
+        return _addSoftwareExecRecord(sourceCodeHash, index, inputHash, outputHash);
+    }
+
+    // adds several records in one transaction, index 0 allocates a new index as in addSoftwareExecRecord
+    function addSoftwareExecRecords(bytes32[] memory sourceCodeHash, uint32[] memory index, bytes32[][] memory inputHash, bytes32[][] memory outputHash)
+        public member(msg.sender) validEblocBrokerProvider() returns (uint32[] memory) {
+        require(index.length == sourceCodeHash.length && inputHash.length == sourceCodeHash.length && outputHash.length == sourceCodeHash.length);
+        uint32[] memory indexes = new uint32[](sourceCodeHash.length);
+        for (uint256 i = 0; i < sourceCodeHash.length; i++) {
+            indexes[i] = _addSoftwareExecRecord(sourceCodeHash[i], index[i], inputHash[i], outputHash[i]);
+        }
+        return indexes;
+    }
 
+    function _addSoftwareExecRecord(bytes32 sourceCodeHash, uint32 index, bytes32[] memory inputHash, bytes32[] memory outputHash)
+        internal returns (uint32) {
         if (index == 0) {
             globalIndexCounter += 1;
             softwareExecutionRecordOwner.push(msg.sender);
@@ -332,6 +348,7 @@ contract AutonomousSoftwareOrg {
         delete outgoingLen[sourceCodeHash][index];
         softwareExecutionRecordOwner[index] = address(0);
         softwareExecutionNumber -= 1;
+        emit LogDelSoftwareExecRecord(msg.sender, sourceCodeHash, index);
     }
 
     function getNoOfIncomingDataArcs(bytes32 sourceCodeHash, uint32 index) public view returns(uint) {
@@ -350,6 +367,27 @@ contract AutonomousSoftwareOrg {
         return outgoing[sourceCodeHash][index][i];
     }
 
+    function getIncomingDataArcs(bytes32 sourceCodeHash, uint32 index) public view returns(uint256[] memory) {
+        return incoming[sourceCodeHash][index];
+    }
+
+    function getOutgoingDataArcs(bytes32 sourceCodeHash, uint32 index) public view returns(uint256[] memory) {
+        return outgoing[sourceCodeHash][index];
+    }
+
+    // incoming and outgoing token ids of many records in one call
+    function getDataArcs(bytes32[] memory sourceCodeHash, uint32[] memory index)
+        public view returns(uint256[][] memory, uint256[][] memory) {
+        require(index.length == sourceCodeHash.length);
+        uint256[][] memory _incoming = new uint256[][](sourceCodeHash.length);
+        uint256[][] memory _outgoing = new uint256[][](sourceCodeHash.length);
+        for (uint256 i = 0; i < sourceCodeHash.length; i++) {
+            _incoming[i] = incoming[sourceCodeHash[i]][index[i]];
+            _outgoing[i] = outgoing[sourceCodeHash[i]][index[i]];
+        }
+        return (_incoming, _outgoing);
+    }
+
     function setSoftwareNameVersion(bytes32 sourceCodeHash,  string memory name, string memory version)
         public member(msg.sender) validEblocBrokerProvider() {
         versionRecord[sourceCodeHash] = version;
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from generate import generate
+
+HELPER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "helper.py")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark.json")
+SIZES = (1000, 10000, 100000)
+ACTIONS = (
+    "pagerank",
+    "most_knocked_down",
+    "knocked_down",
+    "jump_one_step_behind",
+    "upstream",
+    "merge",
+    "dagify",
+)
+#: fixed work run next to the actions, the baseline is relative to it so it
+#: holds across machines
+CALIBRATION = """
+import networkx as nx
+import numpy as np
+import scipy.sparse
+
+rng = np.random.default_rng(0)
+np.sort(rng.random(2_000_000))
+G = nx.gnm_random_graph(20_000, 60_000, seed=0, directed=True)
+nx.pagerank(G)
+"""
+
+
+def _argv(action, fn, stats):
+    """helper.py command line of `action`, start nodes taken from `stats`."""
+    argv = [sys.executable, HELPER, f"--{action}", fn]
+    if action == "knocked_down":
+        argv.append(stats["source"])
+    elif action in ("jump_one_step_behind", "upstream"):
+        argv.append(stats["sink"])
+
+    return argv
+
+
+def run(argv, cwd, timeout=None):
+    """Run a command and return its wall time in seconds and peak RSS in bytes.
+
+    The child is reaped with `os.wait4`, so the peak RSS is the one of that
+    process alone.
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        argv, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    timer = threading.Timer(timeout, proc.kill) if timeout else None
+    if timer:
+        timer.start()
+
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    finally:
+        if timer:
+            timer.cancel()
+
+    elapsed = time.perf_counter() - start
+    if os.WIFEXITED(status):
+        proc.returncode = os.WEXITSTATUS(status)
+    else:
+        proc.returncode = -os.WTERMSIG(status)
+
+    if proc.returncode:
+        raise RuntimeError(f"{' '.join(argv)} exited with {proc.returncode}")
+
+    maxrss = usage.ru_maxrss
+    if sys.platform != "darwin":  # kilobytes on Linux, bytes on macOS
+        maxrss *= 1024
+
+    return elapsed, maxrss
+
+
+def bench(sizes=SIZES, actions=ACTIONS, repeat=3, seed=0, timeout=None, **kwargs):
+    """Time every helper.py action on synthetic graphs of the given sizes.
+
+    Each action is run `repeat` times on a cold loader cache; the minimum
+    time and the maximum peak RSS are kept. The `CALIBRATION` run is stored
+    under ``calibration``.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        argv = [sys.executable, "-c", CALIBRATION]
+        runs = [run(argv, tmp, timeout) for _ in range(repeat)]
+        results["calibration"] = {
+            "seconds": min(elapsed for elapsed, _ in runs),
+            "maxrss": max(maxrss for _, maxrss in runs),
+        }
+        print(f"{'calibration':>32} {results['calibration']['seconds']:9.3f}s")
+        for size in sizes:
+            fn = os.path.join(tmp, f"synthetic_{size}.gv")
+            stats = generate(fn, nodes=size, seed=seed, **kwargs)
+            print(f"## {size}: {stats['nodes']} nodes, {stats['edges']} edges")
+            for action in actions:
+                times = []
+                peak = 0
+                for _ in range(repeat):
+                    if os.path.exists(f"{fn}.cache"):
+                        os.remove(f"{fn}.cache")
+
+                    elapsed, maxrss = run(_argv(action, fn, stats), tmp, timeout)
+                    times.append(elapsed)
+                    peak = max(peak, maxrss)
+
+                key = f"{action}/{size}"
+                results[key] = {"seconds": min(times), "maxrss": peak}
+                print(f"{key:>32} {min(times):9.3f}s {peak / 2**20:9.1f}MB")
+
+    return results
+
+
+def relative(results):
+    """Times and peak RSS of `bench` results as multiples of the calibration."""
+    calibration = results["calibration"]
+    return {
+        key: {
+            "seconds": result["seconds"] / calibration["seconds"],
+            "maxrss": result["maxrss"] / calibration["maxrss"],
+        }
+        for key, result in results.items()
+        if key != "calibration"
+    }
+
+
+def compare(results, baseline, tolerance=0.25, mem_tolerance=0.25, slack=0.1):
+    """Runs that are slower or use more memory than `baseline` allows, both
+    `relative`.
+
+    :param slack: calibration runs added to every time allowance, so very
+        short runs do not fail on timer noise
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+
+        base = baseline[key]
+        limit = base["seconds"] * (1 + tolerance) + slack
+        if result["seconds"] > limit:
+            regressions.append(f"{key}: {result['seconds']:.3f}x > {limit:.3f}x")
+
+        limit = base["maxrss"] * (1 + mem_tolerance)
+        if result["maxrss"] > limit:
+            regressions.append(f"{key}: {result['maxrss']:.2f}x > {limit:.2f}x RSS")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="graph-tools benchmark suite")
+    parser.add_argument("--sizes", type=float, nargs="+", default=SIZES)
+    parser.add_argument("--actions", nargs="+", choices=ACTIONS, default=ACTIONS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cycles", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, help="seconds allowed per run")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--mem_tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the new baseline"
+    )
+    args = parser.parse_args()
+    #: without a baseline nothing could fail, so it is required unless saving
+    if not args.save and not os.path.isfile(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save to store one")
+        sys.exit(1)
+
+    results = bench(
+        [int(size) for size in args.sizes],
+        args.actions,
+        args.repeat,
+        args.seed,
+        args.timeout,
+        cycles=args.cycles,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    results = relative(results)
+    if args.save:
+        baseline = {}
+        if os.path.isfile(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance, args.mem_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+import contextlib
+import json
+import math
+import os
+import socketserver
+import sys
+
+from broker._utils._log import log
+from dagify import _dagify, _plan
+from execution_graph import ExecutionGraph
+from graph import _most_knocked_down
+from impact import ImpactAnalysis
+from lineage import LineageIndex
+from loader import read_dot
+from merge import contract
+import networkx as nx
+import pagerank
+import reachability
+from schedule import Simulator
+from upstream import UpstreamScores
+
+
+class Entry:
+    """A loaded graph and the indexes computed on it so far."""
+
+    def __init__(self, fn, stamp, previous=None):
+        self.fn = fn
+        self.stamp = stamp
+        self.graph = ExecutionGraph.read(fn)
+        self._nx = None
+        self.most_knocked = None
+        self.ranks = {}
+        self.upstream = {}
+        self.simulators = {}
+        self._impact = None
+        self._lineage = None
+        #: ranks of the previous version of the file warm start the new ones
+        self.previous_ranks = {}
+        if previous is not None:
+            self.previous_ranks = {
+                key: (previous.graph.ids, rank) for key, rank in previous.ranks.items()
+            }
+
+    @property
+    def nx(self):
+        if self._nx is None:
+            self._nx = read_dot(self.fn)
+
+        return self._nx
+
+    @property
+    def impact(self):
+        if self._impact is None:
+            self._impact = ImpactAnalysis(self.graph)
+
+        return self._impact
+
+    @property
+    def lineage(self):
+        if self._lineage is None:
+            self._lineage = LineageIndex.read(self.fn)
+
+        return self._lineage
+
+
+class GraphStore:
+    """Graphs kept in memory by path and reloaded only when the file changes."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, fn):
+        fn = os.path.abspath(fn)
+        st = os.stat(fn)
+        stamp = (st.st_size, st.st_mtime_ns)
+        entry = self.entries.get(fn)
+        if entry is None or entry.stamp != stamp:
+            log(f"## loading {fn}")
+            entry = self.entries[fn] = Entry(fn, stamp, entry)
+
+        return entry
+
+
+def _pagerank(entry, query):
+    G = entry.graph
+    families = query.get("families")
+    software_only = query.get("software_only", False)
+    key = (
+        query.get("alpha", 0.9),
+        query.get("tol", 1.0e-06),
+        tuple(families or ()),
+        software_only,
+    )
+    if key not in entry.ranks:
+        p = None
+        if families or software_only:
+            p = pagerank.personalization(
+                G, families=families, software_only=software_only
+            )
+
+        x0 = None
+        if key in entry.previous_ranks:
+            x0 = pagerank.align_rank(G, *entry.previous_ranks[key])
+
+        entry.ranks[key], _ = pagerank.pagerank(G, alpha=key[0], p=p, x0=x0, tol=key[1])
+
+    k = query.get("top") or len(G.software)
+    return pagerank.top_k(G, entry.ranks[key], k)
+
+
+def _most_knocked_down_query(entry, query):
+    if entry.most_knocked is None:
+        G = entry.graph
+        entry.most_knocked = _most_knocked_down(G, [G.ids[idx] for idx in G.data])
+
+    node, knocked = entry.most_knocked
+    return {"node": node, "knocked": knocked}
+
+
+def _knocked_down_query(entry, query):
+    knocked = reachability.knocked(entry.graph, query["node"])
+    return {"node": query["node"], "knocked": knocked}
+
+
+def _impact_query(entry, query):
+    impact = entry.impact.run(query["scenarios"])
+    results = [{"knocked": size} for size in impact.sizes.tolist()]
+    if query.get("members"):
+        for i, result in enumerate(results):
+            result["nodes"] = impact.members(i)
+
+    return results
+
+
+def _upstream_scores(entry, query, hops):
+    decay = query.get("decay", 1.0)
+    key = (hops, tuple(decay) if isinstance(decay, list) else decay)
+    if key not in entry.upstream:
+        entry.upstream[key] = UpstreamScores(entry.graph, hops, decay)
+
+    return entry.upstream[key]
+
+
+def _jump_one_step_behind_query(entry, query):
+    scores = _upstream_scores(entry, query, query.get("hops", 1))
+    return scores.predecessors([query["node"]])[query["node"]]
+
+
+def _upstream_query(entry, query):
+    scores = _upstream_scores(entry, query, query.get("hops", 3))
+    return scores.contributors([query["node"]], query.get("top", 10))[query["node"]]
+
+
+def _lineage_query(entry, query):
+    index, node = entry.lineage, query["node"]
+    result = {
+        "ancestors": index.ancestor_count(node),
+        "descendants": index.descendant_count(node),
+    }
+    if "of" in query:
+        result["downstream"] = index.is_descendant(node, query["of"])
+
+    return result
+
+
+def _merge_query(entry, query):
+    G = contract(entry.nx)
+    if query.get("output"):
+        nx.nx_pydot.write_dot(G, query["output"])
+
+    return {"nodes": G.number_of_nodes(), "edges": G.number_of_edges()}
+
+
+def _dagify_query(entry, query):
+    return _dagify(entry.graph)
+
+
+def _plan_query(entry, query):
+    return _plan(entry.graph)
+
+
+def _schedule_query(entry, query):
+    bandwidth = query.get("bandwidth", math.inf)
+    if bandwidth not in entry.simulators:
+        entry.simulators[bandwidth] = Simulator(entry.graph, bandwidth)
+
+    sim = entry.simulators[bandwidth]
+    workers = query.get("workers")
+    if workers is None:
+        return sim.sweep()
+
+    if isinstance(workers, list):
+        return sim.sweep(workers)
+
+    return sim.run(workers, timeline=query.get("timeline", False))
+
+
+ACTIONS = {
+    "pagerank": _pagerank,
+    "most_knocked_down": _most_knocked_down_query,
+    "knocked_down": _knocked_down_query,
+    "impact": _impact_query,
+    "jump_one_step_behind": _jump_one_step_behind_query,
+    "upstream": _upstream_query,
+    "lineage": _lineage_query,
+    "merge": _merge_query,
+    "dagify": _dagify_query,
+    "plan": _plan_query,
+    "schedule": _schedule_query,
+}
+
+
+def answer(store, query):
+    """Answer one JSON query, e.g. `{"action": "pagerank", "graph": "a.gv"}`."""
+    response = {"id": query.get("id"), "action": query.get("action")}
+    if "node" in query:
+        response["node"] = query["node"]
+
+    try:
+        action = ACTIONS[query["action"]]
+        #: analyses log to stdout, which is the response channel in stdin mode
+        with contextlib.redirect_stdout(sys.stderr):
+            entry = store.get(query["graph"])
+            response["result"] = action(entry, query)
+    except KeyError as e:
+        response["error"] = f"missing or unknown key: {e}"
+    except Exception as e:
+        response["error"] = str(e)
+
+    return response
+
+
+def _serve_lines(store, lines, write):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            query = json.loads(line)
+        except ValueError as e:
+            response = {"id": None, "error": f"invalid json: {e}"}
+        else:
+            if not isinstance(query, dict):
+                query = {"action": None}
+
+            response = answer(store, query)
+
+        write(json.dumps(response) + "\n")
+
+
+def batch(fn, actions, nodes=(), output="merged.gv"):
+    """Run several actions on a single load of `fn` and stream JSON Lines.
+
+    `knocked_down`, `jump_one_step_behind`, `upstream` and `lineage` run once
+    per start node, the other actions once.
+    """
+    store = GraphStore()
+    with contextlib.redirect_stdout(sys.stderr):
+        store.get(fn)
+
+    for action in actions:
+        if action in ("knocked_down", "jump_one_step_behind", "upstream", "lineage"):
+            queries = ({"action": action, "node": node} for node in nodes)
+        else:
+            queries = [{"action": action, "output": output}]
+
+        for query in queries:
+            query["graph"] = fn
+            sys.stdout.write(json.dumps(answer(store, query)) + "\n")
+
+    sys.stdout.flush()
+
+
+def serve(graphs=(), socket_fn=None):
+    """Answer JSON Lines queries over a Unix socket, or over stdin/stdout.
+
+    :param graphs: `.gv` files loaded up front
+    """
+    store = GraphStore()
+    with contextlib.redirect_stdout(sys.stderr):
+        for fn in graphs:
+            store.get(fn)
+
+    if socket_fn is None:
+
+        def _write(data):
+            sys.stdout.write(data)
+            sys.stdout.flush()
+
+        _serve_lines(store, sys.stdin, _write)
+        return
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lines = (line.decode() for line in self.rfile)
+            _serve_lines(store, lines, lambda data: self.wfile.write(data.encode()))
+
+    if os.path.exists(socket_fn):
+        os.remove(socket_fn)
+
+    with socketserver.UnixStreamServer(socket_fn, Handler) as server:
+        log(f"## listening on {socket_fn}")
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_fn)
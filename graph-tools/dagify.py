@@ -1,47 +1,157 @@
 #!/usr/bin/env python3
 
+import argparse
+import heapq
+import json
+
 from broker._utils._log import log
-import networkx as nx
+from execution_graph import ExecutionGraph
+import numpy as np
+import reachability
 
 
 def _dagify(G):
-    sw_nodes = []
-    data_nodes = []
-    for node in list(G.nodes):
-        if "." in node:
-            sw_nodes.append(node)
-        else:
-            data_nodes.append(node)
-
-    _dict = {}
-    for sw_node in sw_nodes:
-        output = sw_node.split(".")
-        _dict[sw_node] = int(output[1])
+    """Assign every data node to the first software execution touching it.
 
+    :param G: `ExecutionGraph`
+    """
+    sw_nodes = G.software
+    #: stable sort keeps the node order among equal execution indexes
+    pr = sw_nodes[np.argsort(G.exec_idx[sw_nodes], kind="stable")]
     order_dict = {}
-    hit_node = {}
-    pr = {k: v for k, v in sorted(_dict.items(), key=lambda item: item[1])}
-    for node in pr:
-        out_nodes = G.out_edges(node)
-        for out_node in out_nodes:
-            if out_node[1] not in hit_node:
-                hit_node[out_node[1]] = True
-                try:
-                    order_dict[out_node[0]].append(out_node[1])
-                except:
-                    order_dict[out_node[0]] = []
-                    order_dict[out_node[0]].append(out_node[1])
+    hit_node = np.zeros(len(G), dtype=bool)
+    for node in pr.tolist():
+        for out_node in G.successors(node).tolist():
+            if not hit_node[out_node]:
+                hit_node[out_node] = True
+                order_dict.setdefault(G.ids[node], []).append(G.ids[out_node])
 
     log("List of software in execution order and their initial generated data files:")
     log(order_dict)
-    # print(f"data={data_nodes}\n")
-    # print(f"sw={sw_nodes}")
+    return order_dict
+
+
+def _plan(G):
+    """Levelized re-execution plan of the software executions of `G`.
+
+    Cycles are collapsed into their strongly connected components, the
+    executions of a cycle run in the same wave. Components are taken in a
+    heap-based Kahn order: data-only components as soon as they are ready,
+    executions by their smallest `.idx` among the ready ones. An execution
+    runs in the wave after the latest execution upstream of it, so every
+    wave can run in parallel once the previous ones are done.
+
+    :param G: `ExecutionGraph`
+    """
+    labels, _, indptr, indices, _ = reachability.condense(G)
+    ncomp = len(indptr) - 1
+    sw = G.software
+    #: software members of every component, in execution order
+    sw = sw[np.lexsort((sw, G.exec_idx[sw], labels[sw]))]
+    sw_ptr = np.zeros(ncomp + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels[sw], minlength=ncomp), out=sw_ptr[1:])
+    runs = (sw_ptr[1:] > sw_ptr[:-1]).tolist()
+    #: smallest `.idx` of every component, data-only ones never use theirs
+    key = np.full(ncomp, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(key, labels[sw], G.exec_idx[sw])
+    key = key.tolist()
+    sw_ptr = sw_ptr.tolist()
+    sw = sw.tolist()
+
+    indeg = np.bincount(indices, minlength=ncomp).tolist()
+    ready = [0] * ncomp
+    via = [-1] * ncomp
+    wave = [0] * ncomp
+    stack = [comp for comp in range(ncomp) if indeg[comp] == 0 and not runs[comp]]
+    heap = [
+        (key[comp], comp) for comp in range(ncomp) if indeg[comp] == 0 and runs[comp]
+    ]
+    heapq.heapify(heap)
+    order = []
+    while stack or heap:
+        if stack:
+            comp = stack.pop()
+        else:
+            comp = heapq.heappop(heap)[1]
+            order.append(comp)
+
+        level = wave[comp] = ready[comp] + runs[comp]
+        for succ in indices[indptr[comp] : indptr[comp + 1]]:
+            if level > ready[succ]:
+                ready[succ] = level
+                via[succ] = comp
+
+            indeg[succ] -= 1
+            if indeg[succ] == 0:
+                if runs[succ]:
+                    heapq.heappush(heap, (key[succ], succ))
+                else:
+                    stack.append(succ)
+
+    ids = G.ids
+    waves = [[] for _ in range(max(wave, default=0))]
+    for comp in order:
+        waves[wave[comp] - 1].extend(
+            ids[idx] for idx in sw[sw_ptr[comp] : sw_ptr[comp + 1]]
+        )
+
+    #: walk back from a component of the last wave along its latest inputs
+    path = []
+    comp = wave.index(len(waves)) if waves else -1
+    while comp != -1:
+        if runs[comp]:
+            path.extend(
+                ids[idx] for idx in reversed(sw[sw_ptr[comp] : sw_ptr[comp + 1]])
+            )
+
+        comp = via[comp]
+
+    return {
+        "nodes": len(G),
+        "software": len(sw),
+        "order": [
+            ids[idx] for comp in order for idx in sw[sw_ptr[comp] : sw_ptr[comp + 1]]
+        ],
+        "waves": waves,
+        "width": [len(nodes) for nodes in waves],
+        "critical_path_length": len(waves),
+        "critical_path": path[::-1],
+    }
+
+
+def plan(fn, output=None):
+    """Plan the re-execution of `fn` and write it as JSON to `output`."""
+    result = _plan(ExecutionGraph.read(fn))
+    log(
+        f"* waves={result['critical_path_length']} ; "
+        f"max_width={max(result['width'], default=0)} ; software={result['software']}"
+    )
+    if output:
+        with open(output, "w") as f:
+            json.dump(result, f)
+
+    return result
+
+
+def dagify(fn):
+    G = ExecutionGraph.read(fn)
+    return _dagify(G)
 
 
-def dagify(fn="original.gv"):
-    G = nx.drawing.nx_pydot.read_dot(fn)
-    G = _dagify(G)
+def main():
+    parser = argparse.ArgumentParser(description="Execution order of a graph")
+    parser.add_argument("input", metavar="[file.gv]", nargs="?", default="original.gv")
+    parser.add_argument(
+        "--plan",
+        metavar="[plan.json]",
+        help="write the levelized re-execution plan instead",
+    )
+    args = parser.parse_args()
+    if args.plan:
+        plan(args.input, args.plan)
+    else:
+        dagify(args.input)
 
 
 if __name__ == "__main__":
-    dagify()
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import math
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+import loader
+
+
+def _weight(value):
+    try:
+        return float(str(value).strip('"'))
+    except ValueError:
+        return math.nan
+
+
+class ExecutionGraph:
+    """Execution graph interned to integers with CSR/CSC adjacency arrays.
+
+    Software nodes are named `name.idx`, every other node is a data file. The
+    node kind, the software name code (into `sw_names`) and the execution
+    index are parsed once; `exec_idx` is -1 for data nodes and for software
+    nodes without a numeric index. Missing weights are stored as nan.
+    """
+
+    def __init__(self, ids, sources, targets, weight=None):
+        self.ids = list(ids)
+        self.index = {node: idx for idx, node in enumerate(self.ids)}
+        n = len(self.ids)
+        dtype = np.int32 if n < 2**31 else np.int64
+        sources = np.asarray(sources, dtype=dtype)
+        targets = np.asarray(targets, dtype=dtype)
+        #: stable sorts keep the edge order of the file inside each row
+        order = np.argsort(sources, kind="stable")
+        self.indices = targets[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=self.indptr[1:])
+        order = np.argsort(targets, kind="stable")
+        self.in_indices = sources[order]
+        self.in_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n), out=self.in_indptr[1:])
+
+        self.sw_names = []
+        codes = {}
+        self.sw_name = np.full(n, -1, dtype=np.int32)
+        self.exec_idx = np.full(n, -1, dtype=np.int64)
+        for idx, node in enumerate(self.ids):
+            if "." in node:
+                name, _, suffix = node.partition(".")
+                if name not in codes:
+                    codes[name] = len(self.sw_names)
+                    self.sw_names.append(name)
+
+                self.sw_name[idx] = codes[name]
+                if suffix.isdigit():
+                    self.exec_idx[idx] = int(suffix)
+
+        self.is_software = self.sw_name >= 0
+        self._lists = None
+        if weight is None:
+            self.weight = np.full(n, np.nan)
+        else:
+            self.weight = np.asarray(weight, dtype=np.float64)
+
+    @classmethod
+    def from_networkx(cls, G):
+        ids = list(G.nodes)
+        index = {node: idx for idx, node in enumerate(ids)}
+        edges = [(index[u], index[v]) for u, v in G.edges()]
+        sources, targets = zip(*edges) if edges else ((), ())
+        weight = [_weight(G.nodes[n].get("weight", "nan")) for n in ids]
+        return cls(ids, sources, targets, weight)
+
+    @classmethod
+    def read(cls, fn):
+        """Read a `.gv` file without building a networkx graph."""
+        data = loader.parse(fn)
+        if data is None:
+            return cls.from_networkx(loader.read_dot(fn))
+
+        _, _, _, names, declared, sources, targets, _ = data
+        #: same node order as `read_dot`: declared nodes first, then edges
+        ids = [name for name, _ in declared]
+        seen = set(ids)
+        for u, v in zip(sources, targets):
+            for node in (names[u], names[v]):
+                if node not in seen:
+                    seen.add(node)
+                    ids.append(node)
+
+        index = {node: idx for idx, node in enumerate(ids)}
+        remap = np.fromiter((index[name] for name in names), np.int64, len(names))
+        weight = np.full(len(ids), np.nan)
+        for name, attrs in declared:
+            if "weight" in attrs:
+                weight[index[name]] = _weight(attrs["weight"])
+
+        return cls(ids, remap[sources], remap[targets], weight)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def number_of_edges(self):
+        return len(self.indices)
+
+    @property
+    def software(self):
+        return np.flatnonzero(self.is_software)
+
+    @property
+    def data(self):
+        return np.flatnonzero(~self.is_software)
+
+    @property
+    def nbytes(self):
+        arrays = (
+            self.indices,
+            self.indptr,
+            self.in_indices,
+            self.in_indptr,
+            self.sw_name,
+            self.exec_idx,
+            self.is_software,
+            self.weight,
+        )
+        return sum(a.nbytes for a in arrays)
+
+    def successors(self, idx):
+        return self.indices[self.indptr[idx] : self.indptr[idx + 1]]
+
+    def predecessors(self, idx):
+        return self.in_indices[self.in_indptr[idx] : self.in_indptr[idx + 1]]
+
+    def lists(self):
+        """`(indptr, indices)` as Python lists, cheaper to walk node by node."""
+        if self._lists is None:
+            self._lists = (self.indptr.tolist(), self.indices.tolist())
+
+        return self._lists
+
+    def adjacency(self):
+        """Sparse adjacency matrix, parallel edges are summed."""
+        n = len(self.ids)
+        data = np.ones(len(self.indices), dtype=np.float64)
+        A = csr_matrix((data, self.indices, self.indptr), shape=(n, n), copy=True)
+        #: csgraph's strong components never return on duplicate entries
+        A.sum_duplicates()
+        return A
+
+    def components(self):
+        """Label of the strongly connected component of every node."""
+        _, labels = connected_components(
+            self.adjacency(), directed=True, connection="strong"
+        )
+        return labels
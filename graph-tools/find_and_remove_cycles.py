@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 
+from itertools import islice
+import sys
+
 from broker._utils._log import log
+from loader import read_dot
 import networkx as nx
 
 
-def remove_edge_causing_most_cycles(G, cycles):
+def remove_edge_causing_most_cycles(G, cycles, removed=None):
     """Removes single edge that causing most cycles."""
     edge_hit_rate = {}
     for cycle in cycles:
@@ -47,34 +51,210 @@ def remove_edge_causing_most_cycles(G, cycles):
         }
         _from = next(iter(out))
         _to = None
-        for idx, node in enumerate(cycle):
-            if node == _from:
-                try:
-                    _to = cycle[idx + 1]
-                except:  # noqa
-                    _to = cycle[0]
+        for cycle in cycles:
+            for idx, node in enumerate(cycle):
+                if node == _from:
+                    try:
+                        _to = cycle[idx + 1]
+                    except:  # noqa
+                        _to = cycle[0]
+
+            if _to is not None:
+                break
 
     log(f"removed {_from} -> {_to}")
     G.remove_edge(_from, _to)
+    if removed is not None:
+        removed.append((_from, _to))
+
     return G
 
 
-def dagify(G):
-    while True:
-        cycles = list(nx.simple_cycles(G))
-        if len(cycles) > 0:
-            G = remove_edge_causing_most_cycles(G, cycles)
+def _cyclic_components(G, nodes=None):
+    """Yield strongly connected components that contain at least one cycle."""
+    H = G if nodes is None else G.subgraph(nodes)
+    for scc in nx.strongly_connected_components(H):
+        if len(scc) > 1:
+            yield scc
+        else:
+            node = next(iter(scc))
+            if G.has_edge(node, node):
+                yield scc
+
+
+def _eades_order(G, nodes):
+    """Eades-Lin-Smyth vertex ordering of the subgraph induced by `nodes`.
+
+    __ https://doi.org/10.1016/0020-0190(93)90079-O
+    """
+    succ = {node: set(G.successors(node)) & nodes for node in nodes}
+    pred = {node: set(G.predecessors(node)) & nodes for node in nodes}
+    for node in nodes:
+        succ[node].discard(node)
+        pred[node].discard(node)
+
+    outdeg = {node: len(succ[node]) for node in nodes}
+    indeg = {node: len(pred[node]) for node in nodes}
+    buckets = {}
+    for node in nodes:
+        buckets.setdefault(outdeg[node] - indeg[node], set()).add(node)
+
+    _max = max(buckets)
+    removed = set()
+    left = []
+    right = []
+
+    def _remove(node):
+        nonlocal _max
+        removed.add(node)
+        buckets[outdeg[node] - indeg[node]].discard(node)
+        for p in pred[node]:
+            if p not in removed:
+                buckets[outdeg[p] - indeg[p]].discard(p)
+                outdeg[p] -= 1
+                buckets.setdefault(outdeg[p] - indeg[p], set()).add(p)
+
+        for s in succ[node]:
+            if s not in removed:
+                buckets[outdeg[s] - indeg[s]].discard(s)
+                indeg[s] -= 1
+                delta = outdeg[s] - indeg[s]
+                buckets.setdefault(delta, set()).add(s)
+                _max = max(_max, delta)
+
+    sinks = [node for node in nodes if outdeg[node] == 0]
+    sources = [node for node in nodes if indeg[node] == 0 and outdeg[node] > 0]
+    while len(removed) < len(nodes):
+        if sinks:
+            node = sinks.pop()
+            if node in removed:
+                continue
+
+            right.append(node)
+        elif sources:
+            node = sources.pop()
+            if node in removed or outdeg[node] == 0:
+                continue
+
+            left.append(node)
+        else:
+            while not buckets.get(_max):
+                _max -= 1
+
+            node = next(iter(buckets[_max]))
+            left.append(node)
+
+        _remove(node)
+        for p in pred[node]:
+            if p not in removed and outdeg[p] == 0:
+                sinks.append(p)
+
+        for s in succ[node]:
+            if s not in removed and indeg[s] == 0:
+                sources.append(s)
+
+    return left + right[::-1]
+
+
+def _back_edges(G, scc, rank):
+    return [
+        (u, v) for u in scc for v in set(G.successors(u)) & scc if rank[u] >= rank[v]
+    ]
+
+
+def component_rank(G, scc):
+    """Position of every node of a cyclic component, see `feedback_arc_set`.
+
+    The edges pointing backwards in this order break every cycle of `scc`.
+    """
+    order = _eades_order(G, scc)
+    pos = {node: idx for idx, node in enumerate(order)}
+    rank = {}
+    for node in order:
+        if "." in node:
+            rank[node] = pos[node]
         else:
-            break
+            consumers = [s for s in G.successors(node) if s in scc and s != node]
+            rank[node] = min(pos[s] for s in consumers or [node]) - 0.5
+
+    if any("." not in u for u, _ in _back_edges(G, scc, rank)):
+        return pos
+
+    return rank
+
+
+def feedback_arc_set(G):
+    """Approximate minimum feedback arc set made of software -> data edges.
+
+    Software executions are ordered by Eades-Lin-Smyth inside every cyclic
+    component and each data node is placed right before its first consumer,
+    so only edges leaving a software node point backwards. Components that
+    cannot be broken that way (e.g. data -> data cycles) fall back to the plain
+    ordering.
+    """
+    edges = []
+    for scc in _cyclic_components(G):
+        edges.extend(_back_edges(G, scc, component_rank(G, scc)))
+
+    return edges
+
+
+def _remove_edges(G, edges):
+    for _from, _to in edges:
+        log(f"removed {_from} -> {_to}")
+        G.remove_edges_from([(_from, _to)] * G.number_of_edges(_from, _to))
+
+
+def _dagify_fas(G):
+    removed = feedback_arc_set(G)
+    _remove_edges(G, removed)
+    return removed
+
+
+def _dagify_scc(G, max_cycles):
+    """Enumerate at most `max_cycles` cycles per component before each removal.
+
+    When no listed cycle has a software node there is no software edge to
+    pick, the component is broken by its `feedback_arc_set` ordering instead.
+    """
+    removed = []
+    stack = list(_cyclic_components(G))
+    while stack:
+        scc = stack.pop()
+        cycles = list(islice(nx.simple_cycles(G.subgraph(scc)), max_cycles))
+        if any("." in node for cycle in cycles for node in cycle):
+            G = remove_edge_causing_most_cycles(G, cycles, removed)
+        else:
+            edges = _back_edges(G, scc, component_rank(G, scc))
+            _remove_edges(G, edges)
+            removed.extend(edges)
+
+        stack.extend(_cyclic_components(G, scc))
+
+    return removed
+
+
+def dagify(G, mode="fas", max_cycles=1000):
+    """Remove cycles from the execution graph.
+
+    :param mode: ``fas`` for the near-linear feedback arc set or ``scc`` for
+        the bounded cycle enumeration inside each strongly connected component
+    """
+    if mode == "fas":
+        removed = _dagify_fas(G)
+    elif mode == "scc":
+        removed = _dagify_scc(G, max_cycles)
+    else:
+        raise ValueError(f"unknown dagify mode: {mode}")
 
+    log(f"* removed_edges_len={len(removed)}")
     return G
 
 
-def main():
-    fn = "original.gv"
-    G = nx.drawing.nx_pydot.read_dot(fn)
+def main(fn):
+    G = read_dot(fn)
     G = dagify(G)
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else "original.gv")
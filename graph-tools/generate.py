@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+
+import numpy as np
+
+#: nodes are written in chunks so 1e6-node graphs do not build one big string
+CHUNK = 1 << 16
+
+
+def _distance(rng, locality, size):
+    """How far back, in files written, an execution looks for its inputs."""
+    return rng.geometric(1.0 / max(locality, 1), size) - 1
+
+
+def generate(
+    fn,
+    nodes=10000,
+    fan_in=2.0,
+    fan_out=2.0,
+    cycles=0.01,
+    reexec=3.0,
+    locality=1000,
+    sources=0.05,
+    seed=0,
+):
+    """Write a synthetic execution graph in the `.gv` layout of `original.gv`.
+
+    Software executions are `name.idx` nodes with a global execution counter
+    as `idx`, data files are md5-named nodes and every node has a `weight`
+    (file size or runtime). Executions read on average `fan_in` files, mostly
+    recent ones (see `locality`), and write `fan_out` new files.
+
+    :param nodes: approximate number of nodes
+    :param cycles: fraction of executions that also read a file written
+        downstream of them, closing a cycle
+    :param reexec: average number of executions of the same software
+    :param sources: fraction of the nodes that are raw input files
+    :returns: dict with the node and edge counts, a raw input `source` and a
+        file written by the last execution, `sink`
+    """
+    rng = np.random.default_rng(seed)
+    n_sources = max(1, int(nodes * sources))
+    n_exec = max(1, int((nodes - n_sources) / (1 + fan_out)))
+    k_in = 1 + rng.poisson(max(fan_in - 1, 0), n_exec)
+    k_out = 1 + rng.poisson(max(fan_out - 1, 0), n_exec)
+    #: number of files that exist when each execution starts
+    written = n_sources + np.concatenate(([0], np.cumsum(k_out)[:-1]))
+    n_data = n_sources + int(k_out.sum())
+
+    in_exec = np.repeat(np.arange(n_exec), k_in)
+    in_data = (
+        written[in_exec] - 1 - _distance(rng, locality, len(in_exec)) % written[in_exec]
+    )
+    #: a file is read once per execution
+    pairs = np.unique(in_exec.astype(np.int64) * n_data + in_data)
+    in_exec, in_data = pairs // n_data, pairs % n_data
+
+    #: a cycle: the execution also reads the first file written by a reader
+    #: of its own first output
+    late = np.flatnonzero(rng.random(n_exec) < cycles)
+    by_data = np.argsort(in_data, kind="stable")
+    pos = np.searchsorted(in_data[by_data], written[late])
+    pos = np.minimum(pos, len(by_data) - 1)
+    reader = in_exec[by_data[pos]]
+    found = in_data[by_data[pos]] == written[late]
+    in_exec = np.concatenate((in_exec, late[found]))
+    in_data = np.concatenate((in_data, written[reader[found]]))
+    out_exec = np.repeat(np.arange(n_exec), k_out)
+    out_data = np.arange(n_sources, n_data)
+
+    data_ids = [
+        hashlib.md5(f"{seed}:{idx}".encode()).hexdigest() for idx in range(n_data)
+    ]
+    families = rng.integers(1, max(1, round(n_exec / reexec)) + 1, n_exec)
+    sw_ids = [f"{name}.{idx}" for idx, name in enumerate(families.tolist(), start=1)]
+    data_weight = np.maximum(1, rng.lognormal(3.0, 1.5, n_data)).astype(np.int64)
+    sw_weight = np.maximum(1, rng.lognormal(2.0, 1.0, n_exec)).astype(np.int64)
+
+    #: edges of an execution are grouped, its inputs before its outputs
+    order = np.argsort(
+        np.concatenate((in_exec * 2, out_exec * 2 + 1)), kind="stable"
+    ).tolist()
+    n_in = len(in_exec)
+    in_exec, in_data = in_exec.tolist(), in_data.tolist()
+    out_exec, out_data = out_exec.tolist(), out_data.tolist()
+
+    def _edges():
+        for idx in order:
+            if idx < n_in:
+                yield f'    "{data_ids[in_data[idx]]}"->"{sw_ids[in_exec[idx]]}"\n'
+            else:
+                idx -= n_in
+                yield f'    "{sw_ids[out_exec[idx]]}"->"{data_ids[out_data[idx]]}"\n'
+
+    def _nodes(ids, weights):
+        for node, weight in zip(ids, weights.tolist()):
+            yield f'    "{node}" [weight={weight}]\n'
+
+    with open(fn, "w") as f:
+        f.write("digraph G {\n    rankdir=LR;\n")
+        f.write("    node [style=filled fillcolor=white,shape=circle];\n")
+        _write(f, _nodes(data_ids, data_weight))
+        f.write('    //\n    node [style=filled fillcolor="#b3ffb3",shape=box]\n')
+        _write(f, _nodes(sw_ids, sw_weight))
+        f.write("    //\n")
+        _write(f, _edges())
+        f.write("}\n")
+
+    return {
+        "nodes": n_data + n_exec,
+        "edges": n_in + len(out_exec),
+        "source": data_ids[0],
+        "sink": data_ids[-1],
+    }
+
+
+def _write(f, lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == CHUNK:
+            f.write("".join(chunk))
+            chunk = []
+
+    f.write("".join(chunk))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic execution graph")
+    parser.add_argument("output", metavar="[file.gv]")
+    parser.add_argument("--nodes", type=float, default=10000)
+    parser.add_argument("--fan_in", type=float, default=2.0)
+    parser.add_argument("--fan_out", type=float, default=2.0)
+    parser.add_argument("--cycles", type=float, default=0.01)
+    parser.add_argument("--reexec", type=float, default=3.0)
+    parser.add_argument("--locality", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    stats = generate(
+        args.output,
+        nodes=int(args.nodes),
+        fan_in=args.fan_in,
+        fan_out=args.fan_out,
+        cycles=args.cycles,
+        reexec=args.reexec,
+        locality=args.locality,
+        seed=args.seed,
+    )
+    print(f"{args.output}: {stats['nodes']} nodes, {stats['edges']} edges")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,49 +3,63 @@
 from broker._utils._log import log
 from broker._utils.tools import print_tb
 from broker.errors import QuietExit
-import networkx as nx
-
-
-def page_rank(fn):
+from execution_graph import ExecutionGraph
+from loader import read_dot
+import numpy as np
+import pagerank
+import parallel
+import reachability
+import sys
+import upstream
+
+
+def page_rank(
+    fn,
+    alpha=0.9,
+    tol=1.0e-06,
+    top=None,
+    warm_start=None,
+    families=None,
+    software_only=False,
+):
+    """Print the PageRank of the software executions.
+
+    :param top: print only the `top` highest ranked executions
+    :param warm_start: `.npz` file the rank is started from, when it exists,
+        and saved back to
+    :param families: software names the teleport is biased toward
+    """
     if type(fn) is list:
         fn = fn[0]
 
-    G = nx.drawing.nx_pydot.read_dot(fn)
-    index_k = 0
-    _max = 0.0
-    pr = nx.pagerank(G, alpha=0.9)
-    #: sort by values
-    pr = {k: v for k, v in sorted(pr.items(), key=lambda item: item[1])}
-    log("#> PageRank results of each software execution:")
-    for key, value in pr.items():
-        if "." in key:
+    G = ExecutionGraph.read(fn)
+    p = None
+    if families or software_only:
+        p = pagerank.personalization(G, families=families, software_only=software_only)
+
+    x0 = pagerank.load_rank(G, warm_start) if warm_start else None
+    pr, iterations = pagerank.pagerank(G, alpha=alpha, p=p, x0=x0, tol=tol)
+    if warm_start:
+        pagerank.save_rank(G, warm_start, pr)
+
+    log(f"#> PageRank results of each software execution ({iterations} iterations):")
+    if top:
+        for key, value in pagerank.top_k(G, pr, top):
             print(f"{key} => {value}")
+    else:
+        #: sort by values
+        for idx in G.software[np.argsort(pr[G.software], kind="stable")]:
+            print(f"{G.ids[idx]} => {pr[idx]}")
 
-        if value > _max:
-            index_k = key
-            _max = value
+    if not len(G):
+        return 0
 
-    # print(f"* pr {index_k} => {_max}")
-    return index_k
+    return G.ids[int(np.argmax(pr))]
 
 
 def _knocked_down(G, knocked_rate, node, is_verbose=False):
-    queue = [node]
-    knocked = [node]
-    while True:
-        if queue:
-            init_node = queue[0]
-            for edge in G.out_edges(init_node):
-                out_node = edge[1]
-                if out_node not in knocked:
-                    queue.append(out_node)
-                    knocked.append(out_node)
-
-            queue.remove(init_node)
-        else:
-            knocked_rate[node] = len(knocked)
-            break
-
+    knocked = reachability.knocked(G, node)
+    knocked_rate[node] = len(knocked)
     if is_verbose:
         log(f"* knocked_node_size={len(knocked)} for node={node}")
         for knocked_node in knocked:
@@ -56,16 +70,26 @@ def _knocked_down(G, knocked_rate, node, is_verbose=False):
 
 
 def knocked_down(fn, start_node):
-    G = nx.drawing.nx_pydot.read_dot(fn)
+    G = read_dot(fn)
     knocked_rate = {}
     _knocked_down(G, knocked_rate, start_node, is_verbose=True)
 
 
-def _most_knocked_down(G, data_nodes):
-    knocked_rate = {}
-    for start_node in data_nodes:
-        _knocked_down(G, knocked_rate, start_node)
+def _most_knocked_down(G, data_nodes, workers=1, knocked_rate=None):
+    """Data node that knocks down the most nodes.
+
+    :param workers: size of the process pool, 1 runs in this process
+    :param knocked_rate: dict filled with the count of every data node
+    """
+    if workers > 1:
+        rate = parallel.descendant_counts(G, data_nodes, workers)
+    else:
+        rate = reachability.descendant_counts(G, data_nodes)
+
+    if knocked_rate is not None:
+        knocked_rate.update(rate)
 
+    knocked_rate = rate
     _key = 0
     _max = 0
     for key, value in knocked_rate.items():
@@ -78,48 +102,49 @@ def _most_knocked_down(G, data_nodes):
     return _key, _max
 
 
-def most_knocked_down(fn):
+def most_knocked_down(fn, workers=1):
     if type(fn) is list:
         fn = fn[0]
 
-    G = nx.drawing.nx_pydot.read_dot(fn)
-    #
-    sw_nodes = []
-    data_nodes = []
-    for node in list(G.nodes):
-        if "." in node:
-            sw_nodes.append(node)
-        else:
-            data_nodes.append(node)
-
-    node, knocked = _most_knocked_down(G, data_nodes)
+    G = ExecutionGraph.read(fn)
+    data_nodes = [G.ids[idx] for idx in G.data]
+    node, knocked = _most_knocked_down(G, data_nodes, workers)
     return node, knocked
 
 
-def _jump_one_step_behind(G, init_node):
-    track = {}
-    for edge in G.in_edges(init_node):
-        _sum = 0
-        for _edge in G.in_edges(edge[0]):
-            _sum += float(G.nodes[_edge[0]]["weight"])
+def _jump_one_step_behind(G, init_node, hops=1, decay=1.0):
+    """Summed input weight of each predecessor of `init_node`, smallest first.
 
-        track[_edge[1]] = _sum
+    :param hops: also sum the weights up to `hops` hops behind each
+        predecessor, see `upstream.UpstreamScores`
+    """
+    return upstream.UpstreamScores(G, hops, decay).predecessors([init_node])[init_node]
 
-    pr = {k: v for k, v in sorted(track.items(), key=lambda item: item[1])}
-    return pr
-    breakpoint()  # DEBUG
 
+def jump_one_step_behind(fn, init_node, hops=1, decay=1.0):
+    G = ExecutionGraph.read(fn)
+    return _jump_one_step_behind(G, init_node, hops, decay)
+
+
+def upstream_contributors(fn, nodes, hops=3, decay=1.0, top=10):
+    """Print the `top` upstream contributors of each node, `hops` hops back."""
+    if type(fn) is list:
+        fn = fn[0]
+
+    scores = upstream.UpstreamScores(ExecutionGraph.read(fn), hops, decay)
+    results = scores.contributors(nodes, top)
+    for node, contributors in results.items():
+        log(f"#> upstream contributors of {node} ({hops} hops):")
+        for key, value in contributors:
+            print(f"{key} => {value}")
 
-def jump_one_step_behind(fn, init_node):
-    G = nx.drawing.nx_pydot.read_dot(fn)
-    return _jump_one_step_behind(G, init_node)
+    return results
 
 
-def main():
-    fn = "original.gv"
-    G = nx.drawing.nx_pydot.read_dot(fn)
+def main(fn, start_node="11", behind_node="42"):
+    G = read_dot(fn)
 
-    _jump_one_step_behind(G, "42")
+    _jump_one_step_behind(G, behind_node)
     #
     sw_nodes = []
     data_nodes = []
@@ -137,14 +162,13 @@ def main():
     log(f"* node={node} most_knocked_len={knocked}")
     #
     knocked_rate = {}
-    start_node = "11"
     _knocked_down(G, knocked_rate, start_node, is_verbose=True)
     breakpoint()  # DEBUG
 
 
 if __name__ == "__main__":
     try:
-        main()
+        main(sys.argv[1] if len(sys.argv) > 1 else "original.gv")
     except KeyboardInterrupt:
         pass
     except QuietExit as e:
@@ -2,8 +2,15 @@
 
 import argparse
 from merge import merge
-from graph import page_rank, most_knocked_down, knocked_down, jump_one_step_behind
+from graph import (
+    page_rank,
+    most_knocked_down,
+    knocked_down,
+    jump_one_step_behind,
+    upstream_contributors,
+)
 from dagify import dagify
+from daemon import ACTIONS, batch, serve
 from broker._utils._log import log
 import pathlib
 
@@ -32,6 +39,23 @@ parser.add_argument(
     nargs=1,
     help="Calculate page pagerank on the given graph",
 )
+parser.add_argument(
+    "--top", type=int, help="Only print the k highest ranked software executions"
+)
+parser.add_argument(
+    "--tol", type=float, default=1.0e-06, help="PageRank convergence tolerance"
+)
+parser.add_argument(
+    "--warm_start",
+    metavar="[rank.npz]",
+    help="Start PageRank from the rank saved in the given file and update it",
+)
+parser.add_argument(
+    "--family",
+    metavar="[name]",
+    nargs="+",
+    help="Bias the PageRank teleport toward the given software names",
+)
 parser.add_argument(
     "--most_knocked_down",
     metavar="[file.gv]",
@@ -39,6 +63,12 @@ parser.add_argument(
     nargs=1,
     help="Node that most nodes knocked down",
 )
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="Number of processes --most_knocked_down runs on",
+)
 parser.add_argument(
     "--knocked_down",
     metavar="[file.gv] [n]",
@@ -51,6 +81,60 @@ parser.add_argument(
     nargs=2,
     help="JumpOneStepBehind",
 )
+parser.add_argument(
+    "--upstream",
+    metavar="[file.gv] [n]",
+    nargs="+",
+    help="Nodes behind the given nodes that contribute the most weight to them",
+)
+parser.add_argument(
+    "--hops",
+    type=int,
+    help="Hops back --upstream and --jump_one_step_behind look, 3 and 1 by default",
+)
+parser.add_argument(
+    "--decay",
+    type=float,
+    nargs="+",
+    default=[1.0],
+    help="Weight factor per hop back, a single value d weighs hop h by d^(h-1)",
+)
+parser.add_argument(
+    "--batch",
+    metavar="[file.gv]",
+    help="Run the --actions on a single load of the graph, output as JSON Lines",
+)
+parser.add_argument(
+    "--actions",
+    nargs="+",
+    choices=sorted(ACTIONS),
+    default=["knocked_down"],
+    help="Actions of the --batch run",
+)
+parser.add_argument(
+    "--nodes",
+    metavar="[n]",
+    nargs="+",
+    default=[],
+    help="Start nodes of knocked_down and jump_one_step_behind in a --batch run",
+)
+parser.add_argument(
+    "--nodes_file",
+    metavar="[file]",
+    type=pathlib.Path,
+    help="File with one start node per line",
+)
+parser.add_argument(
+    "--daemon",
+    metavar="[file.gv]",
+    nargs="*",
+    help="Keep the given graphs loaded and answer JSON queries over stdin or --socket",
+)
+parser.add_argument(
+    "--socket",
+    metavar="[path]",
+    help="Unix socket the daemon listens on",
+)
 
 args = parser.parse_args()
 if args.verbosity:
@@ -58,17 +142,43 @@ if args.verbosity:
 elif args.merge:
     merge(args.merge)
 elif args.pagerank:
-    page_rank(args.pagerank)
+    page_rank(
+        args.pagerank,
+        tol=args.tol,
+        top=args.top,
+        warm_start=args.warm_start,
+        families=args.family,
+    )
 elif args.most_knocked_down:
-    node, knocked = most_knocked_down(args.most_knocked_down)
+    node, knocked = most_knocked_down(args.most_knocked_down, args.workers)
     log(f"* node={node} ; most_knocked_len={knocked}")
 elif args.knocked_down:
     knocked_down(args.knocked_down[0], args.knocked_down[1])
 elif args.jump_one_step_behind:
     pr = jump_one_step_behind(
-        args.jump_one_step_behind[0], args.jump_one_step_behind[1]
+        args.jump_one_step_behind[0],
+        args.jump_one_step_behind[1],
+        args.hops or 1,
+        args.decay[0] if len(args.decay) == 1 else args.decay,
     )
     log("#> Nodes from smallest sum of input to greatest:")
     log(pr)
+elif args.upstream:
+    upstream_contributors(
+        args.upstream[0],
+        args.upstream[1:],
+        args.hops or 3,
+        args.decay[0] if len(args.decay) == 1 else args.decay,
+        args.top or 10,
+    )
 elif args.dagify:
     dagify(args.dagify[0])
+elif args.batch:
+    nodes = args.nodes
+    if args.nodes_file:
+        with open(args.nodes_file) as f:
+            nodes = nodes + [line.strip() for line in f if line.strip()]
+
+    batch(args.batch, args.actions, nodes)
+elif args.daemon is not None:
+    serve(args.daemon, args.socket)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import random
+
+import numpy as np
+
+from execution_graph import ExecutionGraph
+import reachability
+
+#: scenarios held by one mask word
+WORD = 64
+#: bits of every 16-bit value, lowest first
+BITS = np.unpackbits(
+    np.arange(1 << 16, dtype="<u2").view(np.uint8).reshape(-1, 2),
+    axis=1,
+    bitorder="little",
+)
+
+
+class ImpactAnalysis:
+    """What-if failure sets evaluated together, 64 scenarios per mask word.
+
+    Strongly connected components are collapsed once and grouped by their
+    longest-path level on the condensed DAG. Every arc leaves a component of
+    a lower level, so a sweep ORs the `uint64` masks of one level into their
+    successors with a single `bitwise_or.reduceat` per level, and the masks of
+    every component are final when its level is reached.
+
+        analysis = ImpactAnalysis(ExecutionGraph.read("original.gv"))
+        impact = analysis.run([["22.15"], ["42", "11"]])
+        impact.sizes  # nodes knocked down by each scenario
+    """
+
+    def __init__(self, G):
+        self.G = G = reachability.as_execution_graph(G)
+        labels, sizes, indptr, indices, order = reachability.condense(G)
+        self.labels = labels
+        self.comp_sizes = sizes
+        ncomp = len(sizes)
+        level = [0] * ncomp
+        for comp in order:
+            below = level[comp] + 1
+            for succ in indices[indptr[comp] : indptr[comp + 1]]:
+                if level[succ] < below:
+                    level[succ] = below
+
+        src = np.repeat(np.arange(ncomp, dtype=np.int64), np.diff(indptr))
+        dst = np.asarray(indices, dtype=np.int64)
+        level = np.asarray(level, dtype=np.int64)
+        edges = np.lexsort((dst, level[src]))
+        src, dst = src[edges], dst[edges]
+        bounds = np.flatnonzero(np.diff(level[src])) + 1
+        #: per level, the arc sources and the first arc of every target
+        self.steps = []
+        for s, d in zip(np.split(src, bounds), np.split(dst, bounds)):
+            if len(d) == 0:
+                continue
+
+            first = np.flatnonzero(np.r_[True, d[1:] != d[:-1]])
+            self.steps.append((s, d[first], first))
+
+    def run(self, scenarios):
+        """Propagate every scenario, a list of failed nodes, in one sweep."""
+        scenarios = [list(nodes) for nodes in scenarios]
+        words = max(1, -(-len(scenarios) // WORD))
+        masks = np.zeros((len(self.comp_sizes), words), dtype=np.uint64)
+        comps, scenario = [], []
+        for i, nodes in enumerate(scenarios):
+            comps.extend(self.labels[self.G.index[node]] for node in nodes)
+            scenario.extend([i] * len(nodes))
+
+        scenario = np.asarray(scenario, dtype=np.uint64)
+        np.bitwise_or.at(
+            masks,
+            (np.asarray(comps, dtype=np.int64), (scenario // WORD).astype(np.int64)),
+            np.uint64(1) << (scenario % np.uint64(WORD)),
+        )
+        for src, targets, first in self.steps:
+            masks[targets] |= np.bitwise_or.reduceat(masks[src], first, axis=0)
+
+        return Impact(self, masks, len(scenarios))
+
+
+class Impact:
+    """Knocked-down sets of the scenarios of one `ImpactAnalysis.run`."""
+
+    def __init__(self, analysis, masks, n):
+        self.analysis = analysis
+        self.masks = masks
+        self.n = n
+        self._sizes = None
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def sizes(self):
+        """Number of nodes knocked down by every scenario, failed ones included."""
+        if self._sizes is None:
+            ncomp, words = self.masks.shape
+            #: a word is 4 little-endian 16-bit lanes, a weighted histogram of
+            #: the lane values gives the sizes of 16 scenarios at once
+            lanes = np.tile(np.arange(4, dtype=np.intp) << 16, ncomp)
+            weights = np.repeat(self.analysis.comp_sizes.astype(np.float64), 4)
+            bits = BITS.astype(np.float64)
+            counts = np.empty(words * WORD)
+            for word in range(words):
+                column = self.masks[:, word].astype("<u8").view("<u2")
+                hist = np.bincount(column + lanes, weights=weights, minlength=4 << 16)
+                counts[word * WORD : (word + 1) * WORD] = (
+                    hist.reshape(4, 1 << 16) @ bits
+                ).ravel()
+
+            self._sizes = np.rint(counts[: self.n]).astype(np.int64)
+
+        return self._sizes
+
+    def _hit(self, i):
+        word, bit = divmod(i, WORD)
+        return ((self.masks[:, word] >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+
+    def members(self, i):
+        """Nodes knocked down by scenario `i`."""
+        analysis = self.analysis
+        nodes = np.flatnonzero(self._hit(i)[analysis.labels])
+        return [analysis.G.ids[idx] for idx in nodes.tolist()]
+
+    def contains(self, i, node):
+        """True when scenario `i` knocks `node` down."""
+        analysis = self.analysis
+        word, bit = divmod(i, WORD)
+        mask = int(self.masks[analysis.labels[analysis.G.index[node]], word])
+        return bool(mask >> bit & 1)
+
+    def most_knocked_down(self):
+        """Index of the scenario that knocks down the most nodes, and its size.
+
+        Without scenarios it is `(-1, 0)`.
+        """
+        if self.n == 0:
+            return -1, 0
+
+        i = int(np.argmax(self.sizes))
+        return i, int(self.sizes[i])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Impact of what-if failure sets")
+    parser.add_argument("input", metavar="[file.gv]")
+    parser.add_argument(
+        "--scenarios",
+        metavar="[file.jsonl]",
+        help="one list of failed nodes per line",
+    )
+    parser.add_argument(
+        "--random",
+        type=int,
+        default=0,
+        help="also evaluate this many sets of random data nodes",
+    )
+    parser.add_argument(
+        "--size", type=int, default=20, help="failed nodes of a random set"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--members", action="store_true", help="print the knocked-down nodes too"
+    )
+    args = parser.parse_args()
+    G = ExecutionGraph.read(args.input)
+    scenarios = []
+    if args.scenarios:
+        with open(args.scenarios) as f:
+            scenarios = [json.loads(line) for line in f if line.strip()]
+
+    rng = random.Random(args.seed)
+    data = [G.ids[idx] for idx in G.data.tolist()]
+    for _ in range(args.random):
+        scenarios.append(rng.sample(data, min(args.size, len(data))))
+
+    impact = ImpactAnalysis(G).run(scenarios)
+    for i, size in enumerate(impact.sizes.tolist()):
+        result = {"scenario": i, "knocked": size}
+        if args.members:
+            result["nodes"] = impact.members(i)
+
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
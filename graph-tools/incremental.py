@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+
+import argparse
+import heapq
+import json
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from execution_graph import ExecutionGraph
+from find_and_remove_cycles import component_rank
+import pagerank
+import reachability
+
+
+class IncrementalGraph:
+    """Execution graph whose analyses follow edge insertions and deletions.
+
+    - PageRank is kept as the unnormalized solution `z` of
+      `z = alpha * M @ z + 1` plus a residual; the rank is `z / z.sum()`,
+      the same fixed point as `pagerank.pagerank` with a uniform teleport.
+      A changed edge moves residual onto the successors of its tail only, and
+      the residual is pushed forward until every entry is below `tol`.
+    - Descendant counts of data nodes are cached; a changed edge marks its
+      tail and the tail's ancestors stale, an inserted one also raises their
+      counts by what its head reaches so they stay upper bounds. A stale
+      count is recomputed when it is asked for, or when it is the largest
+      bound left in `most_knocked_down`.
+    - Cycles are tracked with a topological order of the graph without a set
+      of feedback edges, kept by the Pearce-Kelly algorithm: an insertion only
+      reorders the nodes between its endpoints and becomes a feedback edge
+      when it closes a cycle. A deletion retries the feedback edges whose
+      cycle may have run through it.
+
+    __ https://doi.org/10.1145/1187436.1210590
+    """
+
+    def __init__(self, G=None, alpha=0.9, tol=1.0e-06):
+        self.alpha = alpha
+        self.tol = tol
+        self.succ = {}
+        self.pred = {}
+        self.out_weight = {}
+        self.seq = {}
+        self._next = 0
+        self.ord = {}
+        self.feedback = {}
+        self.z = {}
+        self.r = {}
+        self.total = 0.0
+        self.counts = {}
+        self.stale = set()
+        #: stale nodes whose ancestors are all stale too, a walk stops there
+        self._closed = set()
+        self._heap = []
+        self._queue = deque()
+        self._queued = set()
+        self.pushes = 0
+        self.recomputed = 0
+        if G is not None:
+            self._load(G)
+
+    @classmethod
+    def read(cls, fn, **kwargs):
+        return cls(ExecutionGraph.read(fn), **kwargs)
+
+    def __len__(self):
+        return len(self.succ)
+
+    def __contains__(self, node):
+        return node in self.succ
+
+    def successors(self, node):
+        return self.succ[node].keys()
+
+    def predecessors(self, node):
+        return self.pred[node].keys()
+
+    def _load(self, G):
+        """Everything computed once for the whole graph."""
+        indptr, indices = G.lists()
+        for node in G.ids:
+            self._new_node(node)
+
+        for idx, node in enumerate(G.ids):
+            succ = self.succ[node]
+            for out_idx in indices[indptr[idx] : indptr[idx + 1]]:
+                v = G.ids[out_idx]
+                succ[v] = succ.get(v, 0) + 1
+                self.pred[v][node] = self.pred[v].get(node, 0) + 1
+
+            self.out_weight[node] = indptr[idx + 1] - indptr[idx]
+
+        #: rank from the vectorized power iteration, scaled to `z`
+        x, _ = pagerank.pagerank(G, alpha=self.alpha, tol=self.tol)
+        dangling = np.diff(G.indptr) == 0
+        total = len(G) / ((1 - self.alpha) + self.alpha * x[dangling].sum())
+        z = x * total
+        out_weight = np.maximum(np.diff(G.indptr), 1)
+        residual = 1.0 - z + self.alpha * (G.adjacency().T @ (z / out_weight))
+        for node, value, res in zip(G.ids, z.tolist(), residual.tolist()):
+            self.z[node] = value
+            self.r[node] = 0.0
+            self._add_residual(node, res)
+
+        self.total = float(z.sum())
+
+        #: topological order of the condensed graph, cyclic components are
+        #: ordered like `feedback_arc_set` and their back edges are feedback
+        labels, _, _, _, order = reachability.condense(G)
+        members = {}
+        for node, label in zip(G.ids, labels.tolist()):
+            members.setdefault(label, []).append(node)
+
+        position = 0
+        for comp in order:
+            nodes = members[comp]
+            if len(nodes) > 1 or nodes[0] in self.succ[nodes[0]]:
+                scc = set(nodes)
+                rank = component_rank(self, scc)
+                nodes = sorted(nodes, key=rank.__getitem__)
+                for u in nodes:
+                    for v in self.succ[u]:
+                        if v in scc and rank[u] >= rank[v]:
+                            self.feedback[(u, v)] = None
+
+            for node in nodes:
+                self.ord[node] = position
+                position += 1
+
+        data = [G.ids[idx] for idx in G.data]
+        self.counts = reachability.descendant_counts(G, data)
+        self._heap = [
+            (-count, self.seq[node], node) for node, count in self.counts.items()
+        ]
+        heapq.heapify(self._heap)
+        self._push()
+
+    def _new_node(self, node):
+        self.succ[node] = {}
+        self.pred[node] = {}
+        self.out_weight[node] = 0
+        #: new nodes go last, which keeps the order topological
+        self.seq[node] = self.ord[node] = self._next
+        self._next += 1
+        self.z[node] = 0.0
+        self.r[node] = 0.0
+
+    def add_node(self, node):
+        if node in self.succ:
+            return
+
+        self._new_node(node)
+        #: the teleport term of the new node
+        self._add_residual(node, 1.0)
+        if "." not in node:
+            self.counts[node] = 1
+            heapq.heappush(self._heap, (-1, self.seq[node], node))
+
+    # PageRank
+
+    def _add_residual(self, node, value):
+        self.r[node] += value
+        if abs(self.r[node]) > self.tol and node not in self._queued:
+            self._queued.add(node)
+            self._queue.append(node)
+
+    def _move_column(self, u, old_succ, old_weight):
+        """Residual of the successors of `u` after its out edges changed."""
+        z = self.alpha * self.z[u]
+        if not z:
+            return
+
+        new_weight = self.out_weight[u]
+        new_succ = self.succ[u]
+        for v in old_succ.keys() | new_succ.keys():
+            old = old_succ.get(v, 0) / old_weight if old_weight else 0.0
+            new = new_succ.get(v, 0) / new_weight if new_weight else 0.0
+            if new != old:
+                self._add_residual(v, z * (new - old))
+
+    def _push(self):
+        """Forward push until every residual is below `tol`."""
+        alpha = self.alpha
+        tol = self.tol
+        queue = self._queue
+        queued = self._queued
+        z = self.z
+        r = self.r
+        while queue:
+            u = queue.popleft()
+            queued.discard(u)
+            value = r[u]
+            if abs(value) <= tol:
+                continue
+
+            r[u] = 0.0
+            z[u] += value
+            self.total += value
+            self.pushes += 1
+            if not self.out_weight[u]:
+                continue
+
+            share = alpha * value / self.out_weight[u]
+            for v, count in self.succ[u].items():
+                r[v] += share * count
+                if abs(r[v]) > tol and v not in queued:
+                    queued.add(v)
+                    queue.append(v)
+
+    def rank(self, node):
+        self._push()
+        return self.z[node] / self.total
+
+    def top_k(self, k, software_only=True):
+        self._push()
+        nodes = (n for n in self.z if "." in n) if software_only else self.z
+        top = heapq.nlargest(k, nodes, key=self.z.__getitem__)
+        return [(node, self.z[node] / self.total) for node in top]
+
+    # descendant counts
+
+    def _reach(self, node):
+        seen = {node}
+        stack = [node]
+        while stack:
+            for v in self.succ[stack.pop()]:
+                if v not in seen:
+                    seen.add(v)
+                    stack.append(v)
+
+        return seen
+
+    def _invalidate(self, node, grow=0):
+        """Mark `node` and its ancestors stale and raise their bounds by `grow`.
+
+        Without `grow` the walk stops at closed nodes, their ancestors are
+        already stale and their bounds stay upper bounds.
+        """
+        seen = {node}
+        stack = [node]
+        while stack:
+            u = stack.pop()
+            if not grow and u in self._closed:
+                continue
+
+            self.stale.add(u)
+            self._closed.add(u)
+            if grow and u in self.counts:
+                self.counts[u] += grow
+                heapq.heappush(self._heap, (-self.counts[u], self.seq[u], u))
+
+            for p in self.pred[u]:
+                if p not in seen:
+                    seen.add(p)
+                    stack.append(p)
+
+        if len(self._heap) > 2 * len(self.counts) + 1024:
+            self._heap = [(-c, self.seq[n], n) for n, c in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _refresh(self, node):
+        reach = self._reach(node)
+        count = self.counts[node] = len(reach)
+        self.stale.discard(node)
+        #: stale nodes downstream now have a fresh ancestor
+        self._closed -= reach
+        self.recomputed += 1
+        heapq.heappush(self._heap, (-count, self.seq[node], node))
+        return count
+
+    def descendant_count(self, node):
+        """Number of nodes knocked down from a data node, itself included."""
+        if node not in self.counts:
+            return len(self._reach(node))
+
+        if node in self.stale:
+            return self._refresh(node)
+
+        return self.counts[node]
+
+    def most_knocked_down(self):
+        """Data node that knocks down the most nodes, as `_most_knocked_down`.
+
+        The count of a stale node is an upper bound, it is only recomputed
+        when it reaches the top of the heap.
+        """
+        while self._heap:
+            count, seq, node = self._heap[0]
+            if self.counts.get(node) != -count or self.seq[node] != seq:
+                heapq.heappop(self._heap)
+            elif node in self.stale:
+                heapq.heappop(self._heap)
+                self._refresh(node)
+            else:
+                return node, -count
+
+        return 0, 0
+
+    # cycles
+
+    def _insert(self, u, v):
+        """Pearce-Kelly insertion of `u -> v`, False when it closes a cycle."""
+        lower = self.ord[v]
+        upper = self.ord[u]
+        if lower > upper:
+            return True
+
+        forward = [v]
+        seen = {v}
+        for w in forward:
+            for s in self.succ[w]:
+                if s == u:
+                    self.feedback[(u, v)] = None
+                    return False
+
+                if (
+                    s not in seen
+                    and self.ord[s] < upper
+                    and (w, s) not in self.feedback
+                ):
+                    seen.add(s)
+                    forward.append(s)
+
+        backward = [u]
+        seen = {u}
+        for w in backward:
+            for p in self.pred[w]:
+                if (
+                    p not in seen
+                    and self.ord[p] > lower
+                    and (p, w) not in self.feedback
+                ):
+                    seen.add(p)
+                    backward.append(p)
+
+        nodes = sorted(backward, key=self.ord.__getitem__)
+        nodes += sorted(forward, key=self.ord.__getitem__)
+        for node, position in zip(nodes, sorted(self.ord[node] for node in nodes)):
+            self.ord[node] = position
+
+        return True
+
+    def _retry_feedback(self, u, v):
+        """Retry the feedback edges that `u -> v` may have closed a cycle for.
+
+        Such a cycle ran `b ... u -> v ... a` along the order, so only the
+        feedback edges `a -> b` with `b` at or before `u` and `a` at or after
+        `v` can be inserted now.
+        """
+        lower, upper = self.ord[u], self.ord[v]
+        retry = [
+            (a, b)
+            for a, b in self.feedback
+            if self.ord[b] <= lower and self.ord[a] >= upper
+        ]
+        for a, b in retry:
+            del self.feedback[(a, b)]
+            self._insert(a, b)
+
+    @property
+    def is_dag(self):
+        return not self.feedback
+
+    # updates
+
+    def add_edge(self, u, v):
+        self.add_node(u)
+        self.add_node(v)
+        old_succ = dict(self.succ[u])
+        old_weight = self.out_weight[u]
+        count = self.succ[u].get(v, 0)
+        self.succ[u][v] = count + 1
+        self.pred[v][u] = count + 1
+        self.out_weight[u] += 1
+        self._move_column(u, old_succ, old_weight)
+        if not count:
+            #: every ancestor of `u` reaches at most that many more nodes
+            self._invalidate(u, self.descendant_count(v))
+            if u == v:
+                self.feedback[(u, v)] = None
+            else:
+                self._insert(u, v)
+
+    def remove_edge(self, u, v):
+        """Remove one `u -> v` edge, the last one also leaves the order."""
+        count = self.succ[u][v]
+        old_succ = dict(self.succ[u])
+        old_weight = self.out_weight[u]
+        if count == 1:
+            del self.succ[u][v]
+            del self.pred[v][u]
+        else:
+            self.succ[u][v] = count - 1
+            self.pred[v][u] = count - 1
+
+        self.out_weight[u] -= 1
+        self._move_column(u, old_succ, old_weight)
+        if count == 1:
+            self._invalidate(u)
+            if (u, v) in self.feedback:
+                del self.feedback[(u, v)]
+            else:
+                self._retry_feedback(u, v)
+
+    def remove_node(self, node):
+        for v, count in list(self.succ[node].items()):
+            for _ in range(count):
+                self.remove_edge(node, v)
+
+        for u, count in list(self.pred[node].items()):
+            for _ in range(count):
+                self.remove_edge(u, node)
+
+        #: an isolated node does not affect the rank of the others
+        self.total -= self.z.pop(node)
+        self._queued.discard(node)
+        if node in self._queue:
+            self._queue.remove(node)
+
+        for d in (self.succ, self.pred, self.out_weight, self.seq, self.ord, self.r):
+            del d[node]
+
+        self.counts.pop(node, None)
+        self.stale.discard(node)
+        self._closed.discard(node)
+
+    def add_record(self, node, input_hash, output_hash):
+        """Arcs of `addSoftwareExecRecord`, `node` is `<sourceCodeHash>.<index>`."""
+        self.add_node(node)
+        for h in input_hash:
+            self.add_edge(h, node)
+
+        for h in output_hash:
+            self.add_edge(node, h)
+
+    def del_record(self, node):
+        """`delSoftwareExecRecord`, the execution and all of its arcs go away."""
+        self.remove_node(node)
+
+    def apply(self, update):
+        """Apply one update of the json lines format read by `main`."""
+        for u, v in update.get("add", ()):
+            self.add_edge(u, v)
+
+        for u, v in update.get("remove", ()):
+            self.remove_edge(u, v)
+
+        if "record" in update:
+            self.add_record(*update["record"])
+
+        if "del" in update:
+            self.del_record(update["del"])
+
+    def summary(self, top=5):
+        node, knocked = self.most_knocked_down()
+        return {
+            "nodes": len(self),
+            "is_dag": self.is_dag,
+            "feedback_edges": len(self.feedback),
+            "most_knocked": [node, knocked],
+            "pagerank": self.top_k(top),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyses that follow graph updates")
+    parser.add_argument("input", metavar="[file.gv]")
+    parser.add_argument(
+        "updates",
+        nargs="?",
+        help="json lines file of updates, stdin by default; every line holds "
+        'any of {"add": [[u, v]], "remove": [[u, v]], '
+        '"record": [node, inputs, outputs], "del": node}',
+    )
+    parser.add_argument("--alpha", type=float, default=0.9)
+    parser.add_argument("--tol", type=float, default=1.0e-06)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+    G = IncrementalGraph.read(args.input, alpha=args.alpha, tol=args.tol)
+    print(json.dumps(G.summary(args.top)), flush=True)
+    with open(args.updates) if args.updates else sys.stdin as f:
+        for line in f:
+            if not line.strip():
+                continue
+
+            start = time.perf_counter()
+            G.apply(json.loads(line))
+            summary = G.summary(args.top)
+            summary["seconds"] = time.perf_counter() - start
+            print(json.dumps(summary), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from execution_graph import ExecutionGraph
+from loader import _digest
+import reachability
+
+
+def _merge(*spans):
+    """Union of flat `[start, end, start, end, ...]` interval arrays."""
+    flat = np.concatenate(spans)
+    starts, ends = flat[::2], flat[1::2]
+    order = np.argsort(starts, kind="stable")
+    starts = starts[order]
+    reach = np.maximum.accumulate(ends[order])
+    #: an interval opens a new run when it starts past everything before it
+    opens = np.empty(len(starts), dtype=bool)
+    opens[0] = True
+    np.greater(starts[1:], reach[:-1], out=opens[1:])
+    first = opens.nonzero()[0]
+    closes = np.empty_like(first)
+    closes[:-1] = first[1:] - 1
+    closes[-1] = len(starts) - 1
+    out = np.empty(2 * len(first), dtype=np.int64)
+    out[::2] = starts[first]
+    out[1::2] = reach[closes]
+    return out
+
+
+def _union(span, other):
+    #: appended components take the largest numbers, so their intervals
+    #: usually go after or right at the end of the existing ones
+    if other[0] > span[-1]:
+        return np.concatenate((span, other))
+
+    if other[0] == span[-1]:
+        return np.concatenate((span[:-1], other[1:]))
+
+    return _merge(span, other)
+
+
+def _contains(span, x):
+    #: the flat array is strictly increasing, `x` is inside when it falls
+    #: after a start
+    return np.searchsorted(span, x, side="right") % 2 == 1
+
+
+def _number(indptr, indices, order):
+    """Post-order numbers of a DFS forest with roots taken in `order`, and
+    the first number of each subtree."""
+    n = len(indptr) - 1
+    num = [-1] * n
+    low = [0] * n
+    seen = [False] * n
+    counter = 0
+    for root in order:
+        if seen[root]:
+            continue
+
+        seen[root] = True
+        low[root] = counter
+        stack = [(root, indptr[root])]
+        while stack:
+            comp, i = stack[-1]
+            if i < indptr[comp + 1]:
+                stack[-1] = (comp, i + 1)
+                succ = indices[i]
+                if not seen[succ]:
+                    seen[succ] = True
+                    low[succ] = counter
+                    stack.append((succ, indptr[succ]))
+            else:
+                stack.pop()
+                num[comp] = counter
+                counter += 1
+
+    return num, low
+
+
+def _closure(indptr, indices, order, num, low):
+    """Reachable numbers of every component as merged interval arrays, the
+    DFS subtree of a component is a single interval."""
+    closure = [None] * len(num)
+    for comp in reversed(order):
+        own = np.array([low[comp], num[comp] + 1], dtype=np.int64)
+        succs = indices[indptr[comp] : indptr[comp + 1]]
+        if len(succs):
+            closure[comp] = _merge(own, *[closure[succ] for succ in succs])
+        else:
+            closure[comp] = own
+
+    return closure
+
+
+class LineageIndex:
+    """Ancestor and descendant queries answered from a precomputed closure.
+
+    Strongly connected components are collapsed first, so the index is
+    built on the dagified graph and the nodes of a cycle are each other's
+    ancestors. Components are numbered in post-order of a DFS forest of the
+    DAG and of its reverse; the descendants of a component are a sorted list
+    of intervals of the first numbering, its ancestors of the second. A DFS
+    subtree is a single interval, so on provenance graphs the lists stay
+    short [Agrawal, Borgida, Jagadish 1989].
+
+    Membership is a binary search over those intervals, counts are summed
+    over them with prefix sums of the component sizes. Both include the
+    node itself, as `reachability.descendant_counts` does.
+
+        index = LineageIndex.read("original.gv")
+        index.is_descendant("42", "22.15")  # is 42 downstream of 22.15
+    """
+
+    def __init__(self, G):
+        G = reachability.as_execution_graph(G)
+        self.ids = list(G.ids)
+        self.index = dict(G.index)
+        rows = np.repeat(np.arange(len(G), dtype=np.int64), np.diff(G.indptr))
+        self.sources = rows.tolist()
+        self.targets = G.indices.tolist()
+        self.stamp = None
+        self._build(G)
+
+    def _build(self, G):
+        labels, sizes, indptr, indices, order = reachability.condense(G)
+        self.comp = labels.tolist()
+        self.members = [[] for _ in sizes]
+        for idx, comp in enumerate(self.comp):
+            self.members[comp].append(idx)
+
+        ncomp = len(sizes)
+        src = np.repeat(np.arange(ncomp), np.diff(indptr))
+        dst = np.asarray(indices, dtype=np.int64)
+        rorder = np.argsort(dst, kind="stable")
+        rindptr = np.zeros(ncomp + 1, dtype=np.int64)
+        np.cumsum(np.bincount(dst, minlength=ncomp), out=rindptr[1:])
+        rindices = src[rorder].tolist()
+        rindptr = rindptr.tolist()
+
+        #: 0 is the downstream numbering and closure, 1 the upstream one
+        self.num = [None, None]
+        self.inv = [None, None]
+        self.prefix = [None, None]
+        self.closure = [None, None]
+        graphs = (
+            (indptr, indices, order),
+            (rindptr, rindices, order[::-1]),
+        )
+        for side, (ptr, idx, topo) in enumerate(graphs):
+            num, low = _number(ptr, idx, topo)
+            self._set_numbering(side, num, sizes)
+            self.closure[side] = _closure(ptr, idx, topo, num, low)
+
+    def _set_numbering(self, side, num, sizes):
+        inv = np.empty(len(num), dtype=np.int64)
+        inv[num] = np.arange(len(num))
+        prefix = np.zeros(len(num) + 1, dtype=np.int64)
+        np.cumsum(np.asarray(sizes, dtype=np.int64)[inv], out=prefix[1:])
+        self.num[side] = list(num)
+        self.inv[side] = inv
+        self.prefix[side] = prefix
+
+    @classmethod
+    def read(cls, fn, cache=True):
+        """Index of a `.gv` file, stored in a `<fn>.lineage.npz` sidecar that
+        is used while the file is unchanged."""
+        fn = os.fspath(fn)
+        index_fn = f"{fn}.lineage.npz"
+        st = os.stat(fn)
+        stamp = [st.st_size, st.st_mtime_ns]
+        index = None
+        if cache and os.path.isfile(index_fn):
+            try:
+                index = cls.load(index_fn)
+            except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+                pass  # cut short or of another layout, it is rebuilt
+
+        if index is not None:
+            if index.stamp == stamp:
+                return index
+
+            if index.stamp[:1] == stamp[:1] and index.digest == _digest(fn):
+                index.stamp = stamp
+                index.save(index_fn)
+                return index
+
+        index = cls(ExecutionGraph.read(fn))
+        if cache:
+            index.stamp = stamp
+            index.digest = _digest(fn)
+            try:
+                index.save(index_fn)
+            except OSError:  # read-only directory, the sidecar is optional
+                pass
+
+        return index
+
+    def save(self, fn):
+        arrays = {}
+        for side, name in enumerate(("down", "up")):
+            spans = self.closure[side]
+            arrays[f"{name}_ptr"] = np.cumsum([0] + [len(span) for span in spans])
+            arrays[name] = np.concatenate(spans)
+            arrays[f"{name}_num"] = np.asarray(self.num[side], dtype=np.int64)
+
+        with open(fn, "wb") as f:
+            np.savez_compressed(
+                f,
+                ids=np.array(self.ids, dtype=str),
+                comp=np.asarray(self.comp, dtype=np.int64),
+                sources=np.asarray(self.sources, dtype=np.int64),
+                targets=np.asarray(self.targets, dtype=np.int64),
+                stamp=np.asarray(self.stamp or [-1, -1], dtype=np.int64),
+                digest=np.frombuffer(getattr(self, "digest", b"") or b"", np.uint8),
+                **arrays,
+            )
+
+    @classmethod
+    def load(cls, fn):
+        index = cls.__new__(cls)
+        with np.load(fn, allow_pickle=False) as f:
+            index.ids = f["ids"].tolist()
+            index.index = {node: idx for idx, node in enumerate(index.ids)}
+            index.comp = f["comp"].tolist()
+            index.sources = f["sources"].tolist()
+            index.targets = f["targets"].tolist()
+            index.stamp = f["stamp"].tolist()
+            index.digest = f["digest"].tobytes()
+            index.members = [[] for _ in range(max(index.comp, default=-1) + 1)]
+            for idx, comp in enumerate(index.comp):
+                index.members[comp].append(idx)
+
+            sizes = [len(members) for members in index.members]
+            index.num = [None, None]
+            index.inv = [None, None]
+            index.prefix = [None, None]
+            index.closure = [None, None]
+            for side, name in enumerate(("down", "up")):
+                ptr = f[f"{name}_ptr"]
+                index.closure[side] = np.split(f[name], ptr[1:-1])
+                index._set_numbering(side, f[f"{name}_num"].tolist(), sizes)
+
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    # queries
+
+    def _reaches(self, comp, other):
+        return _contains(self.closure[0][comp], self.num[0][other])
+
+    def is_descendant(self, node, of):
+        """True when `node` is downstream of `of`, or is `of`."""
+        return self._reaches(self.comp[self.index[of]], self.comp[self.index[node]])
+
+    def is_ancestor(self, node, of):
+        """True when `node` is upstream of `of`, or is `of`."""
+        return self.is_descendant(of, node)
+
+    def _count(self, side, node):
+        span = self.closure[side][self.comp[self.index[node]]]
+        prefix = self.prefix[side]
+        return int((prefix[span[1::2]] - prefix[span[::2]]).sum())
+
+    def descendant_count(self, node):
+        return self._count(0, node)
+
+    def ancestor_count(self, node):
+        return self._count(1, node)
+
+    def _comps(self, side, comp):
+        span = self.closure[side][comp]
+        inv = self.inv[side]
+        return np.concatenate(
+            [inv[s:e] for s, e in zip(span[::2].tolist(), span[1::2].tolist())]
+        )
+
+    def _nodes(self, side, node, software_only):
+        nodes = [
+            self.ids[idx]
+            for comp in self._comps(side, self.comp[self.index[node]]).tolist()
+            for idx in self.members[comp]
+        ]
+        if software_only:
+            nodes = [node for node in nodes if "." in node]
+
+        return nodes
+
+    def descendants(self, node, software_only=False):
+        return self._nodes(0, node, software_only)
+
+    def ancestors(self, node, software_only=False):
+        """Nodes upstream of `node`, e.g. the executions that produced its
+        inputs with `software_only`."""
+        return self._nodes(1, node, software_only)
+
+    # updates
+
+    def add_node(self, node):
+        if node in self.index:
+            return
+
+        idx = self.index[node] = len(self.ids)
+        comp = len(self.members)
+        self.ids.append(node)
+        self.comp.append(comp)
+        self.members.append([idx])
+        for side in (0, 1):
+            k = len(self.inv[side])
+            self.num[side].append(k)
+            self.inv[side] = np.append(self.inv[side], comp)
+            self.prefix[side] = np.append(self.prefix[side], self.prefix[side][-1] + 1)
+            self.closure[side].append(np.array([k, k + 1], dtype=np.int64))
+
+    def add_edge(self, u, v):
+        """Append an arc. Ancestors of `u` gain what `v` reaches, descendants
+        of `v` gain what reaches `u`; an arc that closes a cycle merges
+        components and rebuilds the index."""
+        self.add_node(u)
+        self.add_node(v)
+        self.sources.append(self.index[u])
+        self.targets.append(self.index[v])
+        self.stamp = None
+        cu, cv = self.comp[self.index[u]], self.comp[self.index[v]]
+        if self._reaches(cu, cv):
+            return
+
+        if self._reaches(cv, cu):
+            G = ExecutionGraph(self.ids, self.sources, self.targets)
+            self._build(G)
+            return
+
+        down = self.closure[0][cv]
+        for comp in self._comps(1, cu).tolist():
+            self.closure[0][comp] = _union(self.closure[0][comp], down)
+
+        up = self.closure[1][cu]
+        for comp in self._comps(0, cv).tolist():
+            self.closure[1][comp] = _union(self.closure[1][comp], up)
+
+    def add_record(self, node, input_hash, output_hash):
+        """Arcs of `addSoftwareExecRecord`, `node` is `<sourceCodeHash>.<index>`."""
+        self.add_node(node)
+        for h in input_hash:
+            self.add_edge(h, node)
+
+        for h in output_hash:
+            self.add_edge(node, h)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lineage queries on an index")
+    parser.add_argument("input", metavar="[file.gv]")
+    parser.add_argument(
+        "nodes", nargs="*", help="print the ancestor and descendant counts of these"
+    )
+    parser.add_argument(
+        "--downstream",
+        nargs=2,
+        metavar=("X", "Y"),
+        help="whether X is downstream of Y",
+    )
+    parser.add_argument(
+        "--producers", metavar="Z", help="software executions upstream of Z"
+    )
+    parser.add_argument(
+        "--records",
+        metavar="[file.jsonl]",
+        help="records appended before the queries, one [node, inputs, outputs] per line",
+    )
+    parser.add_argument("--no_cache", action="store_true")
+    args = parser.parse_args()
+    index = LineageIndex.read(args.input, cache=not args.no_cache)
+    if args.records:
+        with open(args.records) as f:
+            for line in f:
+                if line.strip():
+                    index.add_record(*json.loads(line))
+
+    for node in args.nodes:
+        print(
+            json.dumps(
+                {
+                    "node": node,
+                    "ancestors": index.ancestor_count(node),
+                    "descendants": index.descendant_count(node),
+                }
+            )
+        )
+
+    if args.downstream:
+        x, y = args.downstream
+        print(json.dumps({"node": x, "of": y, "downstream": index.is_descendant(x, y)}))
+
+    if args.producers:
+        producers = index.ancestors(args.producers, software_only=True)
+        print(json.dumps({"node": args.producers, "producers": producers}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+import hashlib
+import marshal
+import os
+import re
+import struct
+
+import networkx as nx
+
+MAGIC = b"GVC1"
+HEADER = struct.Struct("<4sQQ16s")
+
+TOKEN = re.compile(
+    r'\s*(?:(//|#)|(/\*)|("[^"\\]*")|(->|--)|([\[\]{}=;,])|(-?[\w.]+))', re.ASCII
+)
+
+
+class Unsupported(Exception):
+    """DOT syntax outside the subset the native parser reads."""
+
+
+def _tokens(fp):
+    """Stream tokens out of a DOT file one line at a time."""
+    in_comment = False
+    for line in fp:
+        pos = 0
+        end = len(line.rstrip())
+        while pos < end:
+            if in_comment:
+                pos = line.find("*/", pos)
+                if pos == -1:
+                    break
+
+                pos += 2
+                in_comment = False
+                continue
+
+            match = TOKEN.match(line, pos)
+            if not match:
+                raise Unsupported(f"unexpected character {line[pos:pos + 10]!r}")
+
+            pos = match.end()
+            comment, block, quoted, arrow, punct, _id = match.groups()
+            if comment:
+                break
+            elif block:
+                in_comment = True
+            elif quoted:
+                yield "id", quoted
+            elif arrow:
+                yield "arrow", arrow
+            elif punct:
+                yield punct, punct
+            elif _id:
+                yield "id", _id
+
+    if in_comment:
+        raise Unsupported("unterminated comment")
+
+
+def _attrs(tokens):
+    """Read `key=value` pairs up to the closing `]`."""
+    attrs = {}
+    while True:
+        kind, value = next(tokens)
+        if kind == "]":
+            return attrs
+
+        if kind in (",", ";"):
+            continue
+
+        if kind != "id" or next(tokens)[0] != "=":
+            raise Unsupported("malformed attribute list")
+
+        kind, attrs[value] = next(tokens)
+        if kind != "id":
+            raise Unsupported("malformed attribute value")
+
+
+def _parse(fp):
+    """Parse the DOT subset written by graph-tools into plain lists.
+
+    Node ids, `->`/`--` edges (chains included), `[key=value]` attributes,
+    `node`/`edge` defaults and top level `key=value` graph attributes are
+    understood; subgraphs, edge groups and HTML labels raise `Unsupported`.
+    """
+    tokens = _tokens(fp)
+    kind, value = next(tokens)
+    strict = value == "strict"
+    if strict:
+        kind, value = next(tokens)
+
+    if value not in ("digraph", "graph"):
+        raise Unsupported(f"unknown graph type {value}")
+
+    directed = value == "digraph"
+    kind, value = next(tokens)
+    name = ""
+    if kind == "id":
+        name = value.strip('"')
+        kind, value = next(tokens)
+
+    if kind != "{":
+        raise Unsupported("missing graph body")
+
+    graph_attrs = {}
+    defaults = {}
+    node_index = {}
+    nodes = []
+    declared = []
+    sources = []
+    targets = []
+    edge_attrs = {}
+
+    def _node(n):
+        n = n.strip('"')
+        try:
+            return node_index[n]
+        except KeyError:
+            node_index[n] = len(nodes)
+            nodes.append([n, {}, False])
+            return node_index[n]
+
+    kind, value = next(tokens)
+    while kind != "}":
+        if kind == ";":
+            kind, value = next(tokens)
+            continue
+
+        if kind != "id" or value in ("subgraph", "strict"):
+            raise Unsupported(f"unsupported statement at {value!r}")
+
+        chain = [value]
+        kind, next_value = next(tokens)
+        if kind == "=":
+            kind, graph_attrs[value] = next(tokens)
+            kind, value = next(tokens)
+            continue
+
+        while kind == "arrow":
+            kind, next_value = next(tokens)
+            if kind != "id":
+                raise Unsupported("edge to a group of nodes")
+
+            chain.append(next_value)
+            kind, next_value = next(tokens)
+
+        attrs = {}
+        if kind == "[":
+            attrs = _attrs(tokens)
+            kind, next_value = next(tokens)
+
+        if len(chain) > 1:
+            ids = [_node(n) for n in chain]
+            for u, v in zip(ids, ids[1:]):
+                if attrs:
+                    edge_attrs[len(sources)] = attrs
+
+                sources.append(u)
+                targets.append(v)
+        elif value in ("node", "edge", "graph"):
+            if attrs:
+                defaults.setdefault(value, attrs)
+        else:
+            idx = _node(value)
+            if not nodes[idx][2]:
+                nodes[idx][2] = True
+                declared.append(idx)
+
+            nodes[idx][1].update(attrs)
+
+        value = next_value
+
+    graph = {}
+    if name:
+        graph["name"] = name
+
+    if graph_attrs:
+        graph["graph"] = graph_attrs
+
+    for key in ("node", "edge"):
+        if key in defaults:
+            graph[key] = defaults[key]
+
+    names = [n for n, _, _ in nodes]
+    declared = [(names[idx], nodes[idx][1]) for idx in declared]
+    return (strict, directed, graph, names, declared, sources, targets, edge_attrs)
+
+
+def _build(data):
+    strict, directed, graph, names, declared, sources, targets, edge_attrs = data
+    if directed:
+        G = nx.DiGraph() if strict else nx.MultiDiGraph()
+    else:
+        G = nx.Graph() if strict else nx.MultiGraph()
+
+    G.graph.update(graph)
+    #: declared nodes come first, the rest in the order edges reach them
+    G.add_nodes_from(declared)
+    for idx, (u, v) in enumerate(zip(sources, targets)):
+        attrs = edge_attrs.get(idx, {})
+        if G.is_multigraph():
+            #: `write_dot` stores multiedge keys as a `key` attribute
+            attrs = dict(attrs)
+            G.add_edge(names[u], names[v], attrs.pop("key", None), **attrs)
+        else:
+            G.add_edge(names[u], names[v], **attrs)
+
+    return G
+
+
+def _digest(fn):
+    h = hashlib.blake2b(digest_size=16)
+    with open(fn, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+
+    return h.digest()
+
+
+def _read_cache(fn, cache_fn, st):
+    """Return the cached parse of `fn`, or None when it is stale or missing."""
+    try:
+        with open(cache_fn, "rb") as f:
+            magic, size, mtime, digest = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or size != st.st_size:
+                return None
+
+            payload = f.read()
+    except (OSError, struct.error):
+        return None
+
+    if mtime != st.st_mtime_ns:
+        #: touched but possibly unchanged, compare the content hash
+        if digest != _digest(fn):
+            return None
+
+        _write_cache(cache_fn, st, digest, payload)
+
+    try:
+        return marshal.loads(payload)
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def _write_cache(cache_fn, st, digest, payload):
+    tmp = f"{cache_fn}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, st.st_size, st.st_mtime_ns, digest))
+            f.write(payload)
+
+        os.replace(tmp, cache_fn)
+    except OSError:  # read-only directory, the cache is only an optimization
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def parse(fn, cache=True):
+    """Return the parsed content of `fn`, or None if it needs pydot.
+
+    The parse is stored in a `<fn>.cache` sidecar keyed by the file size,
+    mtime and content hash, so an unchanged graph is not parsed again.
+    """
+    fn = os.fspath(fn)
+    cache_fn = f"{fn}.cache"
+    st = os.stat(fn)
+    if cache:
+        data = _read_cache(fn, cache_fn, st)
+        if data is not None:
+            return data
+
+    try:
+        with open(fn) as fp:
+            data = _parse(fp)
+    except (Unsupported, StopIteration):
+        return None
+
+    if cache:
+        _write_cache(cache_fn, st, _digest(fn), marshal.dumps(data))
+
+    return data
+
+
+def read_dot(fn, cache=True):
+    """Read a `.gv` file into a networkx graph like `nx_pydot.read_dot` does.
+
+    Files using DOT syntax outside the supported subset are read through
+    pydot.
+    """
+    data = parse(fn, cache)
+    if data is None:
+        return nx.drawing.nx_pydot.read_dot(fn)
+
+    return _build(data)
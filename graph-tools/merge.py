@@ -1,70 +1,62 @@
 #!/usr/bin/env python3
 
 # from broker._utils._log import log
+from loader import read_dot
 import networkx as nx
+import sys
 
 
-def _merge(G, n1, n2):
-    """Merge two nodes.
+def contract(G):
+    """Merge executions of the same software into a single `name.` node.
 
-    __ https://stackoverflow.com/a/58508427/2402577
+    Nodes are grouped by their `name.` prefix and the merged graph is built in
+    a single pass over the nodes and edges of `G`, which is left untouched.
+    Merged nodes drop their attributes and parallel edges, like the previous
+    pairwise merge did.
     """
-    # Get all predecessors and successors of two nodes
-    predecessors = set(G.predecessors(n1)) | set(G.predecessors(n2))
-    successors = set(G.successors(n1)) | set(G.successors(n2))
-    #: new node with combined name
-    name = str(n1) + "/" + str(n2)
-    # Add predecessors and successors edges
-    # We have DiGraph so there should be one edge per nodes pair
-    G.add_edges_from([(p, name) for p in predecessors])
-    G.add_edges_from([(name, s) for s in successors])
-    #: remove old nodes
-    G.remove_nodes_from([n1, n2])
+    group_sw = {}
+    for node in G.nodes:
+        if "." in node:
+            group_sw.setdefault(node.split(".")[0], []).append(node)
 
-    mapping = {name: str(n1)}
-    G = nx.relabel_nodes(G, mapping)
-    return G
+    mapping = {}
+    merged = set()
+    for key, value in group_sw.items():
+        for node in value:
+            mapping[node] = f"{key}."
 
+        if len(value) > 1:
+            merged.add(f"{key}.")
 
-def merge(fn="/home/alper/git/AutonomousSoftwareOrg/graph/original.gv"):
-    if type(fn) is list:
-        fn = fn[0]
+    H = G.__class__()
+    H.graph.update(G.graph)
+    H.add_nodes_from((n, d) for n, d in G.nodes(data=True) if n not in mapping)
+    for key, value in group_sw.items():
+        if len(value) == 1:
+            H.add_node(f"{key}.", **G.nodes[value[0]])
 
-    G = nx.drawing.nx_pydot.read_dot(fn)
-    sw_nodes = []
-    for node in list(G.nodes):
-        if "." in node:
-            sw_nodes.append(node)
+    H.add_nodes_from(node for node in mapping.values() if node in merged)
+    for u, v, data in G.edges(data=True):
+        u = mapping.get(u, u)
+        v = mapping.get(v, v)
+        if u not in merged and v not in merged:
+            H.add_edge(u, v, **data)
+        elif not H.has_edge(u, v):
+            H.add_edge(u, v)
 
-    group_sw = {}
-    for node in sw_nodes:
-        n = node.split(".")
-        try:
-            group_sw[n[0]].append(node)
-        except:  # noqa
-            group_sw[n[0]] = [node]
+    return H
 
-    for key, value in group_sw.items():
-        if len(value) > 1:
-            for idx, v in enumerate(value):
-                if idx < len(value) - 1:
-                    if idx == 0:
-                        # print(f"merged: {v} {value[1]}")
-                        G = _merge(G, v, value[1])
-                    else:
-                        # print(f"merged: {value[0]} {value[idx + 1]}")
-                        G = _merge(G, value[0], value[idx + 1])
-            #
-            # print(value)
 
-    for node in list(G.nodes):
-        if "." in node:
-            mapping = {node: f"{node.split('.')[0]}."}
-            G = nx.relabel_nodes(G, mapping)
+def merge(fn):
+    if type(fn) is list:
+        fn = fn[0]
 
+    G = read_dot(fn)
+    G = contract(G)
     print("Please see the results in the <merged.gv> file.")
     nx.nx_pydot.write_dot(G, "merged.gv")
+    return G
 
 
 if __name__ == "__main__":
-    merge()
+    merge(sys.argv[1] if len(sys.argv) > 1 else "original.gv")
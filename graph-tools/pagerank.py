@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import os
+
+import numpy as np
+from scipy.sparse import diags
+
+from reachability import as_execution_graph
+
+
+class PageRankNotConverged(Exception):
+    pass
+
+
+def personalization(G, nodes=None, families=None, software_only=False):
+    """Teleport vector biased toward `nodes` and/or software `families`.
+
+    :param nodes: dict of node id to weight
+    :param families: software names, e.g. `["7", "17"]`, whose executions
+        share the teleport mass equally
+    :param software_only: restrict the teleport to software executions
+    """
+    G = as_execution_graph(G)
+    p = np.zeros(len(G)) if nodes or families else np.ones(len(G))
+    for node, value in (nodes or {}).items():
+        p[G.index[node]] = value
+
+    if families:
+        codes = [G.sw_names.index(name) for name in families if name in G.sw_names]
+        p[np.isin(G.sw_name, codes)] += 1.0
+
+    if software_only:
+        p[~G.is_software] = 0.0
+
+    if p.sum() == 0:
+        raise ValueError("personalization vector is all zero")
+
+    return p / p.sum()
+
+
+def align_rank(G, ids, rank):
+    """Initial vector from a rank computed on an older version of `G`.
+
+    Values are matched by node id; nodes that were not ranked before start
+    from the mean of the known ones.
+    """
+    x0 = np.full(len(G), np.nan)
+    for node, value in zip(ids, rank):
+        idx = G.index.get(node)
+        if idx is not None:
+            x0[idx] = value
+
+    known = ~np.isnan(x0)
+    if not known.any():
+        return None
+
+    x0[~known] = x0[known].mean()
+    return x0
+
+
+def load_rank(G, fn):
+    """Initial vector from a rank saved by `save_rank`, see `align_rank`."""
+    if not os.path.isfile(fn):
+        return None
+
+    with np.load(fn, allow_pickle=False) as f:
+        return align_rank(G, f["ids"].tolist(), f["rank"])
+
+
+def save_rank(G, fn, rank):
+    with open(fn, "wb") as f:
+        np.savez(f, ids=np.array(G.ids, dtype=str), rank=rank)
+
+
+def pagerank(G, alpha=0.85, p=None, x0=None, tol=1.0e-6, max_iter=100):
+    """Sparse power iteration with the same fixed point as `nx.pagerank`.
+
+    Dangling nodes distribute their rank according to the teleport vector
+    `p`. Convergence is reached once the l1 change is below `len(G) * tol`.
+
+    :returns: rank vector and the number of iterations it took
+    """
+    G = as_execution_graph(G)
+    n = len(G)
+    if n == 0:
+        return np.zeros(0), 0
+
+    A = G.adjacency()
+    out_weight = np.asarray(A.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    out_weight[dangling] = 1.0
+    #: transposed once so every iteration is a single sparse mat-vec
+    M = (diags(1.0 / out_weight) @ A).T.tocsr()
+    p = np.full(n, 1.0 / n) if p is None else p
+    x = p.copy() if x0 is None else x0 / x0.sum()
+    for iteration in range(1, max_iter + 1):
+        xlast = x
+        x = alpha * (M @ x + x[dangling].sum() * p) + (1 - alpha) * p
+        if np.abs(x - xlast).sum() < n * tol:
+            return x, iteration
+
+    raise PageRankNotConverged(f"pagerank failed to converge in {max_iter} iterations")
+
+
+def top_k(G, rank, k, software_only=True):
+    """Highest `k` ranked nodes, found with a partial selection."""
+    candidates = G.software if software_only else np.arange(len(G))
+    k = min(k, len(candidates))
+    if k == 0:
+        return []
+
+    values = rank[candidates]
+    part = np.argpartition(-values, k - 1)[:k]
+    part = part[np.argsort(-values[part], kind="stable")]
+    return [(G.ids[idx], float(rank[idx])) for idx in candidates[part]]
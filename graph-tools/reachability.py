@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+from collections import deque
+
+import numpy as np
+
+from execution_graph import ExecutionGraph
+
+
+def as_execution_graph(G):
+    if isinstance(G, ExecutionGraph):
+        return G
+
+    return ExecutionGraph.from_networkx(G)
+
+
+def knocked(G, node):
+    """Return nodes reachable from `node` (itself included) in BFS order."""
+    if isinstance(G, ExecutionGraph):
+        indptr, indices = G.lists()
+        start = G.index[node]
+        seen = {start}
+        order = [start]
+        for idx in order:
+            for out_idx in indices[indptr[idx] : indptr[idx + 1]]:
+                if out_idx not in seen:
+                    seen.add(out_idx)
+                    order.append(out_idx)
+
+        return [G.ids[idx] for idx in order]
+
+    seen = {node}
+    order = [node]
+    queue = deque(order)
+    while queue:
+        for out_node in G.successors(queue.popleft()):
+            if out_node not in seen:
+                seen.add(out_node)
+                order.append(out_node)
+                queue.append(out_node)
+
+    return order
+
+
+def condense(G, labels=None):
+    """Condensed DAG of `G` as CSR lists plus a topological order.
+
+    Returns `(labels, sizes, indptr, indices, order)` where `labels` maps
+    every node to its strongly connected component.
+    """
+    if labels is None:
+        labels = G.components()
+
+    ncomp = int(labels.max()) + 1 if len(labels) else 0
+    sizes = np.bincount(labels, minlength=ncomp)
+    rows = np.repeat(np.arange(len(G), dtype=np.int64), np.diff(G.indptr))
+    src = labels[rows].astype(np.int64)
+    dst = labels[G.indices].astype(np.int64)
+    keep = src != dst
+    pairs = np.unique(src[keep] * ncomp + dst[keep])
+    src, dst = pairs // ncomp, pairs % ncomp
+    indptr = np.zeros(ncomp + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=ncomp), out=indptr[1:])
+    indptr = indptr.tolist()
+    indices = dst.tolist()
+
+    #: Kahn's algorithm on the condensed DAG
+    indeg = np.bincount(dst, minlength=ncomp).tolist()
+    order = [comp for comp in range(ncomp) if indeg[comp] == 0]
+    for comp in order:
+        for succ in indices[indptr[comp] : indptr[comp + 1]]:
+            indeg[succ] -= 1
+            if indeg[succ] == 0:
+                order.append(succ)
+
+    return labels, sizes, indptr, indices, order
+
+
+def descendant_counts(G, nodes=None):
+    """Number of nodes knocked down from each node, itself included.
+
+    Strongly connected components are collapsed once, then the reachable sets
+    are built bottom-up on the condensed DAG as int bitsets whose bits are the
+    original nodes, so every count is exact. A component's bitset is released
+    as soon as all of its predecessors consumed it.
+    """
+    G = as_execution_graph(G)
+    if nodes is None:
+        nodes = G.ids
+
+    labels, sizes, indptr, indices, order = condense(G)
+    wanted = {}
+    for node in nodes:
+        wanted.setdefault(int(labels[G.index[node]]), []).append(node)
+
+    #: bits of a component are contiguous, so its own mask is a single run
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).tolist()
+    sizes = sizes.tolist()
+    pending = [0] * len(sizes)
+    for succ in indices:
+        pending[succ] += 1
+
+    masks = {}
+    counts = {}
+    for comp in reversed(order):
+        mask = ((1 << sizes[comp]) - 1) << offsets[comp]
+        for succ in indices[indptr[comp] : indptr[comp + 1]]:
+            mask |= masks[succ]
+            pending[succ] -= 1
+            if pending[succ] == 0:
+                del masks[succ]
+
+        if comp in wanted:
+            count = bin(mask).count("1")
+            for node in wanted[comp]:
+                counts[node] = count
+
+        if pending[comp]:
+            masks[comp] = mask
+
+    return {node: counts[node] for node in nodes}
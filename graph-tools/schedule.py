@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+import argparse
+import heapq
+import json
+import math
+
+import numpy as np
+
+from execution_graph import ExecutionGraph
+import reachability
+
+#: worker counts of `Simulator.sweep`, 1 to 1024
+WORKERS = tuple(2**k for k in range(11))
+
+
+class Simulator:
+    """List scheduling of the re-execution of `G` on identical workers.
+
+    Cycles are collapsed first, a component holding software executions is
+    one task whose runtime is the summed `weight` of its executions, a data
+    component is a file whose `weight` is its size. Tasks are taken in a
+    heap-based Kahn order by their HEFT upward rank, the longest runtime plus
+    transfer time from the task to the end of the graph, and each goes to the
+    worker where it finishes first.
+
+    Files are data-reuse aware: a file is written on the worker of its last
+    producer, raw inputs start on shared storage, and moving `size` to
+    another worker takes `size / bandwidth`. A worker keeps every file it
+    fetched, so later tasks there read it for free. Only the workers holding
+    an input and the earliest free worker can give the earliest finish, so a
+    task looks at a few workers however many there are.
+
+        sim = Simulator(ExecutionGraph.read("original.gv"), bandwidth=10)
+        sim.run(16)["makespan"]
+    """
+
+    def __init__(self, G, bandwidth=math.inf):
+        G = reachability.as_execution_graph(G)
+        self.G = G
+        self.bandwidth = bandwidth
+        labels, _, indptr, indices, order = reachability.condense(G)
+        ncomp = len(indptr) - 1
+        self.indptr, self.indices, self.order = indptr, indices, order
+        self.rindptr, self.rindices = _reverse(indptr, indices, ncomp)
+        weight = np.nan_to_num(G.weight, nan=0.0)
+        runtime = np.bincount(
+            labels, weights=np.where(G.is_software, weight, 0.0), minlength=ncomp
+        )
+        size = np.bincount(
+            labels, weights=np.where(G.is_software, 0.0, weight), minlength=ncomp
+        )
+        self.runtime = runtime.tolist()
+        self.cost = (size / bandwidth).tolist()
+        #: software members of every task, in execution order
+        sw = G.software
+        sw = sw[np.lexsort((sw, G.exec_idx[sw], labels[sw]))]
+        ptr = np.zeros(ncomp + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels[sw], minlength=ncomp), out=ptr[1:])
+        self.is_task = (ptr[1:] > ptr[:-1]).tolist()
+        self.members = [
+            [G.ids[idx] for idx in sw[ptr[c] : ptr[c + 1]].tolist()]
+            for c in range(ncomp)
+        ]
+        self.member_runtime = [
+            weight[sw[ptr[c] : ptr[c + 1]]].tolist() for c in range(ncomp)
+        ]
+        self.work = float(runtime.sum())
+        self.tasks = sum(self.is_task)
+
+        #: HEFT upward rank, and the same without transfers as a lower bound
+        self.rank = rank = [0.0] * ncomp
+        longest = [0.0] * ncomp
+        for c in reversed(order):
+            succs = indices[indptr[c] : indptr[c + 1]]
+            after = max((rank[s] for s in succs), default=0.0)
+            rank[c] = self.runtime[c] + self.cost[c] + after
+            longest[c] = self.runtime[c] + max((longest[s] for s in succs), default=0.0)
+
+        self.critical_path = max(longest, default=0.0)
+
+    def run(self, workers, timeline=False):
+        """Simulate `workers` workers.
+
+        :returns: dict with the makespan, the utilization (busy time over
+            `workers * makespan`), the transfers and, with `timeline`, a
+            `[node, start, finish]` list of every worker
+        """
+        indptr, indices = self.indptr, self.indices
+        rindptr, rindices = self.rindptr, self.rindices
+        runtime, cost, rank, is_task = self.runtime, self.cost, self.rank, self.is_task
+        ncomp = len(runtime)
+        free = [0.0] * workers
+        idle = [(0.0, w) for w in range(workers)]
+        #: time a component is done and the worker holding it, -1 for storage
+        done = [0.0] * ncomp
+        where = [-1] * ncomp
+        #: per file, the workers that fetched it and when it arrived there
+        fetched = [None] * ncomp
+        lanes = [[] for _ in range(workers)] if timeline else None
+        transfers = 0
+        volume = 0.0
+
+        indeg = [rindptr[c + 1] - rindptr[c] for c in range(ncomp)]
+        stack = [c for c in range(ncomp) if indeg[c] == 0 and not is_task[c]]
+        heap = [(-rank[c], c) for c in range(ncomp) if indeg[c] == 0 and is_task[c]]
+        heapq.heapify(heap)
+        while stack or heap:
+            if stack:
+                c = stack.pop()
+                inputs = rindices[rindptr[c] : rindptr[c + 1]]
+                for p in inputs:
+                    if done[p] >= done[c]:
+                        done[c] = done[p]
+                        where[c] = where[p]
+            else:
+                c = heapq.heappop(heap)[1]
+                inputs = rindices[rindptr[c] : rindptr[c + 1]]
+                while idle[0][0] != free[idle[0][1]]:
+                    heapq.heappop(idle)
+
+                candidates = {idle[0][1]}
+                for p in inputs:
+                    if where[p] >= 0:
+                        candidates.add(where[p])
+                    if fetched[p]:
+                        candidates.update(fetched[p])
+
+                best = None
+                for w in candidates:
+                    ready = free[w]
+                    for p in inputs:
+                        if where[p] == w:
+                            at = done[p]
+                        elif fetched[p] and w in fetched[p]:
+                            at = fetched[p][w]
+                        else:
+                            at = done[p] + cost[p]
+                        if at > ready:
+                            ready = at
+                    if best is None or (ready, w) < best:
+                        best = (ready, w)
+
+                start, w = best
+                for p in inputs:
+                    if where[p] != w and not (fetched[p] and w in fetched[p]):
+                        if fetched[p] is None:
+                            fetched[p] = {}
+                        fetched[p][w] = done[p] + cost[p]
+                        transfers += 1
+                        volume += cost[p]
+
+                done[c] = free[w] = start + runtime[c]
+                where[c] = w
+                heapq.heappush(idle, (free[w], w))
+                if timeline:
+                    t = start
+                    for node, r in zip(self.members[c], self.member_runtime[c]):
+                        lanes[w].append([node, t, t + r])
+                        t += r
+
+            for s in indices[indptr[c] : indptr[c + 1]]:
+                indeg[s] -= 1
+                if indeg[s] == 0:
+                    if is_task[s]:
+                        heapq.heappush(heap, (-rank[s], s))
+                    else:
+                        stack.append(s)
+
+        makespan = max(free, default=0.0)
+        result = {
+            "workers": workers,
+            "tasks": self.tasks,
+            "makespan": makespan,
+            "utilization": self.work / (workers * makespan) if makespan else 0.0,
+            "critical_path": self.critical_path,
+            "transfers": transfers,
+            "transfer_time": volume,
+        }
+        if timeline:
+            result["timeline"] = lanes
+
+        return result
+
+    def sweep(self, workers=WORKERS):
+        """`run` for every worker count, without the timelines."""
+        return [self.run(n) for n in workers]
+
+
+def _reverse(indptr, indices, n):
+    dst = np.asarray(indices, dtype=np.int64)
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+    rindptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(dst, minlength=n), out=rindptr[1:])
+    return rindptr.tolist(), src[np.argsort(dst, kind="stable")].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-execution schedule on N workers")
+    parser.add_argument("input", metavar="[file.gv]")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=list(WORKERS),
+        help="worker counts to simulate",
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        default=math.inf,
+        help="file size moved between workers per unit of runtime",
+    )
+    parser.add_argument(
+        "--timeline",
+        metavar="[schedule.json]",
+        help="write the per-worker timeline of the last worker count",
+    )
+    args = parser.parse_args()
+    sim = Simulator(ExecutionGraph.read(args.input), args.bandwidth)
+    for n in args.workers[:-1]:
+        print(json.dumps(sim.run(n)))
+
+    result = sim.run(args.workers[-1], timeline=bool(args.timeline))
+    if args.timeline:
+        with open(args.timeline, "w") as f:
+            json.dump(result, f)
+
+        del result["timeline"]
+
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
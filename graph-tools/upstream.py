@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from scipy.sparse import csc_matrix, diags
+
+from reachability import as_execution_graph
+
+#: target columns propagated together by `contributors`
+BLOCK = 64
+
+
+def decay_factors(hops, decay=1.0):
+    """Factor of every hop, a scalar `decay` weighs hop `h` by `decay ** (h - 1)`."""
+    if np.ndim(decay) == 0:
+        return float(decay) ** np.arange(hops)
+
+    factors = np.asarray(decay, dtype=np.float64)
+    if len(factors) != hops:
+        raise ValueError(f"{len(factors)} decay factors given for {hops} hops")
+
+    return factors
+
+
+class UpstreamScores:
+    """Weights of the nodes behind each node, up to `hops` hops back.
+
+    The node weights are read once into a float array, missing weights count
+    as 0. A node `h` hops behind contributes its weight times `decay[h - 1]`
+    once for every path of that length, so
+
+        score = sum(decay[h - 1] * (A.T ** h) @ weight for h in 1..hops)
+
+    is computed with `hops` sparse mat-vecs for every node at once. With one
+    hop the score of a node is the summed weight of its predecessors.
+    """
+
+    def __init__(self, G, hops=1, decay=1.0):
+        self.G = G = as_execution_graph(G)
+        self.hops = hops
+        self.decay = decay_factors(hops, decay)
+        self.weight = np.nan_to_num(G.weight, nan=0.0)
+        self.A = G.adjacency()
+        #: transposed once, each hop back is a single mat-vec
+        self.AT = self.A.T.tocsr()
+        self.score = np.zeros(len(G))
+        x = self.weight
+        for factor in self.decay:
+            x = self.AT @ x
+            self.score += factor * x
+
+    def predecessors(self, targets):
+        """Score of every predecessor of each target, in ascending order.
+
+        :returns: dict of target to a dict of predecessor to score
+        """
+        G = self.G
+        results = {}
+        for target in targets:
+            idx = G.index[target]
+            preds = np.unique(G.in_indices[G.in_indptr[idx] : G.in_indptr[idx + 1]])
+            preds = preds[np.argsort(self.score[preds], kind="stable")]
+            results[target] = {G.ids[p]: float(self.score[p]) for p in preds}
+
+        return results
+
+    def contributors(self, targets, k=10):
+        """The `k` upstream nodes that contribute the most to each target.
+
+        A node `h` hops behind a target contributes `decay[h - 1]` times its
+        weight for every path of length `h`. Targets are propagated as sparse
+        columns, `BLOCK` at a time, so the work follows the size of their
+        upstream neighborhoods.
+
+        :returns: dict of target to `(node, contribution)` pairs, highest first
+        """
+        G = self.G
+        targets = list(targets)
+        results = {}
+        for start in range(0, len(targets), BLOCK):
+            block = targets[start : start + BLOCK]
+            rows = [G.index[t] for t in block]
+            X = csc_matrix(
+                (np.ones(len(block)), (rows, np.arange(len(block)))),
+                shape=(len(G), len(block)),
+            )
+            C = csc_matrix(X.shape)
+            for factor in self.decay:
+                X = self.A @ X
+                C = C + factor * X
+
+            C = (diags(self.weight) @ C).tocsc()
+            C.sort_indices()
+            for col, target in enumerate(block):
+                span = slice(C.indptr[col], C.indptr[col + 1])
+                results[target] = _top(G, C.indices[span], C.data[span], k)
+
+        return results
+
+
+def _top(G, nodes, values, k):
+    nonzero = values != 0
+    nodes, values = nodes[nonzero], values[nonzero]
+    k = min(k, len(nodes))
+    if k == 0:
+        return []
+
+    part = np.argpartition(-values, k - 1)[:k]
+    part = part[np.argsort(-values[part], kind="stable")]
+    return [(G.ids[idx], float(value)) for idx, value in zip(nodes[part], values[part])]
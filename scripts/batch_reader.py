@@ -0,0 +1,316 @@
+#!/usr/bin/python3
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from eth_utils import keccak
+from requests.adapters import HTTPAdapter
+
+try:
+    from eth_abi import decode, encode
+except ImportError:  # eth-abi < 4
+    from eth_abi import decode_abi as decode, encode_abi as encode
+
+ABI_FILE = "build/contracts/AutonomousSoftwareOrg.json"
+#: executions per `getDataArcs` call
+PER_CALL = 256
+
+
+class CallError(Exception):
+    """A call of the batch reverted or the node answered with an error."""
+
+
+def _type(arg):
+    """Canonical ABI type of an input or output, tuples included."""
+    if arg["type"].startswith("tuple"):
+        inner = ",".join(_type(c) for c in arg["components"])
+        return f"({inner}){arg['type'][5:]}"
+
+    return arg["type"]
+
+
+def load_abi(fn=ABI_FILE):
+    """ABI list from a brownie build artifact or a plain ABI json file."""
+    with open(fn) as f:
+        abi = json.load(f)
+
+    return abi["abi"] if isinstance(abi, dict) else abi
+
+
+class Function:
+    def __init__(self, entry):
+        self.name = entry["name"]
+        self.inputs = [_type(arg) for arg in entry["inputs"]]
+        self.outputs = [_type(arg) for arg in entry["outputs"]]
+        signature = f"{self.name}({','.join(self.inputs)})"
+        self.selector = keccak(text=signature)[:4]
+
+    def encode(self, args):
+        return "0x" + (self.selector + encode(self.inputs, list(args))).hex()
+
+    def decode(self, result):
+        values = decode(self.outputs, bytes.fromhex(result[2:]))
+        return values[0] if len(values) == 1 else tuple(values)
+
+
+class BatchReader:
+    """Contract view calls coalesced into JSON-RPC batches.
+
+    Batches are sent over a pool of keep-alive HTTP connections, `workers`
+    of them at once, and every batch is read at the same block so results
+    are consistent with each other.
+
+        reader = BatchReader(url, auto.address, load_abi())
+        reader.call_many([("getIncomingData", (h, 1, 0)), ...])
+    """
+
+    def __init__(self, url, address, abi, batch_size=500, workers=4, timeout=60):
+        self.url = url
+        self.address = address
+        self.batch_size = batch_size
+        self.workers = workers
+        self.timeout = timeout
+        self.functions = {}
+        for entry in abi:
+            if entry.get("type") == "function":
+                #: overloads are not used by the contract, the last one wins
+                self.functions[entry["name"]] = Function(entry)
+
+        #: threads, and with them their keep-alive sessions, outlive a call
+        self._executor = ThreadPoolExecutor(workers)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.round_trips = 0
+        self.elapsed = 0.0
+
+    @property
+    def session(self):
+        if not hasattr(self._local, "session"):
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+
+        return self._local.session
+
+    def _post(self, payload):
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        with self._lock:
+            self.round_trips += 1
+
+        return response.json()
+
+    def block_number(self):
+        response = self._post(
+            {"jsonrpc": "2.0", "id": 0, "method": "eth_blockNumber", "params": []}
+        )
+        return response["result"]
+
+    def _batch(self, calls, block):
+        payload = []
+        for idx, (function, args) in enumerate(calls):
+            data = self.functions[function].encode(args)
+            payload.append(
+                {
+                    "jsonrpc": "2.0",
+                    "id": idx,
+                    "method": "eth_call",
+                    "params": [{"to": self.address, "data": data}, block],
+                }
+            )
+
+        responses = self._post(payload)
+        if isinstance(responses, dict):  # the whole batch was refused
+            raise CallError(responses.get("error", responses))
+
+        results = [None] * len(calls)
+        for response in responses:
+            idx = response["id"]
+            if "error" in response:
+                results[idx] = CallError(f"{calls[idx][0]}: {response['error']}")
+            else:
+                results[idx] = self.functions[calls[idx][0]].decode(response["result"])
+
+        return results
+
+    def call_many(self, calls, block=None, raise_errors=True):
+        """Results of `(function, args)` calls, in the order they were given.
+
+        :param block: block number or tag the calls are made at, the current
+            block by default
+        :param raise_errors: raise the first `CallError`, otherwise failed
+            calls are returned as `CallError` instances
+        """
+        calls = list(calls)
+        start = time.perf_counter()
+        if block is None:
+            block = self.block_number()
+        elif isinstance(block, int):
+            block = hex(block)
+
+        chunks = [
+            calls[idx : idx + self.batch_size]
+            for idx in range(0, len(calls), self.batch_size)
+        ]
+        batches = self._executor.map(lambda chunk: self._batch(chunk, block), chunks)
+        results = [result for batch in batches for result in batch]
+
+        self.calls += len(calls)
+        self.elapsed += time.perf_counter() - start
+        if raise_errors:
+            for result in results:
+                if isinstance(result, CallError):
+                    raise result
+
+        return results
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        """Calls per second and round trips saved compared to one call each."""
+        return {
+            "calls": self.calls,
+            "round_trips": self.round_trips,
+            "round_trips_saved": self.calls - self.round_trips,
+            "calls_per_second": self.calls / self.elapsed if self.elapsed else 0.0,
+        }
+
+
+def read_arcs(reader, executions, block=None):
+    """Incoming and outgoing token ids of `(sourceCodeHash, index)` pairs."""
+    executions = list(executions)
+    if block is None:
+        block = reader.block_number()
+
+    lens = reader.call_many(
+        [
+            (function, (h, index))
+            for h, index in executions
+            for function in ("getNoOfIncomingDataArcs", "getNoOfOutgoingDataArcs")
+        ],
+        block,
+    )
+    calls = []
+    for (h, index), n_in, n_out in zip(executions, lens[::2], lens[1::2]):
+        calls += [("getIncomingData", (h, index, i)) for i in range(n_in)]
+        calls += [("getOutgoingData", (h, index, i)) for i in range(n_out)]
+
+    values = iter(reader.call_many(calls, block))
+    arcs = []
+    for n_in, n_out in zip(lens[::2], lens[1::2]):
+        incoming = [next(values) for _ in range(n_in)]
+        outgoing = [next(values) for _ in range(n_out)]
+        arcs.append((incoming, outgoing))
+
+    return arcs
+
+
+def read_data_arcs(reader, executions, block=None, per_call=PER_CALL):
+    """`read_arcs` with one `getDataArcs` call for every `per_call` executions.
+
+    A call that fails, out of gas or with more return data than the node
+    allows, is split in halves and made again.
+    """
+    executions = list(executions)
+    if block is None:
+        block = reader.block_number()
+
+    arcs = [None] * len(executions)
+    chunks = [
+        (idx, executions[idx : idx + per_call])
+        for idx in range(0, len(executions), per_call)
+    ]
+    while chunks:
+        calls = [
+            ("getDataArcs", ([h for h, _ in chunk], [index for _, index in chunk]))
+            for _, chunk in chunks
+        ]
+        results = reader.call_many(calls, block, raise_errors=False)
+        retry = []
+        for (start, chunk), result in zip(chunks, results):
+            if isinstance(result, CallError):
+                if len(chunk) == 1:
+                    raise result
+
+                half = len(chunk) // 2
+                retry += [(start, chunk[:half]), (start + half, chunk[half:])]
+                continue
+
+            for idx, (incoming, outgoing) in enumerate(zip(*result), start):
+                arcs[idx] = (list(incoming), list(outgoing))
+
+        chunks = retry
+
+    return arcs
+
+
+def _read(args, executions, fn, **kwargs):
+    with BatchReader(
+        args.rpc, args.address, load_abi(args.abi), args.batch_size, args.workers
+    ) as reader:
+        arcs = fn(reader, executions, **kwargs)
+        stats = reader.stats()
+
+    print(
+        f"{fn.__name__}: {len(arcs)} executions, "
+        f"{sum(len(i) + len(o) for i, o in arcs)} arcs, {stats['calls']} calls in "
+        f"{stats['round_trips']} round trips ({stats['round_trips_saved']} saved), "
+        f"{stats['calls_per_second']:.0f} calls/s"
+    )
+    return arcs
+
+
+def main():
+    from web3 import HTTPProvider, Web3
+
+    from scripts.ingest import exec_records
+
+    parser = argparse.ArgumentParser(description="Read every arc with batched calls")
+    parser.add_argument("address", help="AutonomousSoftwareOrg contract address")
+    parser.add_argument("--rpc", default="http://127.0.0.1:8545")
+    parser.add_argument("--abi", default=ABI_FILE)
+    parser.add_argument("--batch_size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--per_call", type=int, default=PER_CALL)
+    parser.add_argument(
+        "--mode",
+        choices=("arrays", "elements", "compare"),
+        default="arrays",
+        help="getDataArcs calls, one call per element for contracts without "
+        "them, or both",
+    )
+    args = parser.parse_args()
+    web3 = Web3(HTTPProvider(args.rpc))
+    executions = {
+        (record.source_code_hash, record.index): None
+        for record in exec_records(web3, args.address)
+    }
+    block = web3.eth.block_number
+    if args.mode != "elements":
+        arcs = _read(
+            args, executions, read_data_arcs, block=block, per_call=args.per_call
+        )
+
+    if args.mode != "arrays":
+        elements = _read(args, executions, read_arcs, block=block)
+        if args.mode == "compare" and elements != arcs:
+            sys.exit("getDataArcs and the element getters disagree")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+
+import os
+import sqlite3
+from collections import OrderedDict
+
+CACHE_FILE = os.path.expanduser("~/.cache/AutonomousSoftwareOrg/certificates.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contract (
+    address TEXT PRIMARY KEY,
+    known_len INTEGER NOT NULL,
+    first_hash BLOB
+);
+CREATE TABLE IF NOT EXISTS certificate (
+    address TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    data_hash BLOB NOT NULL,
+    PRIMARY KEY (address, token_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS certificate_hash ON certificate (address, data_hash);
+"""
+
+
+class LRU:
+    """Bounded mapping that drops the least recently used key."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+
+    def get(self, key):
+        try:
+            self.data.move_to_end(key)
+            return self.data[key]
+        except KeyError:
+            return None
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+
+def _bytes(value):
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+    return bytes(value)
+
+
+class CertificateCache:
+    """Read-through cache of the ResearchCertificate token id <-> hash maps.
+
+    A certificate never changes once `createCertificate` minted it, so
+    lookups go to an in-memory LRU, then to an SQLite file shared by every
+    run and keyed by contract address, and only then to the chain. `prefetch`
+    reads the certificates minted since the last run in one batch.
+
+    :param source: `BatchReader` on the ResearchCertificate, or the brownie
+        contract itself
+    """
+
+    def __init__(self, source, fn=CACHE_FILE, maxsize=1 << 16):
+        self.source = source
+        self.address = source.address.lower()
+        if fn != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(fn)), exist_ok=True)
+
+        self.db = sqlite3.connect(fn)
+        self.db.executescript(SCHEMA)
+        self.by_token = LRU(maxsize)
+        self.by_hash = LRU(maxsize)
+        self.hits = 0
+        self.disk_hits = 0
+        self.chain_calls = 0
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _call_many(self, calls):
+        calls = list(calls)
+        self.chain_calls += len(calls)
+        if hasattr(self.source, "call_many"):
+            return self.source.call_many(calls)
+
+        return [getattr(self.source, fn)(*args) for fn, args in calls]
+
+    def _contract(self):
+        """Number of certificates stored and the hash of the first one."""
+        row = self.db.execute(
+            "SELECT known_len, first_hash FROM contract WHERE address = ?",
+            (self.address,),
+        ).fetchone()
+        return (0, None) if row is None else row
+
+    def _store(self, certificates, known_len, first_hash):
+        self.db.executemany(
+            "INSERT OR IGNORE INTO certificate VALUES (?, ?, ?)",
+            [(self.address, token_id, h) for token_id, h in certificates],
+        )
+        self.db.execute(
+            "INSERT OR REPLACE INTO contract VALUES (?, ?, ?)",
+            (self.address, known_len, first_hash),
+        )
+        self.db.commit()
+        for token_id, h in certificates:
+            self.by_token.put(token_id, h)
+            self.by_hash.put(h, token_id)
+
+    def _forget(self):
+        """Drop a stale cache, e.g. a local chain restarted at the same address."""
+        self.db.execute("DELETE FROM certificate WHERE address = ?", (self.address,))
+        self.db.execute("DELETE FROM contract WHERE address = ?", (self.address,))
+        self.db.commit()
+        self.by_token = LRU(self.by_token.maxsize)
+        self.by_hash = LRU(self.by_hash.maxsize)
+
+    def prefetch(self):
+        """Read the certificates minted since the last prefetch.
+
+        :returns: number of new certificates
+        """
+        known_len, first_hash = self._contract()
+        calls = [("getDataHashLen", ())]
+        if first_hash is not None:
+            calls.append(("getDataHash", (0,)))
+
+        results = self._call_many(calls)
+        length = results[0]
+        if first_hash is not None and _bytes(results[1]) != first_hash:
+            self._forget()
+            known_len, first_hash = 0, None
+
+        if length <= known_len:
+            return 0
+
+        hashes = self._call_many(
+            ("getDataHash", (idx,)) for idx in range(known_len, length)
+        )
+        #: token ids start at 1, `getDataHash(i)` is the hash of token `i + 1`
+        certificates = [
+            (idx + 1, _bytes(h)) for idx, h in zip(range(known_len, length), hashes)
+        ]
+        if first_hash is None:
+            first_hash = certificates[0][1]
+
+        self._store(certificates, length, first_hash)
+        return len(certificates)
+
+    def _disk(self, column, value, other):
+        row = self.db.execute(
+            f"SELECT {other} FROM certificate WHERE address = ? AND {column} = ?",
+            (self.address, value),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def token_hash(self, token_id):
+        """Hash of a token, `tokenHash(token_id)`."""
+        h = self.by_token.get(token_id)
+        if h is not None:
+            self.hits += 1
+            return h
+
+        h = self._disk("token_id", token_id, "data_hash")
+        if h is not None:
+            self.disk_hits += 1
+        else:
+            self.prefetch()
+            h = self._disk("token_id", token_id, "data_hash")
+            if h is None:
+                raise KeyError(f"no certificate with token id {token_id}")
+
+        self.by_token.put(token_id, h)
+        self.by_hash.put(h, token_id)
+        return h
+
+    def data_hash(self, index):
+        """`getDataHash(index)`, the hash of token `index + 1`."""
+        return self.token_hash(index + 1)
+
+    def token_index(self, data_hash, prefetch=True):
+        """`getTokenIndex(data_hash)`, 0 when the hash has no certificate yet.
+
+        Unknown hashes trigger a prefetch; a 0 is not cached since the hash
+        may be certified later.
+        """
+        data_hash = _bytes(data_hash).rjust(32, b"\0")
+        token_id = self.by_hash.get(data_hash)
+        if token_id is not None:
+            self.hits += 1
+            return token_id
+
+        token_id = self._disk("data_hash", data_hash, "token_id")
+        if token_id is not None:
+            self.disk_hits += 1
+        elif prefetch and self.prefetch():
+            token_id = self._disk("data_hash", data_hash, "token_id")
+
+        if token_id is None:
+            return 0
+
+        self.by_token.put(token_id, data_hash)
+        self.by_hash.put(data_hash, token_id)
+        return token_id
+
+    def token_indexes(self, hashes):
+        """`token_index` of many hashes with at most one prefetch."""
+        self.prefetch()
+        return [self.token_index(h, prefetch=False) for h in hashes]
+
+    def data_hash_len(self):
+        """`getDataHashLen()`, up to date with the chain."""
+        self.prefetch()
+        return self._contract()[0]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "chain_calls": self.chain_calls,
+        }
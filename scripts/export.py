@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+
+import json
+import os
+import shutil
+import tempfile
+
+from scripts.ingest import hash_id
+
+#: lines are buffered and written in chunks
+CHUNK = 1 << 14
+SOFTWARE_COLOR = "#7BE141"
+FORMATS = {".js": "vis", ".html": "vis", ".gv": "dot", ".dot": "dot", ".jsonl": "jsonl"}
+
+
+class GraphWriter:
+    """Stream nodes and edges to a vis.js DataSet, DOT or JSON Lines file.
+
+    Node keys are interned in a dict that gives each one an integer id the
+    first time it is seen, so memory is the intern table plus one chunk of
+    lines. vis.js needs every node before the first edge, its edges are
+    spooled to a temporary file and appended on `close`.
+
+        with GraphWriter("graph.js") as writer:
+            writer.node("7.16", label="7_16", color=SOFTWARE_COLOR)
+            writer.edge("1c", "7.16", color="red")
+    """
+
+    def __init__(self, fn, fmt=None, chunk=CHUNK):
+        self.fmt = fmt or FORMATS[os.path.splitext(str(fn))[1]]
+        self.ids = {}
+        self.edges = 0
+        self.chunk = chunk
+        self.f = open(fn, "w")
+        self._nodes = []
+        self._edges = []
+        self._spool = None
+        if self.fmt == "vis":
+            self._spool = tempfile.TemporaryFile("w+")
+            self.f.write("var nodes = new vis.DataSet([\n")
+        elif self.fmt == "dot":
+            self.f.write("digraph G {\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _flush(self, lines, f):
+        f.write("".join(lines))
+        lines.clear()
+
+    def node(self, key, **attrs):
+        """Id of `key`, the node is written the first time it is seen."""
+        try:
+            return self.ids[key]
+        except KeyError:
+            pass
+
+        idx = self.ids[key] = len(self.ids) + 1
+        if self.fmt == "vis":
+            line = f"    {json.dumps({'id': idx, **attrs})},\n"
+        elif self.fmt == "dot":
+            attrs = ",".join(f"{k}={json.dumps(str(v))}" for k, v in attrs.items())
+            line = f'    "{key}" [{attrs}]\n'
+        else:
+            line = json.dumps({"node": idx, "key": key, **attrs}) + "\n"
+
+        self._nodes.append(line)
+        if len(self._nodes) >= self.chunk:
+            self._flush(self._nodes, self.f)
+
+        return idx
+
+    def edge(self, u, v, **attrs):
+        u_id = self.node(u)
+        v_id = self.node(v)
+        self.edges += 1
+        if self.fmt == "vis":
+            edge = {"from": u_id, "to": v_id, "arrows": "to", **attrs}
+            line = f"    {json.dumps(edge)},\n"
+            self._edges.append(line)
+            if len(self._edges) >= self.chunk:
+                self._flush(self._edges, self._spool)
+
+            return
+
+        if self.fmt == "dot":
+            attrs = ",".join(f"{k}={json.dumps(str(val))}" for k, val in attrs.items())
+            line = f'    "{u}"->"{v}"' + (f" [{attrs}]\n" if attrs else "\n")
+        else:
+            line = json.dumps({"from": u_id, "to": v_id, **attrs}) + "\n"
+
+        #: DOT and JSON Lines keep nodes and edges interleaved in one stream
+        self._nodes.append(line)
+        if len(self._nodes) >= self.chunk:
+            self._flush(self._nodes, self.f)
+
+    def close(self):
+        if self.f.closed:
+            return
+
+        self._flush(self._nodes, self.f)
+        if self.fmt == "vis":
+            self._flush(self._edges, self._spool)
+            self.f.write("]);\nvar edges = new vis.DataSet([\n")
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, self.f)
+            self._spool.close()
+            self.f.write("]);\n")
+        elif self.fmt == "dot":
+            self.f.write("}\n")
+
+        self.f.close()
+
+
+def _data_node(writer, cache, token_id):
+    """Data nodes are keyed by their hash as in `ingest.write_gv`, so both
+    `.gv` files of a chain state name them the same."""
+    key = hash_id(cache.token_hash(int(token_id)))
+    if key not in writer.ids:
+        writer.node(key, label=str(token_id), title=key)
+
+    return key
+
+
+def write_executions(writer, executions, arcs, cache):
+    """Write executions and their token arcs as read from the contract.
+
+    :param executions: `(sourceCodeHash, index)` pairs
+    :param arcs: `(incoming, outgoing)` token ids of every execution, as
+        returned by `batch_reader.read_arcs`
+    :param cache: `CertificateCache` of the ResearchCertificate
+    """
+    for (se, index), (incoming, outgoing) in zip(executions, arcs):
+        job = f"{hash_id(se)}.{index}"
+        label = f"{cache.token_index(se)}_{index}"
+        writer.node(job, label=label, title=job, color=SOFTWARE_COLOR)
+        for token_id in incoming:
+            writer.edge(_data_node(writer, cache, token_id), job, color="red")
+
+        for token_id in outgoing:
+            writer.edge(job, _data_node(writer, cache, token_id), color="blue")
@@ -0,0 +1,325 @@
+#!/usr/bin/python3
+
+import argparse
+import json
+import os
+import random
+import sys
+
+import numpy as np
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gas_baseline.json")
+#: number of input or output hashes of `addSoftwareExecRecord`
+SIZES = (1, 2, 4, 8, 16, 32)
+#: quorum of the deployed organization, `M` of `N` members have to vote
+M, N = 2, 3
+PROPOSALS = (1, 8, 32, 128)
+#: records per `addSoftwareExecRecords` transaction and per `getDataArcs` call
+BATCHES = (1, 4, 16)
+
+
+def md5_hash():
+    return "%032x" % random.getrandbits(128)
+
+
+def summary(values):
+    """min, median and nearest-rank p95 of gas samples."""
+    values = sorted(values)
+    p95 = values[max(0, -(-95 * len(values) // 100) - 1)]
+    return {
+        "count": len(values),
+        "min": values[0],
+        "median": float(np.median(values)),
+        "p95": p95,
+    }
+
+
+def fit(xs, ys):
+    """Least squares line of the gas samples, `slope` is the gas per element."""
+    if len(set(xs)) < 2:
+        return {"slope": 0.0, "intercept": float(np.mean(ys))}
+
+    slope, intercept = np.polyfit(xs, ys, 1)
+    return {"slope": float(slope), "intercept": float(intercept)}
+
+
+class Profile:
+    """Gas samples of each function, and of each sweep by element count."""
+
+    def __init__(self):
+        self.functions = {}
+        self.sweeps = {}
+
+    def add(self, function, gas, sweep=None, x=None):
+        self.functions.setdefault(function, []).append(gas)
+        if sweep is not None:
+            points = self.sweeps.setdefault(f"{function}/{sweep}", {})
+            points.setdefault(x, []).append(gas)
+
+    def results(self):
+        sweeps = {}
+        for name, points in self.sweeps.items():
+            xs = [x for x, samples in points.items() for _ in samples]
+            ys = [gas for samples in points.values() for gas in samples]
+            sweeps[name] = {
+                "points": {str(x): summary(samples) for x, samples in points.items()},
+                **fit(xs, ys),
+            }
+
+        return {
+            "functions": {k: summary(v) for k, v in self.functions.items()},
+            "sweeps": sweeps,
+        }
+
+
+def compare(results, baseline, tolerance=0.02, slack=100):
+    """Functions, sweep points and slopes that cost more gas than `baseline`.
+
+    :param slack: gas added to every allowance, a slope near zero is not a
+        regression for a few gas
+    """
+    regressions = []
+    for name, result in results["functions"].items():
+        base = baseline.get("functions", {}).get(name)
+        if base is not None:
+            limit = base["median"] * (1 + tolerance) + slack
+            if result["median"] > limit:
+                regressions.append(f"{name}: {result['median']:.0f} > {limit:.0f}")
+
+    for name, result in results["sweeps"].items():
+        base = baseline.get("sweeps", {}).get(name)
+        if base is None:
+            continue
+
+        for x, point in result["points"].items():
+            if x in base["points"]:
+                limit = base["points"][x]["median"] * (1 + tolerance) + slack
+                if point["median"] > limit:
+                    regressions.append(
+                        f"{name}[{x}]: {point['median']:.0f} > {limit:.0f}"
+                    )
+
+        limit = base["slope"] * (1 + tolerance) + slack
+        if result["slope"] > limit:
+            regressions.append(
+                f"{name} slope: {result['slope']:.0f} > {limit:.0f} gas per element"
+            )
+
+    return regressions
+
+
+def deploy(p, accounts):
+    """Contracts as deployed by `tests/conftest.py`, accounts[0] a provider."""
+    from broker.eblocbroker_scripts.utils import Cent
+
+    owner = accounts[0]
+    tx = p.USDTmy.deploy({"from": owner})
+    owner.deploy(p.Lib)
+    ebb = p.eBlocBroker.deploy(tx.address, {"from": owner})
+    roc = p.ResearchCertificate.deploy({"from": owner})
+    auto = p.AutonomousSoftwareOrg.deploy(
+        "0x01234", M, N, "0x", ebb.address, roc.address, {"from": owner}
+    )
+    prices = [Cent("1 cent"), Cent("1 cent"), Cent("1 cent"), Cent("1 cent")]
+    ebb.registerProvider(
+        "0359190A05DF2B72729344221D522F92EFA2F330",
+        "provider_test@gmail.com",
+        "ee14ea28-b869-1036-8080-9dbd8c6b1579@b2drop.eudat.eu",
+        "/ip4/79.123.177.145/tcp/4001/ipfs/QmWmZQnb8xh3gHf9ZFmVQC4mLEav3Uht5kHJxZtixG3rsf",
+        8,
+        prices,
+        600,
+        {"from": owner},
+    )
+    return auto
+
+
+def sweep_records(profile, auto, owner, sizes, repeat):
+    """`addSoftwareExecRecord` by input and output count, every hash new, and
+    by input count with hashes that already have a certificate."""
+    certified = []
+    for n in sizes:
+        for _ in range(repeat):
+            output_hash = [md5_hash()]
+            tx = auto.addSoftwareExecRecord(
+                md5_hash(),
+                0,
+                [md5_hash() for _ in range(n)],
+                output_hash,
+                {"from": owner},
+            )
+            profile.add("addSoftwareExecRecord", tx.gas_used, "inputs", n)
+            certified += output_hash
+
+    for n in sizes:
+        for _ in range(repeat):
+            output_hash = [md5_hash() for _ in range(n)]
+            tx = auto.addSoftwareExecRecord(
+                md5_hash(), 0, [md5_hash()], output_hash, {"from": owner}
+            )
+            profile.add("addSoftwareExecRecord", tx.gas_used, "outputs", n)
+            certified += output_hash
+
+    for n in sizes:
+        for _ in range(repeat):
+            input_hash = random.sample(certified, min(n, len(certified)))
+            tx = auto.addSoftwareExecRecord(
+                md5_hash(), 0, input_hash, [md5_hash()], {"from": owner}
+            )
+            profile.add("addSoftwareExecRecord", tx.gas_used, "certified_inputs", n)
+
+
+def sweep_batches(profile, auto, owner, batches, repeat):
+    """Gas per record of `addSoftwareExecRecords` by records per transaction,
+    and of reading their arcs with `getDataArcs` or one call per element.
+
+    Every record has one new input and one new output hash, as the first
+    point of `addSoftwareExecRecord/inputs`.
+    """
+    for k in batches:
+        for _ in range(repeat):
+            records = [(md5_hash(), 0, [md5_hash()], [md5_hash()]) for _ in range(k)]
+            tx = auto.addSoftwareExecRecords(*map(list, zip(*records)), {"from": owner})
+            profile.add("addSoftwareExecRecords", tx.gas_used / k, "records", k)
+            executions = [
+                (event["sourceCodeHash"], event["index"])
+                for event in tx.events["LogSoftwareExecRecord"]
+            ]
+            hashes = [se for se, _ in executions]
+            indexes = [index for _, index in executions]
+            gas = auto.getDataArcs.estimate_gas(hashes, indexes)
+            profile.add("getDataArcs", gas / k, "records", k)
+            gas = 0
+            for se, index in executions:
+                for function in ("getNoOfIncomingDataArcs", "getNoOfOutgoingDataArcs"):
+                    gas += getattr(auto, function).estimate_gas(se, index)
+
+                gas += auto.getIncomingData.estimate_gas(se, index, 0)
+                gas += auto.getOutgoingData.estimate_gas(se, index, 0)
+
+            profile.add("getData", gas / k, "records", k)
+
+
+def sweep_members(profile, auto, accounts, members):
+    """Join and vote costs at every size while the organization grows to
+    `members`, each candidate gets just enough votes to join."""
+    owner = accounts[0]
+    voters = [owner]
+    while len(voters) < members:
+        candidate = accounts.add()
+        owner.transfer(candidate, "1 ether")
+        n = len(voters)
+        tx = auto.BecomeMemberCandidate("0x", {"from": candidate})
+        profile.add("BecomeMemberCandidate", tx.gas_used, "members", n)
+        member_no = auto.getMemberInfoLength()
+        for votes, voter in enumerate(voters, 1):
+            tx = auto.VoteMemberCandidate(member_no, {"from": voter})
+            profile.add("VoteMemberCandidate", tx.gas_used, "members", n)
+            if votes * N >= n * M:
+                break
+
+        voters.append(candidate)
+
+    return voters
+
+
+def sweep_proposals(profile, auto, voters, proposals, repeat, web3):
+    """Propose and vote costs with up to `proposals` proposals stored."""
+    owner = voters[0]
+    count = 0
+    for target in proposals:
+        while count < target:
+            deadline = web3.eth.block_number + 100000
+            args = ("title", "url", md5_hash(), 0, deadline, {"from": owner})
+            tx = auto.ProposeProposal(*args)
+            count += 1
+            if count > target - repeat:
+                profile.add("ProposeProposal", tx.gas_used, "proposals", target)
+                for voter in voters[:repeat]:
+                    tx = auto.VoteForProposal(count - 1, {"from": voter})
+                    profile.add("VoteForProposal", tx.gas_used, "proposals", target)
+
+
+def profile_gas(
+    p, accounts, web3, sizes, members, proposals, repeat, batches=BATCHES, seed=0
+):
+    random.seed(seed)
+    profile = Profile()
+    auto = deploy(p, accounts)
+    sweep_records(profile, auto, accounts[0], sizes, repeat)
+    sweep_batches(profile, auto, accounts[0], batches, repeat)
+    voters = sweep_members(profile, auto, accounts, members)
+    sweep_proposals(profile, auto, voters, proposals, repeat, web3)
+    return profile.results()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AutonomousSoftwareOrg gas profile")
+    parser.add_argument("--project", default=".", help="brownie project directory")
+    parser.add_argument("--network", default="development")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--members", type=int, default=16)
+    parser.add_argument("--proposals", type=int, nargs="+", default=PROPOSALS)
+    parser.add_argument("--batches", type=int, nargs="+", default=BATCHES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the new baseline"
+    )
+    args = parser.parse_args()
+    #: without a baseline nothing could fail, so it is required unless saving
+    if not args.save and not os.path.isfile(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save to store one")
+        sys.exit(1)
+
+    from brownie import accounts, network, project, web3
+
+    p = project.load(args.project)
+    network.connect(args.network)
+    results = profile_gas(
+        p,
+        accounts,
+        web3,
+        args.sizes,
+        args.members,
+        args.proposals,
+        args.repeat,
+        args.batches,
+        args.seed,
+    )
+    for name, result in sorted(results["functions"].items()):
+        print(
+            f"{name:>24}: min={result['min']} median={result['median']:.0f} "
+            f"p95={result['p95']} (n={result['count']})"
+        )
+
+    for name, result in sorted(results["sweeps"].items()):
+        print(f"{name:>40}: {result['slope']:.0f} gas per element")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
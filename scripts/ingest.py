@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+
+import argparse
+from collections import namedtuple
+
+from eth_utils import keccak
+from requests.exceptions import Timeout
+
+try:
+    from eth_abi import decode
+except ImportError:  # eth-abi < 4
+    from eth_abi import decode_abi as decode
+
+EXEC_RECORD = "LogSoftwareExecRecord(address,bytes32,uint32,bytes32[],bytes32[])"
+EXEC_RECORD_TOPIC = "0x" + keccak(text=EXEC_RECORD).hex()
+EXEC_RECORD_DATA = ["uint32", "bytes32[]", "bytes32[]"]
+DEL_RECORD = "LogDelSoftwareExecRecord(address,bytes32,uint32)"
+DEL_RECORD_TOPIC = "0x" + keccak(text=DEL_RECORD).hex()
+#: JSON-RPC error codes and message parts of nodes that refuse a log range
+#: as too large, any other error is raised as is
+RANGE_ERROR_CODES = (-32005,)
+RANGE_ERROR_MESSAGES = (
+    "range",
+    "more than",
+    "too many",
+    "too large",
+    "size exceeded",
+    "limit exceeded",
+    "timeout",
+    "timed out",
+)
+
+ExecRecord = namedtuple(
+    "ExecRecord",
+    "block log_index tx submitter source_code_hash index input_hash output_hash",
+)
+
+DelRecord = namedtuple(
+    "DelRecord", "block log_index tx submitter source_code_hash index"
+)
+
+
+class RangeTooLarge(Exception):
+    """The node refused an `eth_getLogs` range, it is retried in halves."""
+
+
+def hash_id(value):
+    """Node id of a bytes32 hash, its hex value without leading zeros."""
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+    return value.hex().lstrip("0") or "0"
+
+
+def _int(value):
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def _bytes(value):
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+    return bytes(value)
+
+
+def _range_error(error):
+    if not isinstance(error, dict):
+        error = {"message": error}
+
+    if error.get("code") in RANGE_ERROR_CODES:
+        return True
+
+    message = str(error.get("message", "")).lower()
+    return any(part in message for part in RANGE_ERROR_MESSAGES)
+
+
+def _get_logs(web3, params):
+    response = web3.provider.make_request("eth_getLogs", [params])
+    if "error" in response:
+        if _range_error(response["error"]):
+            raise RangeTooLarge(response["error"])
+
+        raise ValueError(response["error"])
+
+    return response["result"]
+
+
+def get_logs(web3, address, from_block, to_block, topics, chunk=2000, max_chunk=100000):
+    """Yield the logs of `address` in adaptive block range chunks.
+
+    A range the node rejects (too many results, response too large, timeout)
+    is split in half, and the chunk grows back while ranges come back small.
+    A single block that still fails raises, other errors raise at once.
+    """
+    start = from_block
+    while start <= to_block:
+        end = min(start + chunk - 1, to_block)
+        params = {
+            "address": address,
+            "fromBlock": hex(start),
+            "toBlock": hex(end),
+            "topics": topics,
+        }
+        try:
+            logs = _get_logs(web3, params)
+        except (RangeTooLarge, Timeout, TimeoutError) as e:
+            if end == start:
+                raise RangeTooLarge(f"block {start}: {e}") from e
+
+            chunk = max(1, (end - start + 1) // 2)
+            continue
+
+        yield from logs
+        start = end + 1
+        if len(logs) < 1000:
+            chunk = min(chunk * 2, max_chunk)
+
+
+def decode_exec_records(logs):
+    """Decode `LogSoftwareExecRecord` and `LogDelSoftwareExecRecord` logs into
+    `ExecRecord` and `DelRecord` tuples."""
+    for entry in logs:
+        topics = entry["topics"]
+        header = (
+            _int(entry["blockNumber"]),
+            _int(entry["logIndex"]),
+            entry["transactionHash"],
+            "0x" + _bytes(topics[1])[-20:].hex(),
+            _bytes(topics[2]),
+        )
+        if topics[0] == DEL_RECORD_TOPIC:
+            (index,) = decode(["uint32"], _bytes(entry["data"]))
+            yield DelRecord(*header, index)
+        else:
+            data = decode(EXEC_RECORD_DATA, _bytes(entry["data"]))
+            yield ExecRecord(*header, data[0], list(data[1]), list(data[2]))
+
+
+def exec_records(web3, address, from_block=0, to_block=None, deletions=False, **kwargs):
+    """All execution records logged by the AutonomousSoftwareOrg at `address`.
+
+    :param deletions: also yield a `DelRecord` for every deleted record, in
+        log order
+    """
+    if to_block is None:
+        to_block = web3.eth.block_number
+
+    topics = [[EXEC_RECORD_TOPIC, DEL_RECORD_TOPIC] if deletions else EXEC_RECORD_TOPIC]
+    logs = get_logs(web3, address, from_block, to_block, topics, **kwargs)
+    return decode_exec_records(logs)
+
+
+def write_gv(records, fn):
+    """Write the execution graph of `records` in the graph-tools `.gv` layout.
+
+    Executions are `<sourceCodeHash>.<index>` nodes and data files are named
+    by their hash. Records added again for the same execution only append
+    arcs, as they do on chain.
+    """
+    data = {}
+    software = {}
+    edges = {}
+    for record in records:
+        node = f"{hash_id(record.source_code_hash)}.{record.index}"
+        software[node] = None
+        for h in record.input_hash:
+            data[hash_id(h)] = None
+            edges[(hash_id(h), node)] = None
+
+        for h in record.output_hash:
+            data[hash_id(h)] = None
+            edges[(node, hash_id(h))] = None
+
+    with open(fn, "w") as f:
+        f.write("digraph G {\n    rankdir=LR;\n")
+        f.write("    node [style=filled fillcolor=white,shape=circle];\n")
+        f.writelines(f'    "{node}"\n' for node in data)
+        f.write('    //\n    node [style=filled fillcolor="#b3ffb3",shape=box]\n')
+        f.writelines(f'    "{node}"\n' for node in software)
+        f.write("    //\n")
+        f.writelines(f'    "{u}"->"{v}"\n' for u, v in edges)
+        f.write("}\n")
+
+    return len(data) + len(software), len(edges)
+
+
+def main():
+    from web3 import HTTPProvider, Web3
+
+    parser = argparse.ArgumentParser(description="Build the execution graph from logs")
+    parser.add_argument("address", help="AutonomousSoftwareOrg contract address")
+    parser.add_argument("--rpc", default="http://127.0.0.1:8545")
+    parser.add_argument("--from_block", type=int, default=0)
+    parser.add_argument("--to_block", type=int)
+    parser.add_argument("--chunk", type=int, default=2000)
+    parser.add_argument("-o", "--output", default="original.gv")
+    args = parser.parse_args()
+    web3 = Web3(HTTPProvider(args.rpc))
+    records = exec_records(
+        web3, args.address, args.from_block, args.to_block, chunk=args.chunk
+    )
+    nodes, edges = write_gv(records, args.output)
+    print(f"{args.output}: {nodes} nodes, {edges} edges")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/python3
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import tempfile
+import time
+
+from scripts.ingest import (
+    DEL_RECORD_TOPIC,
+    EXEC_RECORD_TOPIC,
+    ExecRecord,
+    decode_exec_records,
+    get_logs,
+)
+from scripts.store import ProvenanceStore
+
+
+class Pipeline:
+    """Sync a `ProvenanceStore` in three asyncio stages.
+
+    Block windows are fetched concurrently, the hashes each window mentions
+    for the first time are resolved with batched `getTokenIndex` calls, and
+    the windows are stored in block order. At most `concurrency` requests are
+    in flight and at most `max_pending` windows wait between two stages, so a
+    slow stage holds back the ones before it.
+
+    Every stored window commits `last_block` and the certificate count its
+    hashes were resolved against, `token_count`. An interrupted sync resumes
+    after the last stored window, and hashes stored earlier are looked up
+    again only when certificates were minted since.
+
+    :param reader: `BatchReader` on the ResearchCertificate, token ids are
+        not resolved without it
+    """
+
+    def __init__(
+        self,
+        store,
+        web3,
+        reader=None,
+        address=None,
+        window=2000,
+        concurrency=4,
+        max_pending=8,
+    ):
+        self.store = store
+        self.web3 = web3
+        self.reader = reader
+        self.address = store.bind(address)
+        self.window = window
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.topics = [[EXEC_RECORD_TOPIC, DEL_RECORD_TOPIC]]
+        self.records = 0
+        self.tokens = 0
+        self.windows = 0
+        self.elapsed = 0.0
+
+    async def _call(self, fn, *args):
+        async with self._semaphore:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, functools.partial(fn, *args))
+
+    def _fetch(self, start, end):
+        logs = get_logs(
+            self.web3, self.address, start, end, self.topics, chunk=end - start + 1
+        )
+        return list(decode_exec_records(logs))
+
+    def _resolve(self, hashes, block):
+        token_ids = self.reader.call_many(
+            [("getTokenIndex", (h,)) for h in hashes], block
+        )
+        return [(h, token_id) for h, token_id in zip(hashes, token_ids) if token_id]
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.append(task)
+        return task
+
+    async def _resolve_task(self, hashes, block):
+        if not hashes or self.reader is None:
+            return []
+
+        return await self._call(self._resolve, hashes, block)
+
+    async def _fetch_stage(self, windows, out):
+        for start, end in windows:
+            await out.put((end, self._spawn(self._call(self._fetch, start, end))))
+
+        await out.put(None)
+
+    async def _resolve_stage(self, inp, out, block):
+        known = set(self.store.hashes())
+        token_count = None
+        if self.reader is not None:
+            (token_count,) = await self._call(
+                self.reader.call_many, [("getDataHashLen", ())], block
+            )
+            if token_count != self.store.token_count:
+                #: hashes stored without a certificate may have one now
+                hashes = self.store.unresolved_hashes()
+                task = self._spawn(self._resolve_task(hashes, block))
+                await out.put(([], self.store.last_block, task, token_count))
+
+        while True:
+            item = await inp.get()
+            if item is None:
+                break
+
+            end, task = item
+            try:
+                records = await task
+            except Exception:
+                #: the windows before a failed fetch are stored, then it raises
+                await out.put(([], end, task, token_count))
+                return
+
+            hashes = {
+                h
+                for r in records
+                if isinstance(r, ExecRecord)
+                for h in (r.source_code_hash, *r.input_hash, *r.output_hash)
+            }
+            hashes -= known
+            known |= hashes
+            task = self._spawn(self._resolve_task(list(hashes), block))
+            await out.put((records, end, task, token_count))
+
+        await out.put(None)
+
+    async def _store_stage(self, inp):
+        while True:
+            item = await inp.get()
+            if item is None:
+                break
+
+            records, end, task, token_count = item
+            tokens = await task
+            self.store.add_tokens(tokens, token_count)
+            self.records += self.store.add_records(records, end)
+            self.tokens += len(tokens)
+            self.windows += 1
+
+    async def _run(self, to_block):
+        start = self.store.last_block + 1
+        windows = [
+            (s, min(s + self.window - 1, to_block))
+            for s in range(start, to_block + 1, self.window)
+        ]
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._tasks = []
+        fetched = asyncio.Queue(self.max_pending)
+        resolved = asyncio.Queue(self.max_pending)
+        stages = [
+            self._spawn(self._fetch_stage(windows, fetched)),
+            self._spawn(self._resolve_stage(fetched, resolved, to_block)),
+            self._spawn(self._store_stage(resolved)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def run(self, to_block=None, confirmations=0):
+        """Fetch, resolve and store the records logged after `last_block`.
+
+        :returns: number of logs stored
+        """
+        head = self.web3.eth.block_number - confirmations
+        to_block = head if to_block is None else min(to_block, head)
+        records = self.records
+        start = time.perf_counter()
+        #: not `asyncio.run`, the pipeline runs on Python 3.6 too
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run(to_block))
+        finally:
+            loop.close()
+
+        self.elapsed += time.perf_counter() - start
+        return self.records - records
+
+    def stats(self):
+        return {
+            "records": self.records,
+            "tokens": self.tokens,
+            "windows": self.windows,
+            "seconds": self.elapsed,
+            "records_per_second": self.records / self.elapsed if self.elapsed else 0.0,
+        }
+
+
+def _sequential(web3, reader, address, fn):
+    """`ProvenanceStore.sync` and `resolve_tokens`, one request at a time."""
+    from scripts.certificate_cache import CertificateCache
+
+    start = time.perf_counter()
+    with ProvenanceStore(fn) as store:
+        records = store.sync(web3, address)
+        if reader is not None:
+            with CertificateCache(reader, f"{fn}.certificates") as cache:
+                store.resolve_tokens(cache)
+
+    seconds = time.perf_counter() - start
+    return {
+        "records": records,
+        "seconds": seconds,
+        "records_per_second": records / seconds if seconds else 0.0,
+    }
+
+
+def bench(web3, reader, address, concurrency=(1, 2, 4, 8, 16), **kwargs):
+    """Records per second of a full sync into an empty store, the sequential
+    sync first and then the pipeline at each concurrency."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        results["sequential"] = _sequential(
+            web3, reader, address, os.path.join(tmp, "sequential.db")
+        )
+        for n in concurrency:
+            with ProvenanceStore(os.path.join(tmp, f"{n}.db")) as store:
+                pipeline = Pipeline(
+                    store, web3, reader, address, concurrency=n, **kwargs
+                )
+                pipeline.run()
+                results[f"concurrency={n}"] = pipeline.stats()
+
+    return results
+
+
+def main():
+    from web3 import HTTPProvider, Web3
+
+    from scripts.batch_reader import BatchReader, load_abi
+
+    parser = argparse.ArgumentParser(description="Concurrent sync of execution records")
+    parser.add_argument("address", help="AutonomousSoftwareOrg contract address")
+    parser.add_argument("--db", default="provenance.db")
+    parser.add_argument("--rpc", default="http://127.0.0.1:8545")
+    parser.add_argument("--roc", help="ResearchCertificate address, resolves token ids")
+    parser.add_argument("--roc_abi", default="build/contracts/ResearchCertificate.json")
+    parser.add_argument("--window", type=int, default=2000, help="blocks per request")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max_pending", type=int, default=8)
+    parser.add_argument("--confirmations", type=int, default=0)
+    parser.add_argument(
+        "--bench",
+        type=int,
+        nargs="*",
+        metavar="CONCURRENCY",
+        help="compare the sync throughput into empty stores instead",
+    )
+    parser.add_argument("--output", help="write the benchmark results as json")
+    args = parser.parse_args()
+    web3 = Web3(HTTPProvider(args.rpc))
+    reader = None
+    if args.roc:
+        reader = BatchReader(args.rpc, args.roc, load_abi(args.roc_abi))
+
+    try:
+        if args.bench is not None:
+            results = bench(
+                web3,
+                reader,
+                args.address,
+                args.bench or (1, 2, 4, 8, 16),
+                window=args.window,
+                max_pending=args.max_pending,
+            )
+            for name, result in results.items():
+                print(
+                    f"{name:>16}: {result['records']} records in "
+                    f"{result['seconds']:.2f}s, {result['records_per_second']:.0f}/s"
+                )
+
+            if args.output:
+                with open(args.output, "w") as f:
+                    json.dump(results, f, indent=2)
+
+            return
+
+        with ProvenanceStore(args.db) as store:
+            pipeline = Pipeline(
+                store,
+                web3,
+                reader,
+                args.address,
+                args.window,
+                args.concurrency,
+                args.max_pending,
+            )
+            count = pipeline.run(confirmations=args.confirmations)
+            print(
+                f"{count} logs, {pipeline.tokens} token ids stored, "
+                f"synced up to block {store.last_block}"
+            )
+    finally:
+        if reader is not None:
+            reader.close()
+
+
+if __name__ == "__main__":
+    main()
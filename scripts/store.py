@@ -0,0 +1,377 @@
+#!/usr/bin/python3
+
+import argparse
+import sqlite3
+
+from scripts.ingest import DelRecord, ExecRecord, exec_records, write_gv
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS record (
+    id INTEGER PRIMARY KEY,
+    block INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx TEXT,
+    submitter TEXT NOT NULL,
+    source_code_hash BLOB NOT NULL,
+    idx INTEGER NOT NULL,
+    deleted_block INTEGER,
+    UNIQUE (block, log_index)
+);
+CREATE TABLE IF NOT EXISTS arc (
+    record_id INTEGER NOT NULL REFERENCES record (id),
+    output INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    data_hash BLOB NOT NULL,
+    PRIMARY KEY (record_id, output, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS token (
+    data_hash BLOB PRIMARY KEY,
+    token_id INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS record_software ON record (source_code_hash, idx);
+CREATE INDEX IF NOT EXISTS record_submitter ON record (submitter);
+CREATE INDEX IF NOT EXISTS arc_data_hash ON arc (data_hash, output);
+CREATE INDEX IF NOT EXISTS token_token_id ON token (token_id);
+"""
+
+#: executions that read (side 0) or wrote (side 1) the files in `reach`; the
+#: arcs of an execution may be spread over several addSoftwareExecRecord calls
+_EXECUTIONS = """
+JOIN arc a ON a.data_hash = reach.data_hash AND a.output = {side}
+JOIN record r ON r.id = a.record_id {live}
+JOIN record r2 ON r2.source_code_hash = r.source_code_hash AND r2.idx = r.idx {live2}
+"""
+
+
+class ProvenanceStore:
+    """Execution records of one AutonomousSoftwareOrg contract in SQLite.
+
+    `sync` appends the records logged since the last synced block; deleted
+    records are kept as tombstones (`deleted_block`) and are left out of
+    queries unless `include_deleted` is set.
+    """
+
+    def __init__(self, fn="provenance.db"):
+        self.db = sqlite3.connect(fn)
+        self.db.executescript(SCHEMA)
+        self.db.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS selected (id INTEGER PRIMARY KEY)"
+        )
+        self.db.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS start (data_hash BLOB PRIMARY KEY)"
+        )
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def address(self):
+        return self._meta("address")
+
+    @property
+    def last_block(self):
+        """Last block whose logs are all stored, -1 before the first sync."""
+        return int(self._meta("last_block", -1))
+
+    @property
+    def token_count(self):
+        """Certificates the stored hashes were last resolved against."""
+        return int(self._meta("token_count", 0))
+
+    def bind(self, address=None):
+        """Address of the contract the store belongs to, set on first use."""
+        address = address or self.address
+        if self.address is None:
+            self._set_meta("address", address)
+        elif address.lower() != self.address.lower():
+            raise ValueError(f"store belongs to {self.address}, not {address}")
+
+        return address
+
+    def _add(self, record):
+        if isinstance(record, DelRecord):
+            self.db.execute(
+                "UPDATE record SET deleted_block = ? WHERE source_code_hash = ? "
+                "AND idx = ? AND block <= ? AND deleted_block IS NULL",
+                (record.block, record.source_code_hash, record.index, record.block),
+            )
+            return
+
+        cursor = self.db.execute(
+            "INSERT OR IGNORE INTO record (block, log_index, tx, submitter, "
+            "source_code_hash, idx) VALUES (?, ?, ?, ?, ?, ?)",
+            record[:6],
+        )
+        if cursor.rowcount:
+            arcs = [(0, pos, h) for pos, h in enumerate(record.input_hash)]
+            arcs += [(1, pos, h) for pos, h in enumerate(record.output_hash)]
+            self.db.executemany(
+                "INSERT INTO arc VALUES (?, ?, ?, ?)",
+                [(cursor.lastrowid, output, pos, h) for output, pos, h in arcs],
+            )
+
+    def add_records(self, records, last_block=None, commit_every=1000):
+        """Store decoded `ExecRecord`/`DelRecord` tuples, in log order.
+
+        Progress is committed every `commit_every` records up to the block
+        before the current one; records are unique by `(block, log_index)`,
+        so a block that is stored again after an interruption is a no-op.
+        """
+        count = 0
+        for record in records:
+            self._add(record)
+            count += 1
+            if count % commit_every == 0:
+                self._set_meta("last_block", max(self.last_block, record.block - 1))
+                self.db.commit()
+
+        if last_block is not None:
+            self._set_meta("last_block", last_block)
+
+        self.db.commit()
+        return count
+
+    def sync(self, web3, address=None, to_block=None, confirmations=0, **kwargs):
+        """Fetch and store the records logged after `last_block`.
+
+        :param confirmations: blocks behind the head that are left for the
+            next sync, so shallow reorgs are not stored
+        :returns: number of logs stored
+        """
+        address = self.bind(address)
+        head = web3.eth.block_number - confirmations
+        to_block = head if to_block is None else min(to_block, head)
+        if to_block <= self.last_block:
+            return 0
+
+        records = exec_records(
+            web3, address, self.last_block + 1, to_block, deletions=True, **kwargs
+        )
+        return self.add_records(records, to_block)
+
+    def add_tokens(self, tokens, token_count=None):
+        """Store `(data_hash, token_id)` pairs of the ResearchCertificate.
+
+        :param token_count: `getDataHashLen()` at the block the pairs were
+            read at, committed with them
+        """
+        self.db.executemany("INSERT OR REPLACE INTO token VALUES (?, ?)", tokens)
+        if token_count is not None:
+            self._set_meta("token_count", token_count)
+
+        self.db.commit()
+
+    def hashes(self):
+        """Every hash in the store, with or without a token id."""
+        rows = self.db.execute(
+            "SELECT data_hash FROM arc UNION SELECT source_code_hash FROM record "
+            "UNION SELECT data_hash FROM token"
+        )
+        return [row[0] for row in rows]
+
+    def unresolved_hashes(self):
+        """Hashes, data files and software, without a known token id."""
+        rows = self.db.execute(
+            "SELECT data_hash FROM arc UNION SELECT source_code_hash FROM record "
+            "EXCEPT SELECT data_hash FROM token"
+        )
+        return [row[0] for row in rows]
+
+    def resolve_tokens(self, cache):
+        """Look up missing token ids through a `CertificateCache`."""
+        hashes = self.unresolved_hashes()
+        token_ids = cache.token_indexes(hashes)
+        self.add_tokens((h, i) for h, i in zip(hashes, token_ids) if i)
+        return len(hashes)
+
+    def token_id(self, data_hash):
+        row = self.db.execute(
+            "SELECT token_id FROM token WHERE data_hash = ?", (data_hash,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _select(self, sql, params=()):
+        self.db.execute("DELETE FROM selected")
+        self.db.execute(f"INSERT OR IGNORE INTO selected {sql}", params)
+        rows = self.db.execute(
+            "SELECT r.id, r.block, r.log_index, r.tx, r.submitter, "
+            "r.source_code_hash, r.idx FROM selected JOIN record r USING (id) "
+            "ORDER BY r.block, r.log_index"
+        ).fetchall()
+        arcs = {row[0]: ([], []) for row in rows}
+        for record_id, output, data_hash in self.db.execute(
+            "SELECT a.record_id, a.output, a.data_hash FROM selected "
+            "JOIN arc a ON a.record_id = selected.id "
+            "ORDER BY a.record_id, a.output, a.position"
+        ):
+            arcs[record_id][output].append(data_hash)
+
+        return [ExecRecord(*row[1:], *arcs[row[0]]) for row in rows]
+
+    def executions(
+        self,
+        source_code_hash=None,
+        index=None,
+        data_hash=None,
+        token_id=None,
+        submitter=None,
+        include_deleted=False,
+    ):
+        """Records matching every given filter, in log order.
+
+        `data_hash` and `token_id` match records that read or wrote the file.
+        """
+        where = [] if include_deleted else ["r.deleted_block IS NULL"]
+        params = []
+        if token_id is not None:
+            row = self.db.execute(
+                "SELECT data_hash FROM token WHERE token_id = ?", (token_id,)
+            ).fetchone()
+            if row is None:
+                return []
+
+            data_hash = row[0]
+
+        for column, value in (
+            ("r.source_code_hash", source_code_hash),
+            ("r.idx", index),
+            ("r.submitter", submitter and submitter.lower()),
+        ):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+
+        sql = "SELECT r.id FROM record r"
+        if data_hash is not None:
+            sql += " JOIN arc a ON a.record_id = r.id AND a.data_hash = ?"
+            params.insert(0, data_hash)
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+
+        return self._select(sql, params)
+
+    def lineage(self, data_hashes, upstream=False, hops=None, include_deleted=False):
+        """Records downstream (or upstream) of the given data files.
+
+        :param hops: number of executions to follow from the files, all of
+            them by default
+        """
+        if hops is not None and hops < 1:
+            return []
+
+        self.db.execute("DELETE FROM start")
+        self.db.executemany(
+            "INSERT OR IGNORE INTO start VALUES (?)", [(h,) for h in data_hashes]
+        )
+        side = 1 if upstream else 0
+        live = "" if include_deleted else "AND r.deleted_block IS NULL"
+        joins = _EXECUTIONS.format(
+            side=side, live=live, live2=live.replace("r.", "r2.")
+        )
+        if hops is None:
+            seed = "SELECT data_hash FROM start"
+            step = f"SELECT n.data_hash FROM reach {joins}"
+        else:
+            seed = "SELECT data_hash, 0 FROM start"
+            step = f"SELECT n.data_hash, reach.depth + 1 FROM reach {joins}"
+
+        step += f"JOIN arc n ON n.record_id = r2.id AND n.output = {1 - side}"
+        if hops is not None:
+            step += f" WHERE reach.depth < {int(hops) - 1}"
+
+        columns = "data_hash" if hops is None else "data_hash, depth"
+        sql = (
+            f"WITH RECURSIVE reach ({columns}) AS ({seed} UNION {step}) "
+            f"SELECT r2.id FROM reach {joins}"
+        )
+        return self._select(sql)
+
+    def export_gv(self, fn, records=None):
+        """Write `records`, every live record by default, as a `.gv` file."""
+        if records is None:
+            records = self.executions()
+
+        return write_gv(records, fn)
+
+
+def _hash(value):
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value).rjust(
+        32, b"\0"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local store of execution records")
+    parser.add_argument("--db", default="provenance.db")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sync = subparsers.add_parser(
+        "sync", help="append the records logged since the last sync"
+    )
+    sync.add_argument(
+        "address", nargs="?", help="AutonomousSoftwareOrg contract address"
+    )
+    sync.add_argument("--rpc", default="http://127.0.0.1:8545")
+    sync.add_argument("--confirmations", type=int, default=0)
+    sync.add_argument("--roc", help="ResearchCertificate address, resolves token ids")
+    sync.add_argument("--roc_abi", default="build/contracts/ResearchCertificate.json")
+    export = subparsers.add_parser("export", help="write a subgraph as a .gv file")
+    export.add_argument("-o", "--output", default="original.gv")
+    export.add_argument("--software", help="sourceCodeHash of the executions")
+    export.add_argument("--data", nargs="+", help="data hashes the lineage starts from")
+    export.add_argument("--token", type=int, help="token id of a data file")
+    export.add_argument("--upstream", action="store_true")
+    export.add_argument("--hops", type=int)
+    export.add_argument("--include_deleted", action="store_true")
+    args = parser.parse_args()
+    with ProvenanceStore(args.db) as store:
+        if args.command == "sync":
+            from web3 import HTTPProvider, Web3
+
+            web3 = Web3(HTTPProvider(args.rpc))
+            count = store.sync(web3, args.address, confirmations=args.confirmations)
+            print(f"{count} logs stored, synced up to block {store.last_block}")
+            if args.roc:
+                from scripts.batch_reader import BatchReader, load_abi
+                from scripts.certificate_cache import CertificateCache
+
+                with BatchReader(args.rpc, args.roc, load_abi(args.roc_abi)) as reader:
+                    with CertificateCache(reader) as cache:
+                        print(f"{store.resolve_tokens(cache)} token ids resolved")
+
+            return
+
+        if args.data:
+            records = store.lineage(
+                [_hash(h) for h in args.data],
+                args.upstream,
+                args.hops,
+                args.include_deleted,
+            )
+        else:
+            records = store.executions(
+                source_code_hash=_hash(args.software) if args.software else None,
+                token_id=args.token,
+                include_deleted=args.include_deleted,
+            )
+
+        nodes, edges = store.export_gv(args.output, records)
+        print(f"{args.output}: {nodes} nodes, {edges} edges")
+
+
+if __name__ == "__main__":
+    main()
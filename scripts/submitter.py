@@ -0,0 +1,674 @@
+#!/usr/bin/python3
+
+import argparse
+import itertools
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future
+
+import requests
+
+from scripts.batch_reader import Function, load_abi
+from scripts.ingest import EXEC_RECORD_TOPIC, decode_exec_records
+
+try:
+    from eth_abi import decode
+except ImportError:  # eth-abi < 4
+    from eth_abi import decode_abi as decode
+
+Submitted = namedtuple("Submitted", "index tx block latency attempts")
+#: upper bounds of the gas of a record and of each new hash it certifies,
+#: `submit_many` packs records into transactions of at most `max_gas`
+RECORD_GAS = 100_000
+HASH_GAS = 200_000
+MAX_GAS = 6_000_000
+#: gas of the plain transfer that fills the nonce of a call given up
+FILL_GAS = 21_000
+
+
+class SubmitError(Exception):
+    """A transaction reverted, or was still not mined after every retry."""
+
+
+class _Pending:
+    def __init__(self, function, args, future):
+        self.function = function
+        self.args = args
+        self.future = future
+        self.nonce = None
+        self.hashes = []
+        self.gas = None
+        self.gas_price = None
+        self.first_sent = None
+        self.sent = None
+        self.attempts = 0
+        #: the call is given up, its nonce is sent as a self-transfer
+        self.filling = False
+        #: hashes of the self-transfers sent to fill the nonce
+        self.fills = set()
+
+
+def _bytes32(value):
+    """Hash as brownie converts it, hex strings are left padded."""
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+    return bytes(value).rjust(32, b"\0")
+
+
+def _split(batch, futures):
+    """Resolve the record futures of an `addSoftwareExecRecords` batch."""
+    try:
+        result = batch.result()
+    except Exception as e:
+        for future in futures:
+            future.set_exception(e)
+
+        return
+
+    for index, future in zip(result.index, futures):
+        future.set_result(result._replace(index=index))
+
+
+def percentile(values, q):
+    """Nearest-rank percentile, `q` in [0, 100]."""
+    values = sorted(values)
+    if not values:
+        return 0.0
+
+    return values[max(0, -(-q * len(values) // 100) - 1)]
+
+
+class Submitter:
+    """Pipelined `addSoftwareExecRecord` and `setNextExecutionCounter` calls.
+
+    Transactions get their nonces from a local counter and up to `in_flight`
+    of them wait for receipts at once; one thread polls the receipts of all
+    of them in a single JSON-RPC batch. A transaction that is not mined
+    within `timeout` seconds is sent again with the same nonce and a 12.5%
+    higher gas price if it holds the first unmined nonce, or with a new nonce
+    if its nonce was taken by another transaction. Transactions behind the
+    first unmined nonce only wait for it. After `retries` resends the call
+    is given up, but later transactions can not be mined before its nonce
+    is, so a 0-value self-transfer competes for that nonce until one of them
+    is mined; the call fails if the self-transfer wins.
+
+    Records keep the index semantics of the contract: index 0 allocates a
+    new index, which is read from the `LogSoftwareExecRecord` event, and an
+    index reserved with `reserve` is only used once its reservation is mined,
+    by the same account.
+
+    :param private_key: sign locally, otherwise `sender` must be unlocked on
+        the node
+    """
+
+    def __init__(
+        self,
+        url,
+        address,
+        abi,
+        sender,
+        private_key=None,
+        in_flight=64,
+        gas=None,
+        gas_price=None,
+        timeout=60,
+        poll=0.1,
+        retries=3,
+        senders=4,
+    ):
+        self.url = url
+        self.address = address
+        self.functions = {
+            entry["name"]: Function(entry)
+            for entry in abi
+            if entry.get("type") == "function"
+        }
+        self.sender = sender
+        self.private_key = private_key
+        self.gas = gas
+        self.timeout = timeout
+        self.poll = poll
+        self.retries = retries
+        self._local = threading.local()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.in_flight = in_flight
+        #: calls without a nonce, and sent ones waiting to be sent again
+        self._queue = deque()
+        self._resend = deque()
+        self._used = 0
+        self._queued = threading.Condition(self._lock)
+        self._pending = {}
+        self._outstanding = 0
+        self._closed = False
+        self.chain_id = int(self._rpc("eth_chainId", []), 16)
+        self.gas_price = gas_price or int(self._rpc("eth_gasPrice", []), 16)
+        self._nonce = int(self._rpc("eth_getTransactionCount", [sender, "pending"]), 16)
+        self.confirmed = 0
+        self.records = 0
+        self.failed = 0
+        self.resent = 0
+        self.replaced = 0
+        self.filled = 0
+        self.latencies = []
+        self.started = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._send_loop, daemon=True)
+            for _ in range(senders)
+        ]
+        self._threads.append(threading.Thread(target=self._poll_loop, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+
+        return self._local.session
+
+    def _post(self, payload):
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _rpc(self, method, params):
+        response = self._post(
+            {
+                "jsonrpc": "2.0",
+                "id": next(self._ids),
+                "method": method,
+                "params": params,
+            }
+        )
+        if "error" in response:
+            raise SubmitError(f"{method}: {response['error']}")
+
+        return response["result"]
+
+    def _rpc_batch(self, calls):
+        if not calls:
+            return []
+
+        payload = [
+            {"jsonrpc": "2.0", "id": idx, "method": method, "params": params}
+            for idx, (method, params) in enumerate(calls)
+        ]
+        results = [None] * len(calls)
+        for response in self._post(payload):
+            results[response["id"]] = response.get("result")
+
+        return results
+
+    # queueing
+
+    def _enqueue(self, pending):
+        with self._queued:
+            if pending.nonce is None:
+                self._queue.append(pending)
+            else:
+                self._resend.append(pending)
+
+            self._queued.notify_all()
+
+    def _release(self):
+        with self._queued:
+            self._used -= 1
+            self._queued.notify_all()
+
+    def _future(self):
+        with self._lock:
+            self._outstanding += 1
+
+        return Future()
+
+    def _done(self):
+        with self._queued:
+            self._outstanding -= 1
+            self._queued.notify_all()
+
+    def _call(self, function, args):
+        future = self._future()
+        self._enqueue(_Pending(function, args, future))
+        return future
+
+    def submit(self, source_code_hash, index, input_hash, output_hash):
+        """Queue an `addSoftwareExecRecord`, returns a future of `Submitted`.
+
+        :param index: 0 for a new index, a reserved index, or the future
+            returned by `reserve`
+        """
+        source_code_hash = _bytes32(source_code_hash)
+        input_hash = [_bytes32(h) for h in input_hash]
+        output_hash = [_bytes32(h) for h in output_hash]
+        if isinstance(index, Future):
+            future = self._future()
+
+            def _reserved(reservation):
+                try:
+                    args = (source_code_hash, reservation.result().index)
+                except Exception as e:
+                    future.set_exception(e)
+                    self._done()
+                    return
+
+                pending = _Pending(
+                    "addSoftwareExecRecord", args + (input_hash, output_hash), future
+                )
+                self._enqueue(pending)
+
+            index.add_done_callback(_reserved)
+            return future
+
+        args = (source_code_hash, index, input_hash, output_hash)
+        return self._call("addSoftwareExecRecord", args)
+
+    def submit_many(self, records, max_gas=MAX_GAS):
+        """Queue `(sourceCodeHash, index, inputHash, outputHash)` records as
+        `addSoftwareExecRecords` transactions, returns a future of `Submitted`
+        for each record.
+
+        Records are packed in order while their estimated gas fits `max_gas`,
+        the records of one transaction are added or reverted together.
+        """
+        chunks, chunk, gas = [], [], 0
+        for se, index, input_hash, output_hash in records:
+            record = (
+                _bytes32(se),
+                index,
+                [_bytes32(h) for h in input_hash],
+                [_bytes32(h) for h in output_hash],
+            )
+            cost = RECORD_GAS + HASH_GAS * (1 + len(input_hash) + len(output_hash))
+            if chunk and gas + cost > max_gas:
+                chunks.append(chunk)
+                chunk, gas = [], 0
+
+            chunk.append(record)
+            gas += cost
+
+        if chunk:
+            chunks.append(chunk)
+
+        futures = []
+        for chunk in chunks:
+            records = [Future() for _ in chunk]
+            batch = self._call("addSoftwareExecRecords", tuple(map(list, zip(*chunk))))
+            batch.add_done_callback(
+                lambda batch, records=records: _split(batch, records)
+            )
+            futures += records
+
+        return futures
+
+    def reserve(self, source_code_hash):
+        """Queue a `setNextExecutionCounter`, the index is in its `Submitted`."""
+        return self._call("setNextExecutionCounter", (_bytes32(source_code_hash),))
+
+    # sending
+
+    def _transaction(self, pending):
+        return {
+            "from": self.sender,
+            "to": self.address,
+            "data": self.functions[pending.function].encode(pending.args),
+        }
+
+    def _estimate(self, pending):
+        """Gas limit, a call that would revert fails here before it takes a nonce."""
+        if self.gas:
+            return self.gas
+
+        return (
+            int(self._rpc("eth_estimateGas", [self._transaction(pending)]), 16) * 6 // 5
+        )
+
+    def _send(self, pending, fill=False):
+        if fill:
+            tx = {"from": self.sender, "to": self.sender, "data": "0x"}
+        else:
+            tx = self._transaction(pending)
+
+        tx.update(
+            nonce=hex(pending.nonce),
+            gas=hex(FILL_GAS if fill else pending.gas),
+            gasPrice=hex(pending.gas_price),
+        )
+        if self.private_key is None:
+            return self._rpc("eth_sendTransaction", [tx])
+
+        from eth_account import Account
+
+        tx = {key: value for key, value in tx.items() if key != "from"}
+        for key in ("nonce", "gasPrice", "gas"):
+            tx[key] = int(tx[key], 16)
+
+        tx.update(chainId=self.chain_id, value=0)
+        signed = Account.sign_transaction(tx, self.private_key)
+        raw = getattr(signed, "raw_transaction", None) or signed.rawTransaction
+        return self._rpc("eth_sendRawTransaction", ["0x" + bytes(raw).hex()])
+
+    def _finished(self):
+        return self._closed and not self._outstanding
+
+    def _send_loop(self):
+        while True:
+            with self._queued:
+                while True:
+                    #: sent transactions hold their slots, they go first
+                    if self._resend:
+                        pending = self._resend.popleft()
+                        break
+
+                    if self._queue and self._used < self.in_flight:
+                        pending = self._queue.popleft()
+                        self._used += 1
+                        break
+
+                    if self._finished():
+                        return
+
+                    self._queued.wait()
+
+            if pending.nonce is None:
+                try:
+                    pending.gas = self._estimate(pending)
+                except (SubmitError, OSError) as e:
+                    self._finish(pending, exception=e)
+                    continue
+
+                with self._lock:
+                    pending.nonce = self._nonce
+                    pending.gas_price = self.gas_price
+                    self._nonce += 1
+
+            fill = pending.filling
+            try:
+                tx_hash = self._send(pending, fill)
+            except (SubmitError, OSError):
+                #: the nonce is taken, it is sent again after `timeout`
+                tx_hash = None
+
+            now = time.perf_counter()
+            with self._lock:
+                if tx_hash is not None:
+                    pending.hashes.append(tx_hash)
+                    if fill:
+                        pending.fills.add(tx_hash)
+
+                pending.attempts += 1
+                pending.sent = now
+                if pending.first_sent is None:
+                    pending.first_sent = now
+
+                self._pending[pending.nonce] = pending
+
+    # receipts
+
+    def _index(self, pending, receipt):
+        if pending.function == "setNextExecutionCounter":
+            #: the reserved index is only in the return value, ganache and
+            #: geth keep it in the trace as brownie's `return_value` does
+            trace = self._rpc(
+                "debug_traceTransaction", [receipt["transactionHash"], {}]
+            )
+            value = trace["returnValue"]
+            (index,) = decode(
+                ["uint32"],
+                bytes.fromhex(value[2:] if value.startswith("0x") else value),
+            )
+            return index
+
+        indexes = [
+            record.index
+            for record in decode_exec_records(
+                log for log in receipt["logs"] if log["topics"][0] == EXEC_RECORD_TOPIC
+            )
+        ]
+        if pending.function == "addSoftwareExecRecords":
+            return indexes
+
+        for index in indexes:
+            return index
+
+        return pending.args[1]
+
+    def _finish(self, pending, receipt=None, exception=None):
+        with self._lock:
+            if self._pending.get(pending.nonce) is pending:
+                del self._pending[pending.nonce]
+
+        self._release()
+        try:
+            if exception is not None:
+                raise exception
+
+            tx_hash = receipt["transactionHash"]
+            if tx_hash in pending.fills:
+                with self._lock:
+                    self.filled += 1
+
+                raise SubmitError(
+                    f"nonce {pending.nonce} not mined, filled by {tx_hash}: "
+                    f"{pending.hashes}"
+                )
+
+            if int(receipt["status"], 16) != 1:
+                raise SubmitError(f"{pending.function} reverted: {tx_hash}")
+
+            result = Submitted(
+                self._index(pending, receipt),
+                receipt["transactionHash"],
+                int(receipt["blockNumber"], 16),
+                time.perf_counter() - pending.first_sent,
+                pending.attempts,
+            )
+        except (SubmitError, OSError) as e:
+            with self._lock:
+                self.failed += 1
+
+            pending.future.set_exception(e)
+        else:
+            with self._lock:
+                self.confirmed += 1
+                self.latencies.append(result.latency)
+                if pending.function == "addSoftwareExecRecords":
+                    self.records += len(result.index)
+                elif pending.function == "addSoftwareExecRecord":
+                    self.records += 1
+
+            pending.future.set_result(result)
+
+        self._done()
+
+    def _retry(self, pending, mined_nonce):
+        if pending.nonce > mined_nonce:
+            #: behind an unmined nonce, it keeps its transaction and retries
+            pending.sent = time.perf_counter()
+            return
+
+        if pending.nonce < mined_nonce and (
+            pending.attempts > self.retries or pending.fills
+        ):
+            error = SubmitError(f"nonce {pending.nonce} not mined: {pending.hashes}")
+            self._finish(pending, exception=error)
+            return
+
+        with self._lock:
+            del self._pending[pending.nonce]
+
+        if pending.nonce < mined_nonce:
+            #: another transaction took the nonce, send the call again
+            self.replaced += 1
+            pending.nonce = None
+            pending.gas = None
+            self._release()
+        else:
+            #: dropped or underpriced, replace it with the same nonce
+            self.resent += 1
+            pending.gas_price = pending.gas_price * 9 // 8 + 1
+            pending.filling = pending.attempts > self.retries
+
+        self._enqueue(pending)
+
+    def _poll_loop(self):
+        while True:
+            with self._lock:
+                pendings = list(self._pending.values())
+                if self._finished():
+                    return
+
+            calls = [
+                ("eth_getTransactionReceipt", [tx_hash])
+                for pending in pendings
+                for tx_hash in pending.hashes
+            ]
+            try:
+                receipts = iter(self._rpc_batch(calls))
+            except OSError:
+                time.sleep(self.poll)
+                continue
+
+            now = time.perf_counter()
+            stale = []
+            for pending in pendings:
+                mined = [r for r in (next(receipts) for _ in pending.hashes) if r]
+                if mined:
+                    self._finish(pending, mined[0])
+                elif now - pending.sent > self.timeout:
+                    stale.append(pending)
+
+            if stale:
+                self._check_stale(stale)
+
+            time.sleep(self.poll)
+
+    def _check_stale(self, stale):
+        #: the nonce is read before the receipts, a transaction mined in
+        #: between is found and never mistaken for a replaced one
+        try:
+            count = self._rpc("eth_getTransactionCount", [self.sender, "latest"])
+            calls = [
+                ("eth_getTransactionReceipt", [tx_hash])
+                for pending in stale
+                for tx_hash in pending.hashes
+            ]
+            receipts = iter(self._rpc_batch(calls))
+        except (SubmitError, OSError):
+            return
+
+        for pending in stale:
+            mined = [r for r in (next(receipts) for _ in pending.hashes) if r]
+            if mined:
+                self._finish(pending, mined[0])
+            else:
+                self._retry(pending, int(count, 16))
+
+    def close(self):
+        """Wait until every queued call is mined or failed."""
+        with self._queued:
+            self._closed = True
+            self._queued.notify_all()
+
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            "confirmed": self.confirmed,
+            "failed": self.failed,
+            "resent": self.resent,
+            "replaced": self.replaced,
+            "filled": self.filled,
+            "seconds": seconds,
+            "tx_per_second": self.confirmed / seconds if seconds else 0.0,
+            "records": self.records,
+            "records_per_second": self.records / seconds if seconds else 0.0,
+            "latency_p50": percentile(self.latencies, 50),
+            "latency_p95": percentile(self.latencies, 95),
+            "latency_p99": percentile(self.latencies, 99),
+        }
+
+
+def md5_hash():
+    return "%032x" % random.getrandbits(128)
+
+
+def bench(url, address, abi, sender, count, in_flight=(1, 8, 64), batch=0, **kwargs):
+    """Throughput and confirmation latency of `count` new records at each
+    `in_flight` limit, every record with 2 inputs and 1 output.
+
+    :param batch: also send the records with `submit_many`, up to `batch` of
+        them in one transaction
+    """
+    results = {}
+    for n in in_flight:
+        for size in (0, batch) if batch else (0,):
+            records = [
+                (md5_hash(), 0, [md5_hash(), md5_hash()], [md5_hash()])
+                for _ in range(count)
+            ]
+            with Submitter(
+                url, address, abi, sender, in_flight=n, **kwargs
+            ) as submitter:
+                if size:
+                    futures = []
+                    for idx in range(0, count, size):
+                        futures += submitter.submit_many(records[idx : idx + size])
+                else:
+                    futures = [submitter.submit(*record) for record in records]
+
+            for future in futures:
+                future.result()
+
+            name = f"in_flight={n}" + (f",batch={size}" if size else "")
+            results[name] = submitter.stats()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipelined execution record submitter")
+    parser.add_argument("address", help="AutonomousSoftwareOrg contract address")
+    parser.add_argument("sender", help="member and eBlocBroker provider account")
+    parser.add_argument("--rpc", default="http://127.0.0.1:8545")
+    parser.add_argument("--abi", default="build/contracts/AutonomousSoftwareOrg.json")
+    parser.add_argument("--private_key", help="sign locally instead of on the node")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--in_flight", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--batch", type=int, default=0, help="records per transaction")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    results = bench(
+        args.rpc,
+        args.address,
+        load_abi(args.abi),
+        args.sender,
+        args.count,
+        args.in_flight,
+        args.batch,
+        private_key=args.private_key,
+        timeout=args.timeout,
+    )
+    for name, result in results.items():
+        print(
+            f"{name:>20}: {result['tx_per_second']:.1f} tx/s, "
+            f"{result['records_per_second']:.1f} records/s, latency "
+            f"p50={result['latency_p50']:.3f}s p95={result['latency_p95']:.3f}s "
+            f"p99={result['latency_p99']:.3f}s, {result['resent']} resent, "
+            f"{result['replaced']} replaced, {result['failed']} failed"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 
 import pytest
+from broker.eblocbroker_scripts.utils import Cent
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -33,3 +34,20 @@ def _Auto(_Ebb, _Roc, AutonomousSoftwareOrg, accounts):
     yield AutonomousSoftwareOrg.deploy(
         "0x01234", 2, 3, "0x", _Ebb.address, _Roc.address, {"from": accounts[0]}
     )
+
+
+@pytest.fixture
+def provider(_Ebb, accounts):
+    """accounts[0] registered as an eBlocBroker provider, so it can add records."""
+    prices = [Cent("1 cent"), Cent("1 cent"), Cent("1 cent"), Cent("1 cent")]
+    _Ebb.registerProvider(
+        "0359190A05DF2B72729344221D522F92EFA2F330",
+        "provider_test@gmail.com",
+        "ee14ea28-b869-1036-8080-9dbd8c6b1579@b2drop.eudat.eu",
+        "/ip4/79.123.177.145/tcp/4001/ipfs/QmWmZQnb8xh3gHf9ZFmVQC4mLEav3Uht5kHJxZtixG3rsf",
+        8,
+        prices,
+        600,
+        {"from": accounts[0]},
+    )
+    return accounts[0]
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+
+import random
+
+import pytest
+
+from scripts.batch_reader import BatchReader, CallError, read_arcs, read_data_arcs
+
+auto = None
+
+
+@pytest.fixture(scope="module", autouse=True)
+def my_own_session_run_at_beginning(_Auto):
+    global auto  # type: ignore
+    auto = _Auto
+
+
+def test_batch_reader(web3, accounts):
+    for account in accounts[1:4]:
+        auto.BecomeMemberCandidate(f"url_{account}", {"from": account})
+
+    deadline = web3.eth.block_number + 100
+    for idx in range(5):
+        auto.ProposeProposal(
+            f"Prop{idx}", "1.0.0", "0x", idx, deadline, {"from": accounts[0]}
+        )
+
+    calls = [("getMemberInfoLength", ())]
+    calls += [("getProposal", (idx,)) for idx in range(5)]
+    calls += [("getCandidateMemberInfo", (idx,)) for idx in range(2, 5)]
+    with BatchReader(
+        web3.provider.endpoint_uri, auto.address, auto.abi, batch_size=3, workers=2
+    ) as reader:
+        results = reader.call_many(calls)
+        assert results[0] == auto.getMemberInfoLength()
+        for idx, proposal in enumerate(results[1:6]):
+            assert proposal == tuple(auto.getProposal(idx))
+
+        for idx, member in zip(range(2, 5), results[6:]):
+            assert member == tuple(auto.getCandidateMemberInfo(idx))
+
+        #: the owner is a member, getCandidateMemberInfo(1) reverts
+        results = reader.call_many(
+            [("getProposal", (0,)), ("getCandidateMemberInfo", (1,))],
+            raise_errors=False,
+        )
+        assert isinstance(results[1], CallError)
+        with pytest.raises(CallError):
+            reader.call_many([("getCandidateMemberInfo", (1,))])
+
+        stats = reader.stats()
+
+    assert stats["calls"] == 12
+    assert stats["round_trips"] < stats["calls"]
+
+
+def md5_hash():
+    _hash = random.getrandbits(128)
+    return "%032x" % _hash
+
+
+def test_read_data_arcs(web3, provider):
+    records = [
+        (md5_hash(), 0, [md5_hash() for _ in range(n)], [md5_hash()]) for n in range(6)
+    ]
+    tx = auto.addSoftwareExecRecords(*map(list, zip(*records)), {"from": provider})
+    assert list(tx.return_value) == list(range(1, 7))
+    executions = [
+        (event["sourceCodeHash"], event["index"])
+        for event in tx.events["LogSoftwareExecRecord"]
+    ]
+    assert [index for _, index in executions] == list(range(1, 7))
+    for (se, index), (_, _, input_hash, _) in zip(executions, records):
+        assert len(auto.getIncomingDataArcs(se, index)) == len(input_hash)
+
+    with BatchReader(web3.provider.endpoint_uri, auto.address, auto.abi) as reader:
+        arcs = read_arcs(reader, executions)
+        calls, round_trips = reader.calls, reader.round_trips
+        assert read_data_arcs(reader, executions, per_call=4) == arcs
+        assert reader.calls - calls == 2
+        #: the block number and a single batch of both calls
+        assert reader.round_trips - round_trips == 2
+
+
+def test_add_records_gas(provider):
+    records = [(md5_hash(), 0, [md5_hash()], [md5_hash()]) for _ in range(5)]
+    #: the first record pays for the counters that start at zero
+    auto.addSoftwareExecRecord(*records[0], {"from": provider})
+    single = [
+        auto.addSoftwareExecRecord(*record, {"from": provider}).gas_used
+        for record in records[1:3]
+    ]
+    tx = auto.addSoftwareExecRecords(*map(list, zip(*records[3:])), {"from": provider})
+    #: the intrinsic 21000 gas is paid once for the whole batch
+    assert tx.gas_used < sum(single) - 15_000
@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+import pytest
+
+from scripts.gas_profile import compare, fit, summary
+
+
+def test_summary():
+    assert summary([5]) == {"count": 1, "min": 5, "median": 5.0, "p95": 5}
+    #: nearest rank, the ceil(0.95 * n)-th smallest sample
+    assert summary(range(20, 0, -1))["p95"] == 19
+    assert summary(range(1, 101))["p95"] == 95
+    assert summary(range(1, 102))["p95"] == 96
+    stats = summary([30, 10, 20, 40])
+    assert (stats["count"], stats["min"], stats["median"]) == (4, 10, 25.0)
+
+
+def test_fit():
+    xs = [1, 2, 4, 8, 8]
+    line = fit(xs, [21000 + 500 * x for x in xs])
+    assert line["slope"] == pytest.approx(500)
+    assert line["intercept"] == pytest.approx(21000)
+    #: a single element count has no slope
+    assert fit([4, 4], [100, 300]) == {"slope": 0.0, "intercept": 200.0}
+
+
+def _results(median, point, slope):
+    return {
+        "functions": {"addSoftwareExecRecord": {"median": median}},
+        "sweeps": {
+            "addSoftwareExecRecord/inputs": {
+                "points": {"1": {"median": point}},
+                "slope": slope,
+            }
+        },
+    }
+
+
+def test_compare():
+    baseline = _results(100_000, 50_000, 1_000)
+    assert compare(baseline, baseline) == []
+    #: 2% over the baseline plus 100 gas of slack
+    assert compare(_results(102_100, 51_100, 1_120), baseline) == []
+    regressions = compare(_results(102_101, 51_101, 1_121), baseline)
+    assert len(regressions) == 3
+    assert regressions[0].startswith("addSoftwareExecRecord: 102101 > 102100")
+    assert "[1]" in regressions[1]
+    assert "slope" in regressions[2]
+    assert len(compare(_results(102_101, 0, 0), baseline, tolerance=0.05)) == 0
+    assert len(compare(_results(100_001, 0, 0), baseline, tolerance=0, slack=0)) == 1
+
+
+def test_compare_new_entries():
+    results = _results(100_000, 50_000, 1_000)
+    results["sweeps"]["addSoftwareExecRecord/inputs"]["points"]["2"] = {"median": 10**9}
+    #: functions, sweeps and points missing from the baseline are not compared
+    assert compare(results, {}) == []
+    baseline = _results(100_000, 50_000, 1_000)
+    assert compare(results, baseline) == []
@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from scripts.ingest import EXEC_RECORD_TOPIC, exec_records, get_logs, hash_id, write_gv
+
+auto = None
+roc = None
+
+
+@pytest.fixture(scope="module", autouse=True)
+def my_own_session_run_at_beginning(_Auto, _Roc):
+    global auto  # type: ignore
+    global roc
+    auto = _Auto
+    roc = _Roc
+
+
+def md5_hash():
+    _hash = random.getrandbits(128)
+    return "%032x" % _hash
+
+
+def test_ingest(web3, accounts, provider, tmp_path):
+    start = web3.eth.block_number
+    jobs = []
+    data = [md5_hash() for _ in range(8)]
+    for _ in range(12):
+        se = md5_hash()
+        input_hash = random.sample(data, 2)
+        output_hash = [md5_hash()]
+        data += output_hash
+        tx = auto.addSoftwareExecRecord(
+            se, 0, input_hash, output_hash, {"from": accounts[0]}
+        )
+        jobs.append((se, tx.return_value))
+
+    #: chunk=1 starts with one block per eth_getLogs call, it grows from there
+    records = list(exec_records(web3, auto.address, start, chunk=1))
+    assert [(hash_id(r.source_code_hash), r.index) for r in records] == [
+        (hash_id(se), index) for se, index in jobs
+    ]
+    for record in records:
+        incoming = [
+            roc.getDataHash(
+                auto.getIncomingData(record.source_code_hash, record.index, i) - 1
+            )
+            for i in range(
+                auto.getNoOfIncomingDataArcs(record.source_code_hash, record.index)
+            )
+        ]
+        assert [hash_id(h) for h in record.input_hash] == [hash_id(h) for h in incoming]
+        assert record.submitter.lower() == accounts[0].address.lower()
+
+    nodes, edges = write_gv(records, tmp_path / "ingest.gv")
+    assert edges == sum(len(r.input_hash) + len(r.output_hash) for r in records)
+
+
+class LimitedProvider:
+    """Refuses `eth_getLogs` ranges over `limit` blocks, or fails them all
+    with `error`."""
+
+    def __init__(self, provider, limit=None, error=None):
+        self.provider = provider
+        self.limit = limit
+        self.error = error
+        self.ranges = []
+
+    def make_request(self, method, params):
+        if method == "eth_getLogs":
+            size = int(params[0]["toBlock"], 16) - int(params[0]["fromBlock"], 16) + 1
+            self.ranges.append(size)
+            if self.error:
+                return {"jsonrpc": "2.0", "id": 0, "error": self.error}
+
+            if size > self.limit:
+                error = {"code": -32005, "message": "query returned more than 10000"}
+                return {"jsonrpc": "2.0", "id": 0, "error": error}
+
+        return self.provider.make_request(method, params)
+
+
+def test_get_logs_split(web3, accounts):
+    start = web3.eth.block_number + 1
+    for _ in range(6):
+        auto.addSoftwareExecRecord(
+            md5_hash(), 0, [md5_hash()], [md5_hash()], {"from": accounts[0]}
+        )
+
+    end = web3.eth.block_number
+    topics = [EXEC_RECORD_TOPIC]
+    expected = list(get_logs(web3, auto.address, start, end, topics))
+    provider = LimitedProvider(web3.provider, limit=2)
+    limited = SimpleNamespace(provider=provider, eth=web3.eth)
+    assert list(get_logs(limited, auto.address, start, end, topics, chunk=6)) == (
+        expected
+    )
+    assert len(expected) == 6
+    #: 6 blocks are refused, then 3, until the ranges fit
+    assert provider.ranges[:2] == [6, 3]
+    assert sum(size for size in provider.ranges if size <= 2) == 6
+
+
+def test_get_logs_error(web3):
+    error = {"code": -32601, "message": "the method eth_getLogs does not exist"}
+    provider = LimitedProvider(web3.provider, error=error)
+    limited = SimpleNamespace(provider=provider, eth=web3.eth)
+    with pytest.raises(ValueError):
+        list(get_logs(limited, auto.address, 1, 1000, []))
+
+    #: raised at once, the range is not split down to a single block
+    assert provider.ranges == [1000]
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+
+import random
+
+import pytest
+
+from scripts.batch_reader import BatchReader
+from scripts.pipeline import Pipeline
+from scripts.store import ProvenanceStore
+
+auto = None
+roc = None
+
+
+@pytest.fixture(scope="module", autouse=True)
+def my_own_session_run_at_beginning(_Auto, _Roc):
+    global auto  # type: ignore
+    global roc
+    auto = _Auto
+    roc = _Roc
+
+
+def md5_hash():
+    _hash = random.getrandbits(128)
+    return "%032x" % _hash
+
+
+def add_records(account, count):
+    data = [md5_hash()]
+    for _ in range(count):
+        output_hash = [md5_hash()]
+        auto.addSoftwareExecRecord(
+            md5_hash(), 0, [random.choice(data)], output_hash, {"from": account}
+        )
+        data += output_hash
+
+
+def test_pipeline(web3, provider, tmp_path):
+    add_records(provider, 20)
+    with BatchReader(web3.provider.endpoint_uri, roc.address, roc.abi) as reader:
+        with ProvenanceStore(tmp_path / "pipeline.db") as store:
+            pipeline = Pipeline(store, web3, reader, auto.address, window=3)
+            to_block = web3.eth.block_number
+            assert pipeline.run(to_block - 10) + pipeline.run() == 20
+            assert store.last_block == to_block
+            assert store.token_count == roc.getDataHashLen()
+            #: resumes after the last stored block
+            assert pipeline.run() == 0
+
+            add_records(provider, 5)
+            assert pipeline.run() == 5
+            assert store.token_count == roc.getDataHashLen()
+            assert store.unresolved_hashes() == []
+            executions = store.executions()
+            tokens = store.db.execute("SELECT * FROM token").fetchall()
+
+    #: the same records as a sequential sync
+    with ProvenanceStore(tmp_path / "sequential.db") as store:
+        store.sync(web3, auto.address)
+        assert store.executions() == executions
+
+    for data_hash, token_id in tokens:
+        assert roc.getTokenIndex(data_hash) == token_id
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+
+import random
+
+import pytest
+
+from scripts.batch_reader import BatchReader
+from scripts.certificate_cache import CertificateCache
+from scripts.ingest import hash_id
+from scripts.store import ProvenanceStore
+
+auto = None
+roc = None
+
+
+@pytest.fixture(scope="module", autouse=True)
+def my_own_session_run_at_beginning(_Auto, _Roc):
+    global auto  # type: ignore
+    global roc
+    auto = _Auto
+    roc = _Roc
+
+
+def md5_hash():
+    _hash = random.getrandbits(128)
+    return "%032x" % _hash
+
+
+def bytes32(h):
+    """The bytes32 value brownie passes for a hex string, left padded."""
+    return bytes.fromhex(h).rjust(32, b"\0")
+
+
+def add_record(account, input_hash, output_hash):
+    se = md5_hash()
+    tx = auto.addSoftwareExecRecord(se, 0, input_hash, output_hash, {"from": account})
+    return se, tx.return_value
+
+
+def test_store(web3, provider, tmp_path):
+    raw = md5_hash()
+    a = md5_hash()
+    b = md5_hash()
+    se_1, index_1 = add_record(provider, [raw], [a])
+    se_2, index_2 = add_record(provider, [a], [b])
+    with ProvenanceStore(tmp_path / "provenance.db") as store:
+        assert store.sync(web3, auto.address) == 2
+        assert store.sync(web3) == 0
+        last_block = store.last_block
+        se_3, index_3 = add_record(provider, [b], [md5_hash()])
+        assert store.sync(web3) == 1
+        assert store.last_block > last_block
+
+        downstream = store.lineage([bytes32(raw)])
+        assert [hash_id(r.source_code_hash) for r in downstream] == [
+            hash_id(se_1),
+            hash_id(se_2),
+            hash_id(se_3),
+        ]
+        upstream = store.lineage([bytes32(b)], upstream=True)
+        assert {r.index for r in upstream} == {index_1, index_2}
+
+        #: a deleted record stays as a tombstone
+        auto.delSoftwareExecRecord(se_2, index_2, {"from": provider})
+        assert store.sync(web3) == 1
+        assert len(store.executions()) == 2
+        assert len(store.executions(include_deleted=True)) == 3
+        assert len(store.lineage([bytes32(raw)])) == 1
+
+        with BatchReader(web3.provider.endpoint_uri, roc.address, roc.abi) as reader:
+            with CertificateCache(reader, tmp_path / "certificates.db") as cache:
+                store.resolve_tokens(cache)
+
+        token_id = roc.getTokenIndex(a)
+        assert store.token_id(bytes32(a)) == token_id
+        assert [r.index for r in store.executions(token_id=token_id)] == [index_1]
+        assert store.export_gv(tmp_path / "subgraph.gv", upstream) == (5, 4)
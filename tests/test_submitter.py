@@ -0,0 +1,141 @@
+#!/usr/bin/python3
+
+import random
+
+import pytest
+from brownie import chain
+
+from scripts.submitter import SubmitError, Submitter
+
+auto = None
+
+
+@pytest.fixture(scope="module", autouse=True)
+def my_own_session_run_at_beginning(_Auto):
+    global auto  # type: ignore
+    auto = _Auto
+
+
+def md5_hash():
+    _hash = random.getrandbits(128)
+    return "%032x" % _hash
+
+
+def test_submitter(web3, provider):
+    se = md5_hash()
+    with Submitter(
+        web3.provider.endpoint_uri, auto.address, auto.abi, str(provider), in_flight=8
+    ) as submitter:
+        futures = [
+            submitter.submit(md5_hash(), 0, [md5_hash()], [md5_hash()])
+            for _ in range(20)
+        ]
+        reservation = submitter.reserve(se)
+        reserved = submitter.submit(se, reservation, [md5_hash()], [md5_hash()])
+        #: not owned by the provider, reverts before it takes a nonce
+        failed = submitter.submit(md5_hash(), 1000, [], [])
+
+    indexes = [future.result().index for future in futures]
+    #: the reservation may take its index before some of the submits
+    assert sorted(indexes + [reservation.result().index]) == list(range(1, 22))
+    for future in futures:
+        tx = chain.get_transaction(future.result().tx)
+        assert tx.events["LogSoftwareExecRecord"]["index"] == future.result().index
+
+    assert reserved.result().index == reservation.result().index
+    assert auto.getNoOfIncomingDataArcs(se, reservation.result().index) == 1
+    with pytest.raises(SubmitError):
+        failed.result()
+
+    stats = submitter.stats()
+    assert stats["confirmed"] == 22
+    assert stats["failed"] == 1
+
+
+class DroppingSubmitter(Submitter):
+    """Never sends the call that gets the 6th nonce, only its filler."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dropped = self._nonce + 5
+
+    def _send(self, pending, fill=False):
+        if pending.nonce == self.dropped and not fill:
+            return "0x" + "00" * 32
+
+        return super()._send(pending, fill)
+
+
+def test_submitter_fills_dropped_nonce(web3, provider):
+    with DroppingSubmitter(
+        web3.provider.endpoint_uri,
+        auto.address,
+        auto.abi,
+        str(provider),
+        timeout=1,
+        retries=1,
+    ) as submitter:
+        futures = [
+            submitter.submit(md5_hash(), 0, [md5_hash()], [md5_hash()])
+            for _ in range(10)
+        ]
+
+    failed = [future for future in futures if future.exception()]
+    assert len(failed) == 1
+    with pytest.raises(SubmitError):
+        failed[0].result()
+
+    #: the calls behind the gap are mined once the filler takes its nonce
+    indexes = [future.result().index for future in futures if future not in failed]
+    assert sorted(indexes) == list(range(1, 10))
+    stats = submitter.stats()
+    assert stats["confirmed"] == 9
+    assert stats["filled"] == 1
+    assert web3.eth.get_transaction_count(str(provider)) == submitter.dropped + 5
+
+
+def test_submitter_waits_behind_gap(web3, provider):
+    with DroppingSubmitter(
+        web3.provider.endpoint_uri,
+        auto.address,
+        auto.abi,
+        str(provider),
+        timeout=0.5,
+        retries=2,
+    ) as submitter:
+        futures = [
+            submitter.submit(md5_hash(), 0, [md5_hash()], [md5_hash()])
+            for _ in range(10)
+        ]
+
+    failed = [future for future in futures if future.exception()]
+    assert len(failed) == 1
+    assert "filled by" in str(failed[0].exception())
+    behind = [
+        future.result()
+        for future in futures
+        if future not in failed
+        and web3.eth.get_transaction(future.result().tx)["nonce"] > submitter.dropped
+    ]
+    assert len(behind) == 4
+    #: they timed out while the gap was open, but were never sent again
+    assert all(result.latency > 0.5 for result in behind)
+    assert all(result.attempts == 1 for result in behind)
+    assert submitter.stats()["filled"] == 1
+
+
+def test_submit_many(web3, provider):
+    records = [(md5_hash(), 0, [md5_hash()], [md5_hash()]) for _ in range(10)]
+    with Submitter(
+        web3.provider.endpoint_uri, auto.address, auto.abi, str(provider)
+    ) as submitter:
+        #: at most 3 records fit into a transaction
+        futures = submitter.submit_many(records, max_gas=2_100_000)
+
+    indexes = [future.result().index for future in futures]
+    assert sorted(indexes) == list(range(1, 11))
+    assert len({future.result().tx for future in futures}) == 4
+    for index, (se, *_) in zip(indexes, records):
+        assert auto.getNoOfIncomingDataArcs(se, index) == 1
+
+    assert submitter.stats()["records"] == 10
@@ -7,6 +7,11 @@ import pytest
 import random
 from broker.eblocbroker_scripts.utils import Cent
 
+from scripts.certificate_cache import CertificateCache
+from scripts.export import GraphWriter, write_executions
+from scripts.gas_profile import summary
+from scripts.ingest import exec_records, write_gv
+
 auto = None
 ebb = None
 roc = None
@@ -15,13 +20,8 @@ gas_costs = {}
 
 
 def print_gas_costs():
-    log("average_gas_costs=", end="")
-    gas_costs_items_temp = {}
-    for k, v in gas_costs.items():
-        if v:
-            gas_costs_items_temp[k] = int(sum(v) / len(v))
-
-    log(dict(gas_costs_items_temp))
+    log("gas_costs=", end="")
+    log({k: summary(v) for k, v in gas_costs.items() if v})
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -98,7 +98,7 @@ def test_paper(web3, accounts):
     append_gas_cost("UsedBySoftware", tx)
 
 
-def test_AutonomousSoftwareOrg(accounts):
+def test_AutonomousSoftwareOrg(web3, accounts, tmp_path):
     se = md5_hash()
     input_hash = [md5_hash(), "0xabcd"]
     output_hash = [md5_hash(), "0xabcde"]
@@ -178,103 +178,33 @@ def test_AutonomousSoftwareOrg(accounts):
     assert auto.getSoftwareExecutionCounter() == 2
     assert tx.return_value == 3
     # -=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
-    log()
-    jobs = [f"{se}_{index}", f"{se_2}_{index}"]
-    counter = 1
-    nodes = {}
-    for job in jobs:
-        output = job.split("_")
-        _se = output[0]
-        _index = output[1]
-        nodes[counter] = job
-        counter += 1
-        output = []
-        for i in range(auto.getNoOfIncomingDataArcs(_se, _index)):
-            output.append(auto.getIncomingData(_se, _index, i))
-
-        for h in output:
-            try:
-                [*nodes.keys()][[*nodes.values()].index(h)]
-            except:  # noqa
-                log(f"{h} -> {job}", h=False)
-                nodes[counter] = h
-                counter += 1
-
-        output = []
-        for i in range(auto.getNoOfOutgoingDataArcs(_se, _index)):
-            output.append(auto.getOutgoingData(_se, _index, i))
-
-        for h in output:
-            try:
-                [*nodes.keys()][[*nodes.values()].index(h)]
-            except:  # noqa
-                log(f"{job} -> {h}", h=False)
-                nodes[counter] = h
-                counter += 1
-
-        log(output)
-
-    log("var nodes = new vis.DataSet([")
-    for key, value in nodes.items():
-        log("    {")
-        log(f"       id: {key},")
-        if not isinstance(value, int):
-            val = value.split("_")[0]
-            val1 = value.split("_")[1]
-            log(f'       label: "{roc.getTokenIndex(val)}_{val1}",')
-        else:
-            log(f'       label: "{value}",')
-
-        if isinstance(value, int):
-            val = str(roc.getDataHash(value - 1)).replace("0x", "").lstrip("0")
-            log(f'       title: "{val}",')
-        else:
-            log(f'       title: "{value}",')
-
-        if "_" in str(value):
-            log('       color: "#7BE141",')
-
-        log("    },")
-
-    log("]);")
-    # -=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
-    log("var edges = new vis.DataSet([")
-    for job in jobs:
-        output = job.split("_")
-        _se = output[0]
-        _index = output[1]
-        nodes[counter] = _se
-        counter += 1
-        output = []
-        for i in range(auto.getNoOfIncomingDataArcs(_se, _index)):
-            output.append(auto.getIncomingData(_se, _index, i))
-
-        for h in output:
-            # log(f"{_h} -> {job}", h=False)
-            _from = [*nodes.keys()][[*nodes.values()].index(h)]
-            _to = [*nodes.keys()][[*nodes.values()].index(job)]
-
-            log("    { ", end="")
-            log(f'from: {_from}, to: {_to}, arrows: "to", color: ', end="")
-            log('{ color: "red" } },')
-            nodes[counter] = h
-            counter += 1
-
-        output = []
-        for i in range(auto.getNoOfOutgoingDataArcs(_se, _index)):
-            output.append(auto.getOutgoingData(_se, _index, i))
-
-        for h in output:
-            # log(f"{job} -> {_h}", h=False)
-            _from = [*nodes.keys()][[*nodes.values()].index(job)]
-            _to = [*nodes.keys()][[*nodes.values()].index(h)]
-            log("    { ", end="")
-            log(f'from: {_from}, to: {_to}, arrows: "to", color: ', end="")
-            log('{ color: "blue" } },')
-            nodes[counter] = h
-            counter += 1
-
-    log("]);")
+    executions = [(se, index), (se_2, index)]
+    arcs = [
+        (
+            [
+                auto.getIncomingData(_se, _index, i)
+                for i in range(auto.getNoOfIncomingDataArcs(_se, _index))
+            ],
+            [
+                auto.getOutgoingData(_se, _index, i)
+                for i in range(auto.getNoOfOutgoingDataArcs(_se, _index))
+            ],
+        )
+        for _se, _index in executions
+    ]
+    with CertificateCache(roc, tmp_path / "certificates.db") as cache:
+        with GraphWriter(tmp_path / "graph.js") as writer:
+            write_executions(writer, executions, arcs, cache)
+
+        with GraphWriter(tmp_path / "graph.gv") as dot:
+            write_executions(dot, executions, arcs, cache)
+
+    assert writer.edges == sum(len(i) + len(o) for i, o in arcs)
+    log((tmp_path / "graph.js").read_text())
+    #: the export and the log ingest name every node the same
+    write_gv(exec_records(web3, auto.address), tmp_path / "ingest.gv")
+    ingested = (tmp_path / "ingest.gv").read_text()
+    assert all(f'    "{key}"\n' in ingested for key in dot.ids)
 
     input_hash_1 = []
     output_hash_1 = []